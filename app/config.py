@@ -28,6 +28,51 @@ class Settings(BaseSettings):
         description="Maximum retry attempts for processing"
     )
     
+    # Background worker threads per stage
+    ocr_workers: int = Field(
+        default=0,
+        ge=0,
+        le=64,
+        description="OCR worker threads (0 = one per CPU; always 1 on SQLite)"
+    )
+    
+    extraction_workers: int = Field(
+        default=4,
+        ge=1,
+        le=64,
+        description="Field extraction worker threads (I/O-bound LLM calls; always 1 on SQLite)"
+    )
+    
+    # PostgreSQL connection pool, per engine (each worker thread holds a
+    # connection while it processes a job, request handlers share the rest)
+    db_pool_size: int = Field(
+        default=25,
+        ge=1,
+        le=500,
+        description="Connections kept open per database engine (PostgreSQL only)"
+    )
+    
+    db_max_overflow: int = Field(
+        default=25,
+        ge=0,
+        le=500,
+        description="Extra connections opened under load per database engine (PostgreSQL only)"
+    )
+    
+    # Create/migrate the schema in the app's startup checks. Set false when the
+    # deploy pipeline runs `python -m app.migrate` instead
+    auto_migrate: bool = Field(
+        default=True,
+        description="Create tables and apply migrations at startup"
+    )
+    
+    # Run the OCR/extraction worker threads inside the web process. Set false
+    # for web processes when the pipeline runs as `python -m app.worker_main`
+    run_workers: bool = Field(
+        default=True,
+        description="Start the background OCR and extraction workers in the web process"
+    )
+    
     # Demo mode flag - explicit boolean parsing
     demo_mode: bool = Field(
         default=False,
@@ -87,7 +132,7 @@ class Settings(BaseSettings):
             )
         return v
     
-    @field_validator('demo_mode', 'enable_level_3_extraction', 'enable_semantic_extraction', 'use_llm_fallback', mode='before')
+    @field_validator('demo_mode', 'auto_migrate', 'run_workers', 'enable_level_3_extraction', 'enable_semantic_extraction', 'use_llm_fallback', mode='before')
     @classmethod
     def parse_bool(cls, v: Union[str, bool]) -> bool:
         """Parse boolean from string or boolean."""
@@ -106,7 +151,7 @@ class Settings(BaseSettings):
                 )
         return False
     
-    @field_validator('port', 'max_attempts', mode='before')
+    @field_validator('port', 'max_attempts', 'ocr_workers', 'extraction_workers', 'db_pool_size', 'db_max_overflow', mode='before')
     @classmethod
     def parse_int(cls, v: Union[str, int]) -> int:
         """Parse integer from string or int."""
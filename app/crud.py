@@ -1,14 +1,21 @@
 import hashlib
+import io
+import mmap
 import os
+import stat
 import uuid
 from datetime import datetime
+from typing import BinaryIO
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
 from app.models import Invoice, InvoiceStatus
 from app.config import settings
+from app.worker import notify_new_work
 
+# The digest is a duplicate-detection key, not a security control: flagging it
+# lets FIPS-restricted OpenSSL builds use their plain SHA-256 implementation
 def sha256_bytes(data: bytes) -> str:
-    return hashlib.sha256(data).hexdigest()
+    return hashlib.sha256(data, usedforsecurity=False).hexdigest()
 
 def ensure_storage_dir():
     os.makedirs(settings.storage_dir, exist_ok=True)
@@ -17,6 +24,74 @@ def find_existing(db: Session, email_message_id: str, sha256: str) -> Invoice |
     return db.query(Invoice).filter(and_(Invoice.email_message_id == email_message_id,
                                         Invoice.sha256 == sha256)).one_or_none()
 
+def find_extracted_copy(db: Session, sha256: str) -> Invoice | None:
+    """Return an already extracted invoice with the same file content, if any."""
+    return (
+        db.query(Invoice)
+        .filter(Invoice.sha256 == sha256, Invoice.status == InvoiceStatus.EXTRACTED)
+        .limit(1)
+        .first()
+    )
+
+# Uploads are copied to storage in chunks of this size (never held in memory whole)
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+def _disk_fileno(file_obj: BinaryIO) -> int | None:
+    """Descriptor of the regular file behind file_obj, or None if it is in memory."""
+    # fileno() on an in-memory SpooledTemporaryFile would first roll it to disk
+    if getattr(file_obj, "_rolled", True) is False:
+        return None
+    try:
+        fd = file_obj.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+    return fd if stat.S_ISREG(os.fstat(fd).st_mode) else None
+
+
+def _copy_and_hash(file_obj: BinaryIO, out: BinaryIO, hasher) -> int:
+    """
+    Copy file_obj from its current position into out, updating hasher; returns bytes copied.
+
+    Uploads that the server already spooled to disk (UploadFile past its
+    in-memory limit) are copied by the kernel with os.sendfile and hashed from
+    a read-only mmap, so the bytes never pass through a Python buffer. Anything
+    else goes through one reused STREAM_CHUNK_SIZE buffer.
+    """
+    src_fd = _disk_fileno(file_obj) if hasattr(os, "sendfile") else None
+    if src_fd is not None:
+        offset = file_obj.tell()
+        size = os.fstat(src_fd).st_size - offset
+        if size > 0:
+            out.flush()
+            dst_fd = out.fileno()
+            sent = 0
+            try:
+                while sent < size:
+                    n = os.sendfile(dst_fd, src_fd, offset + sent, size - sent)
+                    if n == 0:
+                        break
+                    sent += n
+            except OSError:
+                if sent:
+                    raise
+                sent = -1  # sendfile not supported between these files
+            if sent >= 0:
+                with mmap.mmap(src_fd, 0, access=mmap.ACCESS_READ) as mapped:
+                    with memoryview(mapped) as view, view[offset:offset + sent] as copied:
+                        hasher.update(copied)
+                file_obj.seek(offset + sent)
+                return sent
+
+    copied = 0
+    buffer = bytearray(STREAM_CHUNK_SIZE)
+    view = memoryview(buffer)
+    while n := file_obj.readinto(buffer):
+        hasher.update(view[:n])
+        out.write(view[:n])
+        copied += n
+    return copied
+
+
 def create_invoice_from_attachment(
     db: Session,
     email_message_id: str,
@@ -26,12 +101,34 @@ def create_invoice_from_attachment(
     content_type: str,
     file_bytes: bytes,
 ) -> Invoice:
-    ensure_storage_dir()
-    digest = sha256_bytes(file_bytes)
+    return create_invoice_from_stream(
+        db=db,
+        email_message_id=email_message_id,
+        sender=sender,
+        subject=subject,
+        filename=filename,
+        content_type=content_type,
+        file_obj=io.BytesIO(file_bytes),
+    )
 
-    existing = find_existing(db, email_message_id, digest)
-    if existing:
-        return existing
+def create_invoice_from_stream(
+    db: Session,
+    email_message_id: str,
+    sender: str,
+    subject: str,
+    filename: str,
+    content_type: str,
+    file_obj: BinaryIO,
+) -> Invoice:
+    """
+    Create an invoice from a readable binary file object (e.g. UploadFile.file).
+
+    The file is copied to storage and hashed in the same pass (see
+    _copy_and_hash), so peak memory does not depend on the upload size. It is written
+    under a temporary name first because the digest (needed for the duplicate
+    check) is only known once the whole stream has been read.
+    """
+    ensure_storage_dir()
 
     # Generate UUID as string for portability
     invoice_id = str(uuid.uuid4())
@@ -40,7 +137,46 @@ def create_invoice_from_attachment(
     if "." in filename:
         storage_path += "." + filename.split(".")[-1].lower()
 
-    # Save file by UUID filename to avoid collisions
+    # Ensure directory exists
+    os.makedirs(os.path.dirname(storage_path) if os.path.dirname(storage_path) else '.', exist_ok=True)
+    
+    # Use absolute path for storage to avoid issues on Render
+    abs_storage_path = os.path.abspath(storage_path)
+    tmp_path = abs_storage_path + ".part"
+
+    try:
+        hasher = hashlib.sha256(usedforsecurity=False)
+        with open(tmp_path, "wb") as f:
+            expected_size = _copy_and_hash(file_obj, f, hasher)
+        digest = hasher.hexdigest()
+
+        existing = find_existing(db, email_message_id, digest)
+        if existing:
+            os.remove(tmp_path)
+            return existing
+
+        # Same file already extracted under another message: reuse its stored
+        # file and results instead of running OCR and extraction again
+        extracted = find_extracted_copy(db, digest)
+        if extracted and os.path.exists(extracted.storage_path):
+            os.remove(tmp_path)
+            return _create_from_extracted_copy(
+                db, extracted, invoice_id, email_message_id, sender, subject, filename, content_type
+            )
+
+        # Verify file was written correctly
+        written_size = os.path.getsize(tmp_path)
+        if written_size != expected_size:
+            raise IOError(f"File size mismatch: wrote {written_size} bytes, expected {expected_size} bytes")
+        os.replace(tmp_path, abs_storage_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    # Store absolute path in database for consistency across environments.
+    # One timestamp for the row, so it is due for OCR as of its receipt
+    now = datetime.utcnow()
     inv = Invoice(
         id=invoice_id,
         email_message_id=email_message_id,
@@ -49,34 +185,60 @@ def create_invoice_from_attachment(
         filename=filename,
         content_type=content_type,
         sha256=digest,
-        storage_path=storage_path,
+        storage_path=abs_storage_path,
         status=InvoiceStatus.RECEIVED,
-        received_at=datetime.utcnow(),
-        next_attempt_at=datetime.utcnow(),
+        received_at=now,
+        next_attempt_at=now,
+        created_at=now,
     )
+    inv.updated_at = now
     db.add(inv)
-    db.flush()  # get inv.id
-
-    # Write file to disk
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(storage_path) if os.path.dirname(storage_path) else '.', exist_ok=True)
-    
-    # Use absolute path for storage to avoid issues on Render
-    abs_storage_path = os.path.abspath(storage_path)
-    
-    with open(abs_storage_path, "wb") as f:
-        f.write(file_bytes)
-    
-    # Verify file was written correctly
-    written_size = os.path.getsize(abs_storage_path) if os.path.exists(abs_storage_path) else 0
-    if written_size != len(file_bytes):
-        raise IOError(f"File size mismatch: wrote {written_size} bytes, expected {len(file_bytes)} bytes")
-    
-    # Store absolute path in database for consistency across environments
-    inv.storage_path = abs_storage_path
+    try:
+        db.commit()
+    except BaseException:
+        db.rollback()
+        os.remove(abs_storage_path)
+        raise
+    db.refresh(inv)
+    notify_new_work()
+    return inv
 
-    inv.updated_at = datetime.utcnow()
-    db.commit()
+def _create_from_extracted_copy(
+    db: Session,
+    source: Invoice,
+    invoice_id: str,
+    email_message_id: str,
+    sender: str,
+    subject: str,
+    filename: str,
+    content_type: str,
+) -> Invoice:
+    """Insert an invoice that is already EXTRACTED, sharing source's file and results."""
+    now = datetime.utcnow()
+    inv = Invoice(
+        id=invoice_id,
+        email_message_id=email_message_id,
+        sender=sender,
+        subject=subject,
+        filename=filename,
+        content_type=content_type,
+        sha256=source.sha256,
+        storage_path=source.storage_path,
+        status=InvoiceStatus.EXTRACTED,
+        ocr_text=source.ocr_text,
+        extracted_fields=source.extracted_fields,
+        confidence_status=source.confidence_status,
+        received_at=now,
+        next_attempt_at=now,
+        created_at=now,
+    )
+    inv.updated_at = now
+    db.add(inv)
+    try:
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
     db.refresh(inv)
     return inv
 
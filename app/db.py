@@ -5,6 +5,11 @@ from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# PostgreSQL pools: replace connections before server/proxy idle timeouts drop
+# them, and fail a checkout after 10s instead of queueing requests indefinitely
+POOL_RECYCLE_SECONDS = 1800
+POOL_TIMEOUT_SECONDS = 10
+
 # Create engine with dialect-aware configuration
 if settings.database_url.startswith("sqlite"):
     engine = create_engine(
@@ -17,6 +22,10 @@ else:
     engine = create_engine(
         settings.database_url,
         pool_pre_ping=True,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle=POOL_RECYCLE_SECONDS,
+        pool_timeout=POOL_TIMEOUT_SECONDS,
         echo=False
     )
 
@@ -25,6 +34,52 @@ logger.info(f"Database engine created: dialect={engine.dialect.name}, url={setti
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+
+def _async_database_url(url: str) -> str | None:
+    """Map the configured URL to an asyncio driver, or None if none is available."""
+    if url.startswith("postgresql+psycopg://"):
+        return url  # psycopg 3 supports asyncio under the same dialect name
+    if url.startswith("postgresql://"):
+        return "postgresql+psycopg://" + url[len("postgresql://"):]
+    if url.startswith("sqlite:///"):
+        try:
+            import aiosqlite
+        except ImportError:
+            return None
+        return "sqlite+aiosqlite:///" + url[len("sqlite:///"):]
+    return None
+
+
+# Async engine for request handlers, so status reads do not block the event
+# loop. Needs SQLAlchemy's asyncio extra (greenlet) and an asyncio driver
+# (psycopg 3 or aiosqlite); without them AsyncSessionLocal is None and callers
+# run the sync session in a worker thread. The worker threads always use the
+# sync engine above.
+async_engine = None
+AsyncSessionLocal = None
+try:
+    import greenlet
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    _async_url = _async_database_url(settings.database_url)
+    if _async_url:
+        if _async_url.startswith("sqlite"):
+            async_engine = create_async_engine(_async_url, echo=False)
+        else:
+            async_engine = create_async_engine(
+                _async_url,
+                pool_pre_ping=True,
+                pool_size=settings.db_pool_size,
+                max_overflow=settings.db_max_overflow,
+                pool_recycle=POOL_RECYCLE_SECONDS,
+                pool_timeout=POOL_TIMEOUT_SECONDS,
+                echo=False,
+            )
+        AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+        logger.info(f"Async database engine created: dialect={async_engine.dialect.name}")
+except ImportError:
+    logger.info("SQLAlchemy asyncio support not installed - request handlers use the sync engine in threads")
+
 class Base(DeclarativeBase):
     pass
 
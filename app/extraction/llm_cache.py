@@ -0,0 +1,201 @@
+"""
+Response cache for semantic (LLM) extraction.
+
+Two layers, both stored in a local SQLite file:
+- Exact: SHA-256 of the full prompt, scoped by prompt version
+- Semantic (opt-in): cosine similarity between embeddings of the OCR text
+
+Recurring bills from the same vendor template produce identical prompts, so
+the exact layer removes the network round-trip and token cost for repeats.
+The semantic layer also matches near-identical text; because two invoices
+from one template can differ only in their amounts, it is off unless a
+similarity threshold is configured.
+"""
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "llm.sqlite")
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+def hash_input(text: str) -> str:
+    """Return the hex SHA-256 digest used as the exact cache key."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite-backed cache of LLM JSON responses.
+
+    Embeddings of live entries are kept in memory (as one matrix when numpy is
+    installed) so a semantic lookup is a single pass over all rows instead of
+    a table scan per request.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        similarity_threshold: Optional[float] = None,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        self._embeddings: Optional[List[Tuple[str, array]]] = None
+        self._embeddings_version: Optional[str] = None
+        self._matrix = None
+        self._norms = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    input_hash TEXT PRIMARY KEY,
+                    prompt_version TEXT NOT NULL,
+                    embedding BLOB,
+                    response TEXT NOT NULL,
+                    created_at INTEGER NOT NULL,
+                    expires_at INTEGER NOT NULL
+                )
+                """
+            )
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.similarity_threshold is not None
+
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection; commits on success and always closes."""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_exact(self, input_hash: str, prompt_version: str) -> Optional[str]:
+        """Return the cached response for this hash and prompt version, if fresh."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response FROM llm_cache "
+                "WHERE input_hash = ? AND prompt_version = ? AND expires_at > ?",
+                (input_hash, prompt_version, int(time.time())),
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_similar(self, embedding: List[float], prompt_version: str) -> Optional[str]:
+        """Return the response of the most similar fresh entry above the threshold."""
+        if not self.semantic_enabled or not embedding:
+            return None
+
+        with self._lock:
+            self._load_embeddings(prompt_version)
+            if not self._embeddings:
+                return None
+
+            if np is not None:
+                query = np.asarray(embedding, dtype=np.float32)
+                query_norm = float(np.linalg.norm(query))
+                if query_norm == 0:
+                    return None
+                scores = (self._matrix @ query) / (self._norms * query_norm)
+                best = int(np.argmax(scores))
+                best_score = float(scores[best])
+            else:
+                query_norm = math.sqrt(sum(x * x for x in embedding))
+                if query_norm == 0:
+                    return None
+                best, best_score = -1, -1.0
+                for i, (_, row) in enumerate(self._embeddings):
+                    row_norm = self._norms[i]
+                    if row_norm == 0:
+                        continue
+                    score = sum(a * b for a, b in zip(row, embedding)) / (row_norm * query_norm)
+                    if score > best_score:
+                        best, best_score = i, score
+
+            if best < 0 or best_score < self.similarity_threshold:
+                return None
+            best_hash = self._embeddings[best][0]
+
+        logger.debug(f"Semantic cache hit (similarity {best_score:.4f})")
+        return self.get_exact(best_hash, prompt_version)
+
+    def put(
+        self,
+        input_hash: str,
+        prompt_version: str,
+        response: str,
+        embedding: Optional[List[float]] = None,
+    ) -> None:
+        """Store a response; replaces any existing entry for the same hash."""
+        now = int(time.time())
+        blob = array("f", embedding).tobytes() if embedding else None
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache "
+                "(input_hash, prompt_version, embedding, response, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (input_hash, prompt_version, blob, response, now, now + self.ttl_seconds),
+            )
+        if blob is not None:
+            with self._lock:
+                # Rebuild the in-memory matrix on the next semantic lookup
+                self._embeddings = None
+
+    def purge_expired(self) -> int:
+        """Delete expired entries; returns the number of rows removed."""
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (int(time.time()),))
+            removed = cursor.rowcount
+        with self._lock:
+            self._embeddings = None
+        return removed
+
+    def _load_embeddings(self, prompt_version: str) -> None:
+        """Load fresh embeddings for the prompt version (caller holds the lock)."""
+        if self._embeddings is not None and self._embeddings_version == prompt_version:
+            return
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT input_hash, embedding FROM llm_cache "
+                "WHERE prompt_version = ? AND embedding IS NOT NULL AND expires_at > ?",
+                (prompt_version, int(time.time())),
+            ).fetchall()
+
+        embeddings = []
+        for input_hash, blob in rows:
+            vector = array("f")
+            vector.frombytes(blob)
+            embeddings.append((input_hash, vector))
+
+        if np is not None and embeddings:
+            self._matrix = np.vstack([np.frombuffer(vector, dtype=np.float32) for _, vector in embeddings])
+            self._norms = np.linalg.norm(self._matrix, axis=1)
+            self._norms[self._norms == 0] = np.inf
+        else:
+            self._matrix = None
+            self._norms = [math.sqrt(sum(x * x for x in vector)) for _, vector in embeddings]
+        self._embeddings = embeddings
+        self._embeddings_version = prompt_version
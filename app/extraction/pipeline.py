@@ -12,10 +12,13 @@ Includes confidence scoring and status tracking for client trust indicators.
 import logging
 import json
 import re
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Iterable, Optional, Tuple
 import os
 from decimal import Decimal, InvalidOperation
+from app.config import settings
 from app.models import ConfidenceStatus
+from app.extraction.rule_based import extract_invoice_fields as rule_based_extract
+from app.extraction.structural import extract_structural_fields
 
 logger = logging.getLogger(__name__)
 
@@ -118,8 +121,6 @@ def _repair_json_string(json_str: str) -> str:
     Returns:
         Cleaned JSON string ready for parsing
     """
-    import re
-    
     # The issue: Gemini returns JSON with literal \n (backslash followed by n)
     # as text characters, not actual newlines. Python's json.loads() sees these
     # as invalid escape sequences in the JSON structure.
@@ -167,8 +168,6 @@ def call_semantic_llm(ocr_text: str, validation_failed: bool = False) -> Optiona
     Returns:
         Dictionary with extracted fields, or None if extraction fails
     """
-    from app.config import settings
-    
     google_api_key = settings.google_api_key
     if not google_api_key:
         logger.warning("GOOGLE_API_KEY not set. Cannot use Gemini for Level 3 extraction.")
@@ -575,9 +574,6 @@ def extract_invoice_fields_multi_level(
         "currency": None,
     }
     
-    # Level 1.5: Rule-based extraction (fallback, always runs)
-    from app.extraction.rule_based import extract_invoice_fields as rule_based_extract
-    
     logger.info("Starting multi-level extraction pipeline...")
     logger.info(f"  - Level 1 (OCR): Complete ({len(ocr_text)} characters)")
     logger.info(f"  - Level 2 (Structural): {'Enabled' if enable_level_2 else 'Disabled'}")
@@ -606,7 +602,6 @@ def extract_invoice_fields_multi_level(
     # Note: Structural parsing works best with PDFs, but can work with images if converted to PDF
     if enable_level_2:
         try:
-            from app.extraction.structural import extract_structural_fields
             # Structural extraction works with PDFs; for images, we pass the file path
             # but it may only work if the image was converted or if we have PDF metadata
             structural_result = extract_structural_fields(file_path, ocr_text)
@@ -744,6 +739,70 @@ def extract_invoice_fields_multi_level(
     return final_result, confidence_status
 
 
+# Fields of the page-by-page stop check taken from the last page that has
+# them (the totals block ends the invoice); the others (number, date, vendor,
+# currency) from the first
+_LAST_PAGE_FIELDS = ("subtotal", "discount", "tax", "total")
+
+
+def extract_invoice_fields_from_pages(
+    file_path: str,
+    pages: Iterable[str],
+    enable_level_2: bool = True,
+    enable_level_3: bool = False,
+    use_llm_fallback: bool = True,
+    min_extraction_rate: float = 0.5
+) -> Tuple[Dict[str, Any], ConfidenceStatus, str]:
+    """
+    Run the multi-level pipeline on page text that is read only as far as needed.
+
+    Pages are taken from the iterable one at a time (e.g. stream_pdf_pages).
+    Rule-based extraction runs on each new page only and its fields are merged
+    into those of the pages before (see _LAST_PAGE_FIELDS); once the merged
+    fields pass validate_accounting without needing the LLM, the remaining
+    pages are not read. The iterable is closed before the full pipeline runs
+    on the text read, so a PDF reader is not held open meanwhile; structural
+    parsing and the LLM still run at most once.
+
+    Returns:
+        Tuple of (fields, ConfidenceStatus, the text the fields were extracted from);
+        (None, ConfidenceStatus.ERROR, "") if there were no pages with text
+    """
+    text_parts = []
+    merged: Dict[str, Any] = {}
+    page_iter = iter(pages)
+    try:
+        for page_text in page_iter:
+            text_parts.append(page_text)
+            for field, value in rule_based_extract(page_text).items():
+                if value is not None and (field in _LAST_PAGE_FIELDS or merged.get(field) is None):
+                    merged[field] = value
+                else:
+                    merged.setdefault(field, None)
+            is_valid, _ = validate_accounting(merged)
+            if is_valid and not should_use_llm(merged, page_text, min_extraction_rate):
+                logger.info(f"All required fields found in the first {len(text_parts)} page(s) - not reading further")
+                break
+    finally:
+        close = getattr(page_iter, "close", None)
+        if close is not None:
+            close()
+
+    if not text_parts:
+        return None, ConfidenceStatus.ERROR, ""
+
+    ocr_text = "\n\n".join(text_parts)
+    fields, confidence_status = extract_invoice_fields_multi_level(
+        file_path=file_path,
+        ocr_text=ocr_text,
+        enable_level_2=enable_level_2,
+        enable_level_3=enable_level_3,
+        use_llm_fallback=use_llm_fallback,
+        min_extraction_rate=min_extraction_rate
+    )
+    return fields, confidence_status, ocr_text
+
+
 def get_extraction_level_config() -> Dict[str, Any]:
     """
     Get extraction level configuration from validated settings.
@@ -755,8 +814,6 @@ def get_extraction_level_config() -> Dict[str, Any]:
         - use_llm_fallback: bool (smart cost optimization)
         - min_extraction_rate: float (threshold for LLM fallback)
     """
-    from app.config import settings
-    
     # Level 2 is enabled by default (structural parsing)
     enable_level_2 = True  # Always enabled for now
     
@@ -4,11 +4,213 @@ Rule-based invoice field extraction.
 This module extracts structured fields from OCR text using regex patterns
 and string heuristics. No ML or external services are used.
 """
+import logging
 import re
+import threading
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional
 from decimal import Decimal, InvalidOperation
 
+try:
+    import re2  # google-re2: linear-time matching, no backtracking blowups
+except ImportError:
+    re2 = None
+
+logger = logging.getLogger(__name__)
+
+# re flags expressed as RE2 inline flags (RE2 takes no flags argument)
+_RE2_INLINE_FLAGS = ((re.IGNORECASE, 'i'), (re.MULTILINE, 'm'), (re.DOTALL, 's'))
+
+
+def _compile(pattern: str, flags: int = 0):
+    """
+    Compile a pattern with RE2 when installed, falling back to stdlib re.
+    
+    OCR text is untrusted input; RE2 matches in linear time so patterns with
+    lazy/overlapping quantifiers cannot backtrack pathologically. Patterns
+    RE2 rejects stay on re. RE2 patterns are wrapped in _Re2Pattern, which
+    gives them re's results on Unicode text.
+    """
+    if re2 is not None:
+        inline = ''.join(letter for flag, letter in _RE2_INLINE_FLAGS if flags & flag)
+        try:
+            regex = re2.compile(f"(?{inline}){pattern}" if inline else pattern)
+        except re2.error as e:
+            logger.info(f"RE2 cannot compile pattern {pattern!r} ({e}); using re")
+        else:
+            return _Re2Pattern(regex, re.compile(pattern, flags))
+    return re.compile(pattern, flags)
+
+
+class _Re2Pattern:
+    """
+    An RE2-compiled pattern that matches like its stdlib re version.
+    
+    RE2's \\s, \\d, \\w and \\b are ASCII-only, where re's are Unicode-aware.
+    search/match run on _fold(text), a copy of the same length in which every
+    character those classes treat differently is replaced by an ASCII one RE2
+    classifies as re does, and groups are sliced from the original text by
+    position, so captures come back unchanged. Text with non-ASCII decimal
+    digits, which have no such stand-in, is matched with the re version.
+    """
+    __slots__ = ('_regex', '_fallback', '_ignorecase')
+    
+    def __init__(self, regex, fallback: re.Pattern):
+        self._regex = regex
+        self._fallback = fallback
+        self._ignorecase = bool(fallback.flags & re.IGNORECASE)
+    
+    @property
+    def pattern(self) -> str:
+        return self._fallback.pattern
+    
+    def search(self, text: str):
+        return self._run('search', text)
+    
+    def match(self, text: str):
+        return self._run('match', text)
+    
+    def _run(self, method: str, text: str):
+        folded = _fold(text, self._ignorecase)
+        if folded is None:
+            return getattr(self._fallback, method)(text)
+        match = getattr(self._regex, method)(folded)
+        if match is None or folded is text:
+            return match
+        return _SlicedMatch(match, text)
+
+
+class _SlicedMatch:
+    """A match on a folded copy of text whose groups are sliced from text."""
+    __slots__ = ('_match', 'string')
+    
+    def __init__(self, match, text: str):
+        self._match = match
+        self.string = text
+    
+    def _group(self, index):
+        start, end = self._match.span(index)
+        return None if start < 0 else self.string[start:end]
+    
+    def group(self, *indices):
+        if len(indices) <= 1:
+            return self._group(indices[0] if indices else 0)
+        return tuple(self._group(index) for index in indices)
+    
+    def groups(self, default=None):
+        return tuple(
+            default if value is None else value
+            for value in (self._group(index) for index in range(1, self._match.re.groups + 1))
+        )
+    
+    def span(self, index=0):
+        return self._match.span(index)
+    
+    def start(self, index=0):
+        return self._match.start(index)
+    
+    def end(self, index=0):
+        return self._match.end(index)
+
+
+# Characters _fold may replace: non-ASCII ones, and the ASCII whitespace re's
+# \s matches but RE2's does not
+_ASCII_FOLD_CHARS = '\v\x1c\x1d\x1e\x1f'
+_FOLD_CANDIDATE_RE = re.compile(r'[^\x00-\x7f]|[\v\x1c-\x1f]')
+
+# Non-ASCII letters re matches as ASCII ones case-insensitively ((?i)k also
+# matches the Kelvin sign)
+_IGNORECASE_ASCII_LETTERS = {'\u0130': 'i', '\u0131': 'i', '\u017f': 's', '\u212a': 'k'}
+
+# Folded texts of the current thread, keyed by (id(text), ignorecase): the
+# extractors run every pattern over the same text and text_lower
+_fold_cache = threading.local()
+_FOLD_CACHE_SIZE = 8
+
+
+@lru_cache(maxsize=4096)
+def _fold_char(char: str, ignorecase: bool) -> Optional[str]:
+    """
+    The ASCII stand-in RE2 classifies as re classifies char.
+    
+    Whitespace becomes \\f (matched by \\s, used literally by no pattern), word
+    characters become _ (\\w but not [A-Za-z]; no pattern has a literal _) and
+    lone surrogates, which RE2 cannot encode, U+FFFD. None for a non-ASCII
+    decimal digit. Other characters are non-word for both engines and stay.
+    """
+    if char.isspace():
+        return '\f'
+    if char.isdecimal():
+        return None
+    if char.isalnum():
+        return _IGNORECASE_ASCII_LETTERS.get(char, '_') if ignorecase else '_'
+    if '\ud800' <= char <= '\udfff':
+        return '\ufffd'
+    return char
+
+
+def _fold(text: str, ignorecase: bool) -> Optional[str]:
+    """
+    text with each character replaced by _fold_char (text itself if none is);
+    None if it contains a non-ASCII decimal digit.
+    """
+    if text.isascii() and not any(char in text for char in _ASCII_FOLD_CHARS):
+        # The common case, checked with substring searches (much faster than
+        # a regex scan; extractors also match slices, which miss the cache)
+        return text
+    
+    cache = getattr(_fold_cache, 'entries', None)
+    if cache is None:
+        cache = _fold_cache.entries = {}
+    key = (id(text), ignorecase)
+    entry = cache.get(key)
+    if entry is not None and entry[0] is text:
+        return entry[1]
+    
+    parts = []
+    position = 0
+    for match in _FOLD_CANDIDATE_RE.finditer(text):
+        char = match.group()
+        replacement = _fold_char(char, ignorecase)
+        if replacement is None:
+            folded = None
+            break
+        if replacement != char:
+            parts.append(text[position:match.start()])
+            parts.append(replacement)
+            position = match.end()
+    else:
+        folded = ''.join(parts) + text[position:] if parts else text
+    
+    if len(cache) >= _FOLD_CACHE_SIZE:
+        cache.clear()
+    cache[key] = (text, folded)
+    return folded
+
+
+# OCR garbage guard: if fewer than this share of the leading characters are
+# alphanumeric (blank pages, pure table ruling), skip all field extractors
+_MIN_ALNUM_RATIO = 0.1
+_ALNUM_SAMPLE_SIZE = 500
+
+# Two-decimal quantum for amounts (built once instead of per call)
+_CENT = Decimal('0.01')
+
+# Amount prefilter: text without a single digit cannot contain an amount
+_DIGIT_RE = _compile(r'\d')
+
+# Amount cleanup: currency symbols, thousands separators and every character
+# the regex class \s matches (no Unicode whitespace lies above U+3000)
+_AMOUNT_STRIP_TABLE = str.maketrans(
+    '', '', '$€£¥₹,' + ''.join(chr(c) for c in range(0x3001) if chr(c).isspace())
+)
+
+# Each field's pattern set below also requires a literal keyword ("total",
+# "tax", "discount", ...). Extractors check for it with a substring search
+# first and skip the whole set when it is absent - the common case for
+# discount and VAT - instead of running every pattern over the text.
+
 
 def extract_invoice_fields(ocr_text: str) -> dict:
     """
@@ -34,17 +236,28 @@ def extract_invoice_fields(ocr_text: str) -> dict:
     
     # Normalize text: remove extra whitespace, make case-insensitive matching easier
     text = ocr_text.strip()
+    
+    # Bail out early on mostly non-alphanumeric text - every extractor
+    # would run its full pattern set only to return None
+    sample = text[:_ALNUM_SAMPLE_SIZE]
+    if sum(map(str.isalnum, sample)) < len(sample) * _MIN_ALNUM_RATIO:
+        return _empty_result()
+    
     text_lower = text.lower()
     
+    # Amount extractors return None straight away on digit-free text
+    # (scanned cover sheets, letters) instead of running their pattern sets
+    has_digits = bool(_DIGIT_RE.search(text))
+    
     # Extract all fields
     result = {
         "invoice_number": _extract_invoice_number(text, text_lower),
         "invoice_date": _extract_invoice_date(text, text_lower),
         "vendor_name": _extract_vendor_name(text, text_lower),
-        "subtotal": _extract_subtotal(text, text_lower),
-        "discount": _extract_discount(text, text_lower),
-        "tax": _extract_tax_normalized(text, text_lower),  # Returns dict with type
-        "total": _extract_total(text, text_lower),
+        "subtotal": _extract_subtotal(text, text_lower, has_digits),
+        "discount": _extract_discount(text, text_lower, has_digits),
+        "tax": _extract_tax_normalized(text, text_lower, has_digits),  # Returns dict with type
+        "total": _extract_total(text, text_lower, has_digits),
         "currency": _extract_currency(text, text_lower),
     }
     
@@ -57,6 +270,24 @@ def extract_invoice_fields(ocr_text: str) -> dict:
     return result
 
 
+def detect_currency(ocr_text: str) -> Optional[str]:
+    """
+    Currency code found in OCR text, as extract_invoice_fields reports it.
+
+    Takes the raw OCR text and normalises it the same way, so callers get the
+    same answer for the same document.
+    """
+    if not ocr_text:
+        return None
+    text = ocr_text.strip()
+    return _extract_currency(text, text.lower())
+
+
+def normalize_amount(amount_str: str) -> Optional[str]:
+    """Amount string as a 2-decimal string ("1,234.5" -> "1234.50"), or None."""
+    return _normalize_amount(amount_str)
+
+
 def _empty_result() -> dict:
     """Return empty result with all fields as None."""
     return {
@@ -71,6 +302,21 @@ def _empty_result() -> dict:
     }
 
 
+# Patterns: "Invoice No: 12345", "Invoice # INV-001", "Inv. Number: 456"
+_INVOICE_NUMBER_PATTERNS = [
+    _compile(r'invoice\s*(?:no|number|#)\s*:?\s*([A-Z0-9\-]+)', re.IGNORECASE),
+    _compile(r'inv\.?\s*(?:no|number|#)\s*:?\s*([A-Z0-9\-]+)', re.IGNORECASE),
+    _compile(r'invoice\s+([A-Z0-9\-]{3,})', re.IGNORECASE),
+]
+
+
+# Checks on short candidate strings: stdlib re, whose per-call overhead is
+# lower than RE2's on a few characters
+_CANDIDATE_DIGIT_RE = re.compile(r'\d')
+_CANDIDATE_LETTER_RE = re.compile(r'[A-Za-z]')
+_CANDIDATE_ALL_DIGITS_RE = re.compile(r'^\d+$')
+
+
 def _extract_invoice_number(text: str, text_lower: str) -> Optional[str]:
     """
     Extract invoice number using common patterns with negative rules.
@@ -92,17 +338,14 @@ def _extract_invoice_number(text: str, text_lower: str) -> Optional[str]:
         "discount", "price", "cost", "fee", "payment", "paid"
     }
     
-    # Patterns: "Invoice No: 12345", "Invoice # INV-001", "Inv. Number: 456"
-    patterns = [
-        r'invoice\s*(?:no|number|#)\s*:?\s*([A-Z0-9\-]+)',
-        r'inv\.?\s*(?:no|number|#)\s*:?\s*([A-Z0-9\-]+)',
-        r'invoice\s+([A-Z0-9\-]{3,})',
-    ]
-    
     candidates = []
     
-    for pattern in patterns:
-        match = re.search(pattern, text_lower, re.IGNORECASE)
+    # Every pattern starts with "inv"
+    if 'inv' not in text_lower:
+        return None
+    
+    for pattern in _INVOICE_NUMBER_PATTERNS:
+        match = pattern.search(text_lower)
         if match:
             value = match.group(1).strip().upper()
             if value:
@@ -119,12 +362,12 @@ def _extract_invoice_number(text: str, text_lower: str) -> Optional[str]:
             continue
         
         # Acceptance rule 1: Must contain at least 1 digit
-        if not re.search(r'\d', candidate):
+        if not _CANDIDATE_DIGIT_RE.search(candidate):
             continue
         
         # Acceptance rule 2: Must contain at least 1 letter OR be all digits with length >= 4
-        has_letter = re.search(r'[A-Za-z]', candidate)
-        is_all_digits = re.match(r'^\d+$', candidate)
+        has_letter = _CANDIDATE_LETTER_RE.search(candidate)
+        is_all_digits = _CANDIDATE_ALL_DIGITS_RE.match(candidate)
         
         if not has_letter and not (is_all_digits and len(candidate) >= 4):
             continue
@@ -135,15 +378,16 @@ def _extract_invoice_number(text: str, text_lower: str) -> Optional[str]:
     return None
 
 
+# Common date patterns
+# YYYY-MM-DD, DD/MM/YYYY, MM/DD/YYYY, DD-MM-YYYY, DD.MM.YYYY
+_DATE_PATTERNS = [
+    _compile(r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})'),  # YYYY-MM-DD or YYYY/MM/DD
+    _compile(r'(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})'),  # DD/MM/YYYY or MM/DD/YYYY
+]
+
+
 def _extract_invoice_date(text: str, text_lower: str) -> Optional[str]:
     """Extract invoice date and normalize to ISO format (YYYY-MM-DD)."""
-    # Common date patterns
-    # YYYY-MM-DD, DD/MM/YYYY, MM/DD/YYYY, DD-MM-YYYY, DD.MM.YYYY
-    date_patterns = [
-        r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})',  # YYYY-MM-DD or YYYY/MM/DD
-        r'(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})',  # DD/MM/YYYY or MM/DD/YYYY
-    ]
-    
     # Look for date near keywords like "date", "invoice date", "issued"
     date_keywords = ['date', 'issued', 'invoice date', 'billing date']
     
@@ -152,8 +396,8 @@ def _extract_invoice_date(text: str, text_lower: str) -> Optional[str]:
         keyword_pos = text_lower.find(keyword)
         if keyword_pos != -1:
             context = text[max(0, keyword_pos):keyword_pos + 100]
-            for pattern in date_patterns:
-                match = re.search(pattern, context)
+            for pattern in _DATE_PATTERNS:
+                match = pattern.search(context)
                 if match:
                     try:
                         if len(match.group(1)) == 4:  # YYYY-MM-DD format
@@ -182,87 +426,101 @@ def _extract_invoice_date(text: str, text_lower: str) -> Optional[str]:
     return None
 
 
+# Patterns: "From:", "Vendor:", "Supplier:", "Bill From:"
+_VENDOR_PATTERNS = [
+    _compile(r'(?:from|vendor|supplier|bill\s+from)\s*:?\s*([A-Z][A-Za-z\s&.,-]{2,30}?)(?:\n|$)',
+             re.IGNORECASE | re.MULTILINE),
+]
+
+
+# Vendor name cleanup, and the fallback's lines that cannot be a company name
+# (one alternation instead of a search per pattern)
+_WHITESPACE_RUN_RE = re.compile(r'\s+')
+_VENDOR_TRAILING_WORDS_RE = re.compile(r'\s+(subtotal|total|date|invoice).*$', re.IGNORECASE)
+_VENDOR_SKIP_RE = re.compile('|'.join([
+    r'click\s+to\s+edit',
+    r'invoice',
+    r'^[|]',  # Table separators
+    r'^\s*$',  # Empty lines
+    r'^\d+',  # Lines starting with numbers
+    r'\d{4}[-/]\d',  # Dates
+    r'(billed\s+to|from|date|invoice|total|subtotal|tax|amount)',  # Common keywords
+]), re.IGNORECASE)
+_LONG_NUMBER_RE = re.compile(r'[0-9]{4,}')
+
+
 def _extract_vendor_name(text: str, text_lower: str) -> Optional[str]:
     """Extract vendor/supplier name (usually near top of invoice)."""
     # Look for common vendor indicators in first 500 chars
     header = text[:500]
     
-    # Patterns: "From:", "Vendor:", "Supplier:", "Bill From:"
-    vendor_patterns = [
-        r'(?:from|vendor|supplier|bill\s+from)\s*:?\s*([A-Z][A-Za-z\s&.,-]{2,30}?)(?:\n|$)',
-    ]
-    
-    for pattern in vendor_patterns:
-        match = re.search(pattern, header, re.IGNORECASE | re.MULTILINE)
+    for pattern in _VENDOR_PATTERNS:
+        match = pattern.search(header)
         if match:
             name = match.group(1).strip()
             # Clean up common artifacts and stop at common keywords
-            name = re.sub(r'\s+', ' ', name)
+            name = _WHITESPACE_RUN_RE.sub(' ', name)
             # Remove trailing words that are likely not part of company name
-            name = re.sub(r'\s+(subtotal|total|date|invoice).*$', '', name, flags=re.IGNORECASE)
+            name = _VENDOR_TRAILING_WORDS_RE.sub('', name)
             if len(name) >= 2 and len(name) <= 100:
                 return name.title()
     
     # Fallback: look for company-like text in first few lines (but be more careful)
     lines = header.split('\n')[:10]
-    skip_patterns = [
-        r'click\s+to\s+edit',
-        r'invoice',
-        r'^[|]',  # Table separators
-        r'^\s*$',  # Empty lines
-        r'^\d+',  # Lines starting with numbers
-        r'\d{4}[-/]\d',  # Dates
-        r'(billed\s+to|from|date|invoice|total|subtotal|tax|amount)',  # Common keywords
-    ]
     
     for i, line in enumerate(lines):
         line = line.strip()
         # Skip if matches any skip pattern
-        if any(re.search(pattern, line, re.IGNORECASE) for pattern in skip_patterns):
+        if _VENDOR_SKIP_RE.search(line):
             continue
         
         # Look for company-like text (all caps or title case, reasonable length)
         if (len(line) > 3 and len(line) < 50 and 
             (line.isupper() or (line[0].isupper() and not line.islower())) and
-            not re.search(r'[0-9]{4,}', line) and  # No long number sequences
+            not _LONG_NUMBER_RE.search(line) and  # No long number sequences
             i > 0):  # Skip first line (often "INVOICE")
             return line
     
     return None
 
 
-def _extract_subtotal(text: str, text_lower: str) -> Optional[str]:
+# Handle OCR errors: $ might be read as "5" or "S"
+_SUBTOTAL_PATTERNS = [
+    _compile(r'subtotal\s*:?\s*\$?\s*([\d,]+\.?\d*)'),
+    _compile(r'subtotal\s*:?\s*5\s+([\d,]+\.?\d*)'),  # OCR error: $ -> 5
+    _compile(r'subtotal\s*:?\s*S([\d,]+\.?\d*)'),  # OCR error: $ -> S
+    _compile(r'sub\s+total\s*:?\s*\$?\s*\$?\s*([\d,]+\.?\d*)'),
+    _compile(r'sub\s+total\s*:?\s*5\s+([\d,]+\.?\d*)'),  # OCR error
+    _compile(r'total\s+before\s+tax\s*:?\s*\$?\s*([\d,]+\.?\d*)'),
+    _compile(r'total\s+before\s+tax\s*:?\s*5\s+([\d,]+\.?\d*)'),  # OCR error
+]
+
+# Also handle table format: "| Subtotal | | $1,798.39 |"
+_SUBTOTAL_TABLE_PATTERNS = [
+    _compile(r'[|]\s*subtotal\s*[|][^|]*[|]\s*\$?\s*([\d,]+\.?\d*)\s*[|]', re.IGNORECASE),
+    _compile(r'[|]\s*subtotal\s*[|][^|]*[|]\s*5\s+([\d,]+\.?\d*)\s*[|]', re.IGNORECASE),  # OCR error
+    _compile(r'[|]\s*subtotal\s*[|][^|]*[|]\s*S([\d,]+\.?\d*)\s*[|]', re.IGNORECASE),  # OCR error
+    _compile(r'[|]\s*sub\s+total\s*[|][^|]*[|]\s*\$?\s*([\d,]+\.?\d*)\s*[|]', re.IGNORECASE),
+]
+
+
+def _extract_subtotal(text: str, text_lower: str, has_digits: bool = True) -> Optional[str]:
     """Extract subtotal amount."""
-    # Handle OCR errors: $ might be read as "5" or "S"
-    patterns = [
-        r'subtotal\s*:?\s*\$?\s*([\d,]+\.?\d*)',
-        r'subtotal\s*:?\s*5\s+([\d,]+\.?\d*)',  # OCR error: $ -> 5
-        r'subtotal\s*:?\s*S([\d,]+\.?\d*)',  # OCR error: $ -> S
-        r'sub\s+total\s*:?\s*\$?\s*\$?\s*([\d,]+\.?\d*)',
-        r'sub\s+total\s*:?\s*5\s+([\d,]+\.?\d*)',  # OCR error
-        r'total\s+before\s+tax\s*:?\s*\$?\s*([\d,]+\.?\d*)',
-        r'total\s+before\s+tax\s*:?\s*5\s+([\d,]+\.?\d*)',  # OCR error
-    ]
-    
-    # Also handle table format: "| Subtotal | | $1,798.39 |"
-    table_patterns = [
-        r'[|]\s*subtotal\s*[|][^|]*[|]\s*\$?\s*([\d,]+\.?\d*)\s*[|]',
-        r'[|]\s*subtotal\s*[|][^|]*[|]\s*5\s+([\d,]+\.?\d*)\s*[|]',  # OCR error
-        r'[|]\s*subtotal\s*[|][^|]*[|]\s*S([\d,]+\.?\d*)\s*[|]',  # OCR error
-        r'[|]\s*sub\s+total\s*[|][^|]*[|]\s*\$?\s*([\d,]+\.?\d*)\s*[|]',
-    ]
+    if not has_digits or 'total' not in text_lower:
+        return None
     
     # Try table patterns first (more specific)
-    for pattern in table_patterns:
-        match = re.search(pattern, text_lower, re.IGNORECASE)
-        if match:
-            value = _normalize_amount(match.group(1))
-            if value:
-                return value
+    if '|' in text_lower:  # table rows only
+        for pattern in _SUBTOTAL_TABLE_PATTERNS:
+            match = pattern.search(text_lower)
+            if match:
+                value = _normalize_amount(match.group(1))
+                if value:
+                    return value
     
     # Then try regular patterns
-    for pattern in patterns:
-        match = re.search(pattern, text_lower)
+    for pattern in _SUBTOTAL_PATTERNS:
+        match = pattern.search(text_lower)
         if match:
             value = _normalize_amount(match.group(1))
             if value:
@@ -271,37 +529,42 @@ def _extract_subtotal(text: str, text_lower: str) -> Optional[str]:
     return None
 
 
-def _extract_tax(text: str, text_lower: str) -> Optional[str]:
+# Handle OCR errors: $ might be read as "5" or "S"
+_TAX_PATTERNS = [
+    _compile(r'tax\s*(?:\([^)]+\))?\s*:?\s*\$?\s*([\d,]+\.?\d*)'),  # Handles "Tax (10%): $100"
+    _compile(r'tax\s*(?:\([^)]+\))?\s*:?\s*5\s+([\d,]+\.?\d*)'),  # OCR error: $ -> 5
+    _compile(r'tax\s*(?:\([^)]+\))?\s*:?\s*S([\d,]+\.?\d*)'),  # OCR error: $ -> S
+    _compile(r'tax\s+amount\s*:?\s*\$?\s*([\d,]+\.?\d*)'),
+    _compile(r'tax\s+amount\s*:?\s*5\s+([\d,]+\.?\d*)'),  # OCR error
+    _compile(r'sales\s+tax\s*:?\s*\$?\s*([\d,]+\.?\d*)'),
+    _compile(r'sales\s+tax\s*:?\s*5\s+([\d,]+\.?\d*)'),  # OCR error
+]
+
+# Also handle table format: "| Tax | | +$80.93 |" or "| Tax | | $80.93 |"
+_TAX_TABLE_PATTERNS = [
+    _compile(r'[|]\s*tax\s*[|][^|]*[|]\s*\+?\$?\s*([\d,]+\.?\d*)\s*[|]', re.IGNORECASE),
+    _compile(r'[|]\s*tax\s*[|][^|]*[|]\s*\+?5\s+([\d,]+\.?\d*)\s*[|]', re.IGNORECASE),  # OCR error
+    _compile(r'[|]\s*tax\s+amount\s*[|][^|]*[|]\s*\$?\s*([\d,]+\.?\d*)\s*[|]', re.IGNORECASE),
+]
+
+
+def _extract_tax(text: str, text_lower: str, has_digits: bool = True) -> Optional[str]:
     """Extract tax amount."""
-    # Handle OCR errors: $ might be read as "5" or "S"
-    patterns = [
-        r'tax\s*(?:\([^)]+\))?\s*:?\s*\$?\s*([\d,]+\.?\d*)',  # Handles "Tax (10%): $100"
-        r'tax\s*(?:\([^)]+\))?\s*:?\s*5\s+([\d,]+\.?\d*)',  # OCR error: $ -> 5
-        r'tax\s*(?:\([^)]+\))?\s*:?\s*S([\d,]+\.?\d*)',  # OCR error: $ -> S
-        r'tax\s+amount\s*:?\s*\$?\s*([\d,]+\.?\d*)',
-        r'tax\s+amount\s*:?\s*5\s+([\d,]+\.?\d*)',  # OCR error
-        r'sales\s+tax\s*:?\s*\$?\s*([\d,]+\.?\d*)',
-        r'sales\s+tax\s*:?\s*5\s+([\d,]+\.?\d*)',  # OCR error
-    ]
-    
-    # Also handle table format: "| Tax | | +$80.93 |" or "| Tax | | $80.93 |"
-    table_patterns = [
-        r'[|]\s*tax\s*[|][^|]*[|]\s*\+?\$?\s*([\d,]+\.?\d*)\s*[|]',
-        r'[|]\s*tax\s*[|][^|]*[|]\s*\+?5\s+([\d,]+\.?\d*)\s*[|]',  # OCR error
-        r'[|]\s*tax\s+amount\s*[|][^|]*[|]\s*\$?\s*([\d,]+\.?\d*)\s*[|]',
-    ]
+    if not has_digits or 'tax' not in text_lower:
+        return None
     
     # Try table patterns first (more specific)
-    for pattern in table_patterns:
-        match = re.search(pattern, text_lower, re.IGNORECASE)
-        if match:
-            value = _normalize_amount(match.group(1))
-            if value:
-                return value
+    if '|' in text_lower:  # table rows only
+        for pattern in _TAX_TABLE_PATTERNS:
+            match = pattern.search(text_lower)
+            if match:
+                value = _normalize_amount(match.group(1))
+                if value:
+                    return value
     
     # Then try regular patterns
-    for pattern in patterns:
-        match = re.search(pattern, text_lower)
+    for pattern in _TAX_PATTERNS:
+        match = pattern.search(text_lower)
         if match:
             value = _normalize_amount(match.group(1))
             if value:
@@ -310,7 +573,21 @@ def _extract_tax(text: str, text_lower: str) -> Optional[str]:
     return None
 
 
-def _extract_discount(text: str, text_lower: str) -> Optional[str]:
+_DISCOUNT_PATTERNS = [
+    _compile(r'discount\s*:?\s*-?\$?\s*([\d,]+\.?\d*)'),  # Handles "Discount: -$179.84" or "Discount: $179.84"
+    _compile(r'discount\s+amount\s*:?\s*-?\$?\s*([\d,]+\.?\d*)'),
+    _compile(r'discount\s*:?\s*5\s+([\d,]+\.?\d*)'),  # OCR error: $ -> 5
+    _compile(r'discount\s*:?\s*S([\d,]+\.?\d*)'),  # OCR error: $ -> S
+]
+
+# Table format
+_DISCOUNT_TABLE_PATTERNS = [
+    _compile(r'[|]\s*discount\s*[|][^|]*[|]\s*-?\$?\s*([\d,]+\.?\d*)\s*[|]', re.IGNORECASE),
+    _compile(r'[|]\s*discount\s*[|][^|]*[|]\s*-?5\s+([\d,]+\.?\d*)\s*[|]', re.IGNORECASE),  # OCR error
+]
+
+
+def _extract_discount(text: str, text_lower: str, has_digits: bool = True) -> Optional[str]:
     """
     Extract discount amount and normalize as negative.
     
@@ -319,31 +596,22 @@ def _extract_discount(text: str, text_lower: str) -> Optional[str]:
     - "Discount: $179.84" (assumes negative)
     - "Discount -$179.84"
     """
-    patterns = [
-        r'discount\s*:?\s*-?\$?\s*([\d,]+\.?\d*)',  # Handles "Discount: -$179.84" or "Discount: $179.84"
-        r'discount\s+amount\s*:?\s*-?\$?\s*([\d,]+\.?\d*)',
-        r'discount\s*:?\s*5\s+([\d,]+\.?\d*)',  # OCR error: $ -> 5
-        r'discount\s*:?\s*S([\d,]+\.?\d*)',  # OCR error: $ -> S
-    ]
-    
-    # Table format
-    table_patterns = [
-        r'[|]\s*discount\s*[|][^|]*[|]\s*-?\$?\s*([\d,]+\.?\d*)\s*[|]',
-        r'[|]\s*discount\s*[|][^|]*[|]\s*-?5\s+([\d,]+\.?\d*)\s*[|]',  # OCR error
-    ]
+    if not has_digits or 'discount' not in text_lower:
+        return None
     
     # Try table patterns first
-    for pattern in table_patterns:
-        match = re.search(pattern, text_lower, re.IGNORECASE)
-        if match:
-            value = _normalize_amount(match.group(1))
-            if value:
-                # Normalize as negative (discounts are always negative)
-                return str(-abs(Decimal(value)))
+    if '|' in text_lower:  # table rows only
+        for pattern in _DISCOUNT_TABLE_PATTERNS:
+            match = pattern.search(text_lower)
+            if match:
+                value = _normalize_amount(match.group(1))
+                if value:
+                    # Normalize as negative (discounts are always negative)
+                    return str(-abs(Decimal(value)))
     
     # Try regular patterns
-    for pattern in patterns:
-        match = re.search(pattern, text_lower)
+    for pattern in _DISCOUNT_PATTERNS:
+        match = pattern.search(text_lower)
         if match:
             value = _normalize_amount(match.group(1))
             if value:
@@ -353,13 +621,16 @@ def _extract_discount(text: str, text_lower: str) -> Optional[str]:
     return None
 
 
-def _extract_tax_normalized(text: str, text_lower: str) -> Optional[dict]:
+def _extract_tax_normalized(text: str, text_lower: str, has_digits: bool = True) -> Optional[dict]:
     """
     Extract tax/VAT and normalize into single field with type.
     
     Returns:
         {"amount": str, "type": "sales_tax" | "vat"} | None
     """
+    if not has_digits:
+        return None
+    
     tax_amount = _extract_tax(text, text_lower)
     vat_amount = _extract_vat(text, text_lower)
     
@@ -372,18 +643,22 @@ def _extract_tax_normalized(text: str, text_lower: str) -> Optional[dict]:
     return None
 
 
-def _extract_vat(text: str, text_lower: str) -> Optional[str]:
+_VAT_PATTERNS = [
+    _compile(r'vat\s*:?\s*\$?\s*([\d,]+\.?\d*)'),
+    _compile(r'vat\s*:?\s*5\s+([\d,]+\.?\d*)'),  # OCR error: $ -> 5
+    _compile(r'vat\s*:?\s*S([\d,]+\.?\d*)'),  # OCR error: $ -> S
+    _compile(r'vat\s+amount\s*:?\s*\$?\s*([\d,]+\.?\d*)'),
+    _compile(r'value\s+added\s+tax\s*:?\s*\$?\s*([\d,]+\.?\d*)'),
+]
+
+
+def _extract_vat(text: str, text_lower: str, has_digits: bool = True) -> Optional[str]:
     """Extract VAT amount (used internally by _extract_tax_normalized)."""
-    patterns = [
-        r'vat\s*:?\s*\$?\s*([\d,]+\.?\d*)',
-        r'vat\s*:?\s*5\s+([\d,]+\.?\d*)',  # OCR error: $ -> 5
-        r'vat\s*:?\s*S([\d,]+\.?\d*)',  # OCR error: $ -> S
-        r'vat\s+amount\s*:?\s*\$?\s*([\d,]+\.?\d*)',
-        r'value\s+added\s+tax\s*:?\s*\$?\s*([\d,]+\.?\d*)',
-    ]
+    if not has_digits or ('vat' not in text_lower and 'value' not in text_lower):
+        return None
     
-    for pattern in patterns:
-        match = re.search(pattern, text_lower)
+    for pattern in _VAT_PATTERNS:
+        match = pattern.search(text_lower)
         if match:
             value = _normalize_amount(match.group(1))
             if value:
@@ -392,26 +667,29 @@ def _extract_vat(text: str, text_lower: str) -> Optional[str]:
     return None
 
 
-def _extract_total(text: str, text_lower: str) -> Optional[str]:
+# Prefer "Total" or "Amount Due"; handle OCR errors: $ might be read as "5" or "S"
+_TOTAL_PATTERNS = [
+    _compile(r'total\s+due\s*:?\s*\$?\s*([\d,]+\.?\d*)', re.MULTILINE),
+    _compile(r'total\s+due\s*:?\s*5\s+([\d,]+\.?\d*)', re.MULTILINE),  # OCR error: $ -> 5
+    _compile(r'total\s+due\s*:?\s*S([\d,]+\.?\d*)', re.MULTILINE),  # OCR error: $ -> S
+    _compile(r'amount\s+due\s*:?\s*\$?\s*([\d,]+\.?\d*)', re.MULTILINE),
+    _compile(r'amount\s+due\s*:?\s*5\s+([\d,]+\.?\d*)', re.MULTILINE),  # OCR error
+    _compile(r'grand\s+total\s*:?\s*\$?\s*([\d,]+\.?\d*)', re.MULTILINE),
+    _compile(r'grand\s+total\s*:?\s*5\s+([\d,]+\.?\d*)', re.MULTILINE),  # OCR error
+    _compile(r'^total\s*:?\s*\$?\s*([\d,]+\.?\d*)', re.MULTILINE),  # Match "Total:" at start of line
+    _compile(r'^total\s*:?\s*5\s+([\d,]+\.?\d*)', re.MULTILINE),  # OCR error
+    _compile(r'\btotal\s*:?\s*\$?\s*([\d,]+\.?\d*)', re.MULTILINE),  # Match "Total:" as word boundary
+    _compile(r'\btotal\s*:?\s*5\s+([\d,]+\.?\d*)', re.MULTILINE),  # OCR error
+]
+
+
+def _extract_total(text: str, text_lower: str, has_digits: bool = True) -> Optional[str]:
     """Extract total amount (highest priority field)."""
-    # Try multiple patterns, prefer "Total" or "Amount Due"
-    # Handle OCR errors: $ might be read as "5" or "S"
-    patterns = [
-        r'total\s+due\s*:?\s*\$?\s*([\d,]+\.?\d*)',
-        r'total\s+due\s*:?\s*5\s+([\d,]+\.?\d*)',  # OCR error: $ -> 5
-        r'total\s+due\s*:?\s*S([\d,]+\.?\d*)',  # OCR error: $ -> S
-        r'amount\s+due\s*:?\s*\$?\s*([\d,]+\.?\d*)',
-        r'amount\s+due\s*:?\s*5\s+([\d,]+\.?\d*)',  # OCR error
-        r'grand\s+total\s*:?\s*\$?\s*([\d,]+\.?\d*)',
-        r'grand\s+total\s*:?\s*5\s+([\d,]+\.?\d*)',  # OCR error
-        r'^total\s*:?\s*\$?\s*([\d,]+\.?\d*)',  # Match "Total:" at start of line
-        r'^total\s*:?\s*5\s+([\d,]+\.?\d*)',  # OCR error
-        r'\btotal\s*:?\s*\$?\s*([\d,]+\.?\d*)',  # Match "Total:" as word boundary
-        r'\btotal\s*:?\s*5\s+([\d,]+\.?\d*)',  # OCR error
-    ]
+    if not has_digits or ('total' not in text_lower and 'due' not in text_lower):
+        return None
     
-    for pattern in patterns:
-        match = re.search(pattern, text_lower, re.MULTILINE)
+    for pattern in _TOTAL_PATTERNS:
+        match = pattern.search(text_lower)
         if match:
             value = _normalize_amount(match.group(1))
             if value:
@@ -420,27 +698,85 @@ def _extract_total(text: str, text_lower: str) -> Optional[str]:
     return None
 
 
+# Explicit currency codes: USD, EUR, GBP, etc.
+_CURRENCY_CODES = ['usd', 'eur', 'gbp', 'cad', 'aud', 'jpy', 'cny', 'inr']
+_CURRENCY_CODE_PATTERNS = [(code.upper(), _compile(rf'\b{code}\b')) for code in _CURRENCY_CODES]
+
+# Currency symbols (exact match)
+_CURRENCY_SYMBOLS = {
+    '$': 'USD',
+    '€': 'EUR',
+    '£': 'GBP',
+    '¥': 'JPY',
+    '₹': 'INR',
+}
+
+# Keyword-before / keyword-after context checks around an amount pattern
+_AMOUNT_KEYWORDS_BEFORE = r'(total|subtotal|amount|price|cost|due|fee).*?'
+_AMOUNT_KEYWORDS_AFTER = r'.*?(total|subtotal|amount|due)'
+
+
+def _with_amount_context(pattern: str, keywords_before: str = _AMOUNT_KEYWORDS_BEFORE) -> list:
+    """Compile the keyword-before and keyword-after context variants of an amount pattern."""
+    return [
+        _compile(keywords_before + pattern),  # Keyword before amount
+        _compile(pattern + _AMOUNT_KEYWORDS_AFTER),  # Amount before keyword
+    ]
+
+
+# Pattern 1: "5" followed by space and number (OCR error: "$100" -> "5 100")
+# Also handle "5" directly before number without space (OCR error: "$51798" -> "551798")
+_FIVE_ERROR_PATTERNS = [
+    (_compile(pattern), _with_amount_context(pattern))
+    for pattern in (
+        r'\b5\s+[\d,]+\.[\d]{2}\b',      # "5 100.00" (with space)
+        r'\b5\s*[\d,]+\.[\d]{2}\b',      # "5 100.00" or "5100.00" (flexible space)
+        r'\b5\d{3,}\.\d{2}\b',           # "551798.39" (no space, large number)
+    )
+]
+
+# Pattern 2: "S" followed immediately by number (OCR error: "$100" -> "S100")
+_S_ERROR_PATTERN = _compile(r'\bS[\d,]+\.[\d]{2}\b')
+_S_ERROR_CONTEXT_PATTERNS = _with_amount_context(r'S[\d,]+\.[\d]{2}')
+
+# Pattern 3: "Currency: USD" or "Currency USD" or "USD" near "Currency"
+_CURRENCY_LABEL_PATTERNS = [
+    _compile(r'currency\s*:?\s*(usd|eur|gbp|cad|aud|jpy|cny|inr)'),
+    _compile(r'(usd|eur|gbp|cad|aud|jpy|cny|inr)\s+currency'),
+]
+
+# Pattern 4: $ indicators, including OCR errors
+_DOLLAR_INDICATOR_PATTERNS = [
+    _compile(r'\b5\s+[\d,]+\.[\d]{2}\b'),  # OCR error: $ -> 5
+    _S_ERROR_PATTERN,  # OCR error: $ -> S
+    _compile(r'\b5\d{3,}\.\d{2}\b'),  # OCR error: $ -> 5 (no space)
+]
+_USD_AMOUNT_PATTERNS = [
+    (_compile(pattern), _with_amount_context(pattern, r'(total|subtotal|amount|due|price|cost|fee).*?'))
+    for pattern in (
+        r'[\d,]+\.\d{2}',  # With commas: "1,234.56" or "51,798.39"
+        r'\d+\.\d{2}',     # Without commas: "1234.56" or "51798.39"
+    )
+]
+_INVOICE_KEYWORDS = ['invoice', 'bill', 'payment', 'subtotal', 'total', 'amount', 'due', 'tax', 'vat']
+
+# Pattern 5: "5" followed by 4+ digit numbers with decimals, in invoice context
+_FIVE_LARGE_AMOUNT_PATTERN = _compile(r'\b5\s*\d{4,}\.\d{2}\b')
+_FIVE_LARGE_AMOUNT_CONTEXT_PATTERN = _compile(r'(total|subtotal|amount|due|price|cost|fee).*?5\s*\d{4,}\.\d{2}')
+
+
 def _extract_currency(text: str, text_lower: str) -> Optional[str]:
     """
     Extract currency code or symbol.
     Handles OCR errors where $ might be read as "5" or "S".
     """
     # Look for explicit currency codes: USD, EUR, GBP, etc.
-    currency_codes = ['usd', 'eur', 'gbp', 'cad', 'aud', 'jpy', 'cny', 'inr']
-    for code in currency_codes:
-        if re.search(rf'\b{code}\b', text_lower):
-            return code.upper()
+    for code, pattern in _CURRENCY_CODE_PATTERNS:
+        if pattern.search(text_lower):
+            return code
     
     # Look for currency symbols (exact match)
-    currency_symbols = {
-        '$': 'USD',
-        '€': 'EUR',
-        '£': 'GBP',
-        '¥': 'JPY',
-        '₹': 'INR',
-    }
-    
-    for symbol, code in currency_symbols.items():
+    for symbol, code in _CURRENCY_SYMBOLS.items():
         if symbol in text:
             return code
     
@@ -448,90 +784,48 @@ def _extract_currency(text: str, text_lower: str) -> Optional[str]:
     # Look for patterns like "5 100.00" or "S100.00" (common OCR errors for "$100.00")
     # Also look for amounts with currency-like patterns
     
-    # Pattern 1: "5" followed by space and number (OCR error: "$100" -> "5 100")
-    # Also handle "5" directly before number without space (OCR error: "$51798" -> "551798")
-    patterns_5_error = [
-        r'\b5\s+[\d,]+\.[\d]{2}\b',      # "5 100.00" (with space)
-        r'\b5\s*[\d,]+\.[\d]{2}\b',      # "5 100.00" or "5100.00" (flexible space)
-        r'\b5\d{3,}\.\d{2}\b',           # "551798.39" (no space, large number)
-    ]
-    
-    for pattern in patterns_5_error:
-        if re.search(pattern, text):
-            # Check if it's near amount keywords (total, subtotal, etc.)
-            # Make context check more flexible
-            amount_context_patterns = [
-                r'(total|subtotal|amount|price|cost|due|fee).*?' + pattern,  # Keyword before
-                pattern + r'.*?(total|subtotal|amount|due)',  # Amount before keyword
-            ]
-            for ctx_pattern in amount_context_patterns:
-                if re.search(ctx_pattern, text_lower):
+    # Pattern 1: "5" followed by a number, near amount keywords (total, subtotal, etc.)
+    for pattern, context_patterns in _FIVE_ERROR_PATTERNS:
+        if pattern.search(text):
+            for ctx_pattern in context_patterns:
+                if ctx_pattern.search(text_lower):
                     return 'USD'  # Most likely USD if $ is misread as 5
     
     # Pattern 2: "S" followed immediately by number (OCR error: "$100" -> "S100")
-    if re.search(r'\bS[\d,]+\.[\d]{2}\b', text):
-        # Make context check more flexible
-        amount_context_patterns = [
-            r'(total|subtotal|amount|price|cost|due|fee).*?S[\d,]+\.[\d]{2}',
-            r'S[\d,]+\.[\d]{2}.*?(total|subtotal|amount|due)',
-        ]
-        for ctx_pattern in amount_context_patterns:
-            if re.search(ctx_pattern, text_lower):
+    if _S_ERROR_PATTERN.search(text):
+        for ctx_pattern in _S_ERROR_CONTEXT_PATTERNS:
+            if ctx_pattern.search(text_lower):
                 return 'USD'
     
     # Pattern 3: Look for currency in table headers or labels
-    # "Currency: USD" or "Currency USD" or "USD" near "Currency"
-    currency_label_patterns = [
-        r'currency\s*:?\s*(usd|eur|gbp|cad|aud|jpy|cny|inr)',
-        r'(usd|eur|gbp|cad|aud|jpy|cny|inr)\s+currency',
-    ]
-    for pattern in currency_label_patterns:
-        match = re.search(pattern, text_lower)
+    for pattern in _CURRENCY_LABEL_PATTERNS:
+        match = pattern.search(text_lower)
         if match:
-            code = match.group(1).upper()
-            if code in ['USD', 'EUR', 'GBP', 'CAD', 'AUD', 'JPY', 'CNY', 'INR']:
-                return code
+            return match.group(1).upper()
     
     # Pattern 4: SAFER inference - only if $ symbol appears (via OCR errors)
     # Do NOT infer just from amount format - this breaks EUR/GBP invoices
     # Check if $ symbol appears (even as OCR error "5" or "S")
-    has_dollar_indicator = (
-        '$' in text or
-        re.search(r'\b5\s+[\d,]+\.[\d]{2}\b', text) or  # OCR error: $ -> 5
-        re.search(r'\bS[\d,]+\.[\d]{2}\b', text) or  # OCR error: $ -> S
-        re.search(r'\b5\d{3,}\.\d{2}\b', text)  # OCR error: $ -> 5 (no space)
-    )
+    has_dollar_indicator = '$' in text or any(p.search(text) for p in _DOLLAR_INDICATOR_PATTERNS)
     
     if has_dollar_indicator:
         # If we see $ indicators AND amounts in invoice context, infer USD
-        usd_amount_patterns = [
-            r'[\d,]+\.\d{2}',  # With commas: "1,234.56" or "51,798.39"
-            r'\d+\.\d{2}',     # Without commas: "1234.56" or "51798.39"
-        ]
-        
-        for pattern in usd_amount_patterns:
-            if re.search(pattern, text):
-                amount_context_patterns = [
-                    r'(total|subtotal|amount|due|price|cost|fee).*?' + pattern,  # Keyword before amount
-                    pattern + r'.*?(total|subtotal|amount|due)',  # Amount before keyword
-                ]
-                
-                for ctx_pattern in amount_context_patterns:
-                    if re.search(ctx_pattern, text_lower):
+        for pattern, context_patterns in _USD_AMOUNT_PATTERNS:
+            if pattern.search(text):
+                for ctx_pattern in context_patterns:
+                    if ctx_pattern.search(text_lower):
                         # Found amounts in invoice context with $ indicator - infer USD
                         return 'USD'
                 
                 # Also check if invoice keywords exist
-                invoice_keywords = ['invoice', 'bill', 'payment', 'subtotal', 'total', 'amount', 'due', 'tax', 'vat']
-                if any(keyword in text_lower for keyword in invoice_keywords):
+                if any(keyword in text_lower for keyword in _INVOICE_KEYWORDS):
                     return 'USD'
     
     # Pattern 5: If we see "5" followed by large numbers (OCR error for "$")
     # This is a common OCR error where "$51,798.39" becomes "5 51,798.39" or "551798.39"
-    # Look for "5" followed by 4+ digit numbers with decimals
-    if re.search(r'\b5\s*\d{4,}\.\d{2}\b', text):
+    if _FIVE_LARGE_AMOUNT_PATTERN.search(text):
         # Check if it's in invoice context
-        if re.search(r'(total|subtotal|amount|due|price|cost|fee).*?5\s*\d{4,}\.\d{2}', text_lower):
+        if _FIVE_LARGE_AMOUNT_CONTEXT_PATTERN.search(text_lower):
             return 'USD'
     
     return None
@@ -546,14 +840,15 @@ def _normalize_amount(amount_str: str) -> Optional[str]:
         return None
     
     # Remove currency symbols and whitespace
-    cleaned = re.sub(r'[$€£¥₹,\s]', '', amount_str)
+    cleaned = amount_str.translate(_AMOUNT_STRIP_TABLE)
     
     # Ensure it's a valid number
     try:
         # Try to parse as decimal
         decimal_value = Decimal(cleaned)
-        # Return as string with 2 decimal places
-        return str(decimal_value.quantize(Decimal('0.01')))
+        # Return as string with 2 decimal places (_CENT is hoisted: building
+        # Decimal('0.01') per call cost more than the quantize itself)
+        return str(decimal_value.quantize(_CENT))
     except (InvalidOperation, ValueError):
         return None
 
@@ -613,7 +908,7 @@ def _reconcile_amounts(result: dict) -> dict:
             # Check if "vat" appears in any extracted text (we don't have access to original text here)
             tax_type = "sales_tax"  # Default
             result["tax"] = {
-                "amount": str(inferred_tax.quantize(Decimal('0.01'))),
+                "amount": str(inferred_tax.quantize(_CENT)),
                 "type": tax_type,
                 "inferred": True  # Flag as inferred
             }
@@ -623,7 +918,7 @@ def _reconcile_amounts(result: dict) -> dict:
     if result.get("discount") is None and subtotal is not None and tax_amount is not None and total is not None:
         inferred_discount = subtotal + tax_amount - total
         if inferred_discount > Decimal("0"):  # Discount should be positive (we'll negate it)
-            result["discount"] = str(-inferred_discount.quantize(Decimal('0.01')))
+            result["discount"] = str(-inferred_discount.quantize(_CENT))
             return result
     
     # Case 3: Cannot reconcile - flag as inconsistent
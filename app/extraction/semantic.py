@@ -8,13 +8,201 @@ This is the highest level of extraction - understands semantic meaning:
 
 This module uses ML/LLM to understand context, not just patterns.
 """
+import json
 import logging
+import threading
+import uuid
+from functools import lru_cache
 from typing import Optional, Dict, Any
 import os
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from app.extraction.llm_cache import DEFAULT_CACHE_PATH, LLMCache, hash_input
+from app.extraction.template_cache import DEFAULT_TEMPLATE_CACHE_PATH, TemplateCache
+
 logger = logging.getLogger(__name__)
 
 
+def _json_loads(text: str) -> Any:
+    """Parse an LLM JSON response (orjson when installed)."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _json_dumps(obj: Any) -> str:
+    """Serialize a parsed response for the response cache (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj)
+
+
+# Maximum OCR text length sent to the LLM helpers (avoids token limits)
+MAX_OCR_CHARS = 4000
+
+# Long OCR text keeps its head (vendor block) and tail (totals block) and drops
+# the middle, bounded in tokens when tiktoken is installed, else in characters
+_LLM_HEAD_CHARS = 1500
+_LLM_TAIL_CHARS = MAX_OCR_CHARS - _LLM_HEAD_CHARS
+_LLM_HEAD_TOKENS = 800
+_LLM_TAIL_TOKENS = 1200
+_TRUNCATION_MARKER = "\n...[truncated]...\n"
+
+# Bump when the extraction prompt changes so cached responses are not reused
+PROMPT_VERSION = "v2"
+
+# Temperature 0 keeps extraction deterministic, which is what makes caching
+# responses valid
+_OPENAI_TEMPERATURE = 0.0
+_OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Environment configuration, read once at import (call reload_config() after
+# changing the environment, e.g. in tests)
+_SEMANTIC_ENABLED = False
+_GOOGLE_API_KEY: Optional[str] = None
+_OPENAI_API_KEY: Optional[str] = None
+_OPENAI_MODEL = "gpt-3.5-turbo"
+_GOOGLE_CREDS: Optional[str] = None
+_GOOGLE_PROJECT_ID: Optional[str] = None
+_GOOGLE_LOCATION = "us"
+_GOOGLE_PROCESSOR_ID: Optional[str] = None
+_GOOGLE_DOCAI_GCS_BUCKET: Optional[str] = None
+_LLM_CACHE_ENABLED = True
+_LLM_CACHE_PATH = DEFAULT_CACHE_PATH
+_LLM_SEMANTIC_CACHE_THRESHOLD: Optional[float] = None
+_TEMPLATE_CACHE_ENABLED = True
+_TEMPLATE_CACHE_PATH = DEFAULT_TEMPLATE_CACHE_PATH
+
+_llm_cache: Optional[LLMCache] = None
+_template_cache: Optional[TemplateCache] = None
+
+# Lazily created API clients, reused across calls (connection pool / gRPC
+# channel setup is paid once). Each is tagged with the config it was built from
+# so a changed key or processor after reload_config() rebuilds it.
+_client_lock = threading.Lock()
+_openai_client = None
+_openai_client_key: Optional[str] = None
+_docai_client = None
+_docai_processor_name: Optional[str] = None
+_docai_client_config: Optional[tuple] = None
+
+
+def reload_config() -> None:
+    """Re-read semantic extraction settings from the environment."""
+    global _SEMANTIC_ENABLED, _GOOGLE_API_KEY, _OPENAI_API_KEY, _OPENAI_MODEL
+    global _GOOGLE_CREDS, _GOOGLE_PROJECT_ID, _GOOGLE_LOCATION, _GOOGLE_PROCESSOR_ID, _GOOGLE_DOCAI_GCS_BUCKET
+    global _LLM_CACHE_ENABLED, _LLM_CACHE_PATH, _LLM_SEMANTIC_CACHE_THRESHOLD, _llm_cache
+    global _TEMPLATE_CACHE_ENABLED, _TEMPLATE_CACHE_PATH, _template_cache
+    _SEMANTIC_ENABLED = os.getenv("ENABLE_SEMANTIC_EXTRACTION", "false").lower() == "true"
+    _GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+    _OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    _OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+    _GOOGLE_CREDS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+    _GOOGLE_PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT_ID")
+    _GOOGLE_LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION", "us")
+    _GOOGLE_PROCESSOR_ID = os.getenv("GOOGLE_DOCUMENT_AI_PROCESSOR_ID")
+    _GOOGLE_DOCAI_GCS_BUCKET = os.getenv("GOOGLE_DOCUMENT_AI_GCS_BUCKET")
+    _LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    _LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH)
+    # Semantic (embedding) cache is opt-in, e.g. LLM_SEMANTIC_CACHE_THRESHOLD=0.98
+    threshold = os.getenv("LLM_SEMANTIC_CACHE_THRESHOLD")
+    _LLM_SEMANTIC_CACHE_THRESHOLD = float(threshold) if threshold else None
+    _TEMPLATE_CACHE_ENABLED = os.getenv("TEMPLATE_CACHE_ENABLED", "true").lower() == "true"
+    _TEMPLATE_CACHE_PATH = os.getenv("TEMPLATE_CACHE_PATH", DEFAULT_TEMPLATE_CACHE_PATH)
+    _llm_cache = None
+    _template_cache = None
+
+
+def _get_openai_client():
+    """Return the shared sync OpenAI client for the current API key (raises ImportError if not installed)."""
+    global _openai_client, _openai_client_key
+    client = _openai_client
+    if client is not None and _openai_client_key == _OPENAI_API_KEY:
+        return client
+    with _client_lock:
+        if _openai_client is None or _openai_client_key != _OPENAI_API_KEY:
+            from openai import OpenAI
+            _openai_client = OpenAI(api_key=_OPENAI_API_KEY)
+            _openai_client_key = _OPENAI_API_KEY
+        return _openai_client
+
+
+def _get_docai_client():
+    """Return the shared Document AI client and processor name for the current config."""
+    global _docai_client, _docai_processor_name, _docai_client_config
+    config = (_GOOGLE_CREDS, _GOOGLE_PROJECT_ID, _GOOGLE_LOCATION, _GOOGLE_PROCESSOR_ID)
+    if _docai_client is not None and _docai_client_config == config:
+        return _docai_client, _docai_processor_name
+    with _client_lock:
+        if _docai_client is None or _docai_client_config != config:
+            from google.cloud import documentai
+            client = documentai.DocumentProcessorServiceClient()
+            _docai_processor_name = client.processor_path(_GOOGLE_PROJECT_ID, _GOOGLE_LOCATION, _GOOGLE_PROCESSOR_ID)
+            _docai_client = client
+            _docai_client_config = config
+        return _docai_client, _docai_processor_name
+
+
+def _get_llm_cache() -> Optional[LLMCache]:
+    """Return the shared response cache, or None when caching is disabled or unavailable."""
+    global _llm_cache
+    if not _LLM_CACHE_ENABLED:
+        return None
+    if _llm_cache is None:
+        try:
+            _llm_cache = LLMCache(_LLM_CACHE_PATH, similarity_threshold=_LLM_SEMANTIC_CACHE_THRESHOLD)
+        except Exception as e:
+            logger.warning(f"LLM response cache unavailable: {e}")
+            return None
+    return _llm_cache
+
+
+def _get_template_cache() -> Optional[TemplateCache]:
+    """Return the shared vendor-template cache, or None when disabled or unavailable."""
+    global _template_cache
+    if not _TEMPLATE_CACHE_ENABLED:
+        return None
+    if _template_cache is None:
+        try:
+            _template_cache = TemplateCache(_TEMPLATE_CACHE_PATH)
+        except Exception as e:
+            logger.warning(f"Invoice template cache unavailable: {e}")
+            return None
+    return _template_cache
+
+
+reload_config()
+
+
+def _trim_for_llm(text: Optional[str]) -> str:
+    """
+    Shorten OCR text for an LLM prompt, keeping its beginning and end.
+    
+    The vendor block is at the top of an invoice and the totals at the bottom,
+    so a plain prefix slice loses the most valuable part of long invoices.
+    """
+    text = text or ""
+    if len(text) <= MAX_OCR_CHARS:
+        return text
+    
+    encoding = _get_token_encoding(_OPENAI_MODEL)
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        if len(tokens) <= _LLM_HEAD_TOKENS + _LLM_TAIL_TOKENS:
+            return text
+        return (
+            encoding.decode(tokens[:_LLM_HEAD_TOKENS])
+            + _TRUNCATION_MARKER
+            + encoding.decode(tokens[-_LLM_TAIL_TOKENS:])
+        )
+    
+    return text[:_LLM_HEAD_CHARS] + _TRUNCATION_MARKER + text[-_LLM_TAIL_CHARS:]
+
+
 def extract_semantic_fields(
     file_path: str, 
     ocr_text: str, 
@@ -39,31 +227,59 @@ def extract_semantic_fields(
         Returns empty dict if semantic extraction fails or is disabled.
     """
     # Check if semantic extraction is enabled
-    semantic_enabled = os.getenv("ENABLE_SEMANTIC_EXTRACTION", "false").lower() == "true"
-    
-    if not semantic_enabled:
+    if not _SEMANTIC_ENABLED:
         logger.debug("Semantic extraction is disabled (set ENABLE_SEMANTIC_EXTRACTION=true to enable)")
         return {}
     
+    # Known vendor layout: re-read the fields with the learned template and
+    # skip the LLM entirely (uses the full text, before truncation)
+    template_cache = _get_template_cache() if ocr_text else None
+    if template_cache is not None:
+        try:
+            fields = template_cache.lookup(ocr_text)
+            if fields:
+                logger.info("Semantic extraction served from vendor template cache")
+                return fields
+        except Exception as e:
+            logger.warning(f"Invoice template lookup failed: {e}")
+    
+    result = _extract_with_providers(
+        file_path, _trim_for_llm(ocr_text), structural_fields, validation_error, ocr_error_hint
+    )
+    
+    if result and template_cache is not None:
+        try:
+            template_cache.learn(ocr_text, result)
+        except Exception as e:
+            logger.warning(f"Invoice template learning failed: {e}")
+    
+    return result
+
+
+def _extract_with_providers(
+    file_path: str,
+    ocr_text: str,
+    structural_fields: Dict[str, Any] = None,
+    validation_error: Optional[str] = None,
+    ocr_error_hint: str = ""
+) -> Dict[str, Any]:
+    """Run the configured semantic providers in priority order on (trimmed) OCR text."""
     # Try Google Gemini API first (if configured) - cheaper/faster than OpenAI
-    google_api_key = os.getenv("GOOGLE_API_KEY")
-    if google_api_key:
+    if _GOOGLE_API_KEY:
         try:
             return _extract_with_gemini(ocr_text, structural_fields, validation_error, ocr_error_hint)
         except Exception as e:
             logger.warning(f"Google Gemini semantic extraction failed: {e}")
     
     # Try OpenAI API (if configured)
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    if openai_api_key:
+    if _OPENAI_API_KEY:
         try:
             return _extract_with_openai(ocr_text, structural_fields, validation_error, ocr_error_hint)
         except Exception as e:
             logger.warning(f"OpenAI semantic extraction failed: {e}")
     
     # Try Google Document AI (if configured)
-    google_credentials = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-    if google_credentials:
+    if _GOOGLE_CREDS:
         try:
             return _extract_with_document_ai(file_path)
         except Exception as e:
@@ -92,7 +308,7 @@ def _extract_with_gemini(
         logger.warning("Google Generative AI library not installed. Install with: pip install google-generativeai")
         return {}
     
-    api_key = os.getenv("GOOGLE_API_KEY")
+    api_key = _GOOGLE_API_KEY
     if not api_key:
         return {}
     
@@ -116,9 +332,9 @@ def _extract_with_gemini(
 Use semantic understanding to identify fields even if they're not explicitly labeled.
 
 {context}{validation_context}{ocr_context}OCR Text:
-{ocr_text[:4000]}
+{ocr_text}
 
-Note: Text truncated to 4000 characters to avoid token limits.
+Note: Long text keeps only its beginning and end (the middle is marked ...[truncated]...) to avoid token limits.
 
 CRITICAL REQUIREMENTS:
 1. Ensure total = subtotal - discount + tax (within 0.02 cent tolerance)
@@ -150,7 +366,6 @@ Return only valid JSON with null for missing fields. Example:
             )
         )
         
-        import json
         result_text = response.text.strip()
         
         # Remove markdown code blocks if present
@@ -159,7 +374,7 @@ Return only valid JSON with null for missing fields. Example:
             if result_text.startswith("json"):
                 result_text = result_text[4:]
         
-        result = json.loads(result_text)
+        result = _json_loads(result_text)
         logger.info("Google Gemini semantic extraction completed successfully")
         return result
         
@@ -180,39 +395,138 @@ def _extract_with_openai(
     This understands context: "Total" = final balance, not subtotal.
     Handles OCR errors and validation failures from Level 2.
     """
+    if not _OPENAI_API_KEY:
+        return {}
+    
     try:
-        from openai import OpenAI
+        client = _get_openai_client()
     except ImportError:
         logger.warning("OpenAI library not installed. Install with: pip install openai")
         return {}
     
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        return {}
-    
-    client = OpenAI(api_key=api_key)
-    
-    # Build context from structural fields if available
-    context = ""
-    if structural_fields:
-        context = f"Previously extracted fields (may contain errors): {structural_fields}\n\n"
+    prompt = _build_openai_prompt(ocr_text, structural_fields, validation_error, ocr_error_hint)
     
-    # Add validation error context if Level 2 validation failed
-    validation_context = ""
-    if validation_error:
-        validation_context = f"IMPORTANT: Level 2 extraction failed validation: {validation_error}\n"
-        validation_context += "Please carefully re-extract fields to fix these issues.\n\n"
+    # Repeat templates (recurring bills) hit the cache instead of the API.
+    # Only deterministic (temperature 0) responses are cached.
+    cache = _get_llm_cache() if _OPENAI_TEMPERATURE == 0 else None
+    input_hash = hash_input(f"{_OPENAI_MODEL}\n{prompt}")
+    embedding = None
+    if cache is not None:
+        try:
+            cached = cache.get_exact(input_hash, PROMPT_VERSION)
+            if cached is None and cache.semantic_enabled:
+                embedding = client.embeddings.create(
+                    model=_OPENAI_EMBEDDING_MODEL, input=ocr_text
+                ).data[0].embedding
+                cached = cache.get_similar(embedding, PROMPT_VERSION)
+            if cached is not None:
+                logger.info("OpenAI semantic extraction served from cache")
+                return _json_loads(cached)
+        except Exception as e:
+            logger.warning(f"LLM response cache lookup failed: {e}")
     
-    # Add OCR error hint
-    ocr_context = ocr_error_hint if ocr_error_hint else ""
+    try:
+        response = client.chat.completions.create(
+            model=_OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": "You are an expert at extracting structured data from invoices. Return only valid JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=_OPENAI_TEMPERATURE,  # Deterministic output for consistent extraction
+            max_tokens=_OPENAI_MAX_RESULT_TOKENS,
+            response_format=_openai_response_format(_OPENAI_MODEL)
+        )
+        
+        result = _json_loads(response.choices[0].message.content)
+        logger.info("OpenAI semantic extraction completed successfully")
+        
+        if cache is not None:
+            try:
+                cache.put(input_hash, PROMPT_VERSION, _json_dumps(result), embedding)
+            except Exception as e:
+                logger.warning(f"LLM response cache write failed: {e}")
+        
+        return result
+        
+    except Exception as e:
+        logger.error(f"OpenAI API call failed: {e}")
+        return {}
+
+
+# JSON schema of one extracted invoice (OpenAI structured outputs, strict mode:
+# every property required, nullable via type unions)
+_NULLABLE_STRING = {"type": ["string", "null"]}
+INVOICE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "invoice_number": _NULLABLE_STRING,
+        "invoice_date": _NULLABLE_STRING,
+        "vendor_name": _NULLABLE_STRING,
+        "subtotal": _NULLABLE_STRING,
+        "discount": _NULLABLE_STRING,
+        "tax": {
+            "anyOf": [
+                {
+                    "type": "object",
+                    "properties": {
+                        "amount": {"type": "string"},
+                        "type": {"type": "string", "enum": ["sales_tax", "vat"]},
+                    },
+                    "required": ["amount", "type"],
+                    "additionalProperties": False,
+                },
+                {"type": "null"},
+            ]
+        },
+        "total": _NULLABLE_STRING,
+        "currency": _NULLABLE_STRING,
+    },
+    "required": [
+        "invoice_number", "invoice_date", "vendor_name", "subtotal",
+        "discount", "tax", "total", "currency",
+    ],
+    "additionalProperties": False,
+}
+
+# Output budget for one invoice's JSON (no prose or markdown in JSON mode)
+_OPENAI_MAX_RESULT_TOKENS = 250
+
+# Model families that accept strict json_schema response formats; older models
+# (e.g. the gpt-3.5-turbo default) get plain JSON mode
+_OPENAI_STRUCTURED_OUTPUT_PREFIXES = ("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")
+
+
+def _openai_response_format(model: str) -> Dict[str, Any]:
+    """Return the strictest response_format the model supports."""
+    if model.startswith(_OPENAI_STRUCTURED_OUTPUT_PREFIXES):
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "invoice",
+                "schema": INVOICE_SCHEMA,
+                "strict": True,
+            },
+        }
+    return {"type": "json_object"}
+
+
+def _build_openai_prompt(
+    ocr_text: str,
+    structural_fields: Dict[str, Any] = None,
+    validation_error: Optional[str] = None,
+    ocr_error_hint: str = ""
+) -> str:
+    """Build the single-invoice OpenAI extraction prompt."""
+    # Structural fields, Level 2 validation error and OCR hint
+    context = _build_openai_context(structural_fields, validation_error, ocr_error_hint)
     
-    prompt = f"""Extract invoice fields from the following OCR text. 
+    return f"""Extract invoice fields from the following OCR text. 
 Use semantic understanding to identify fields even if they're not explicitly labeled.
 
-{context}{validation_context}{ocr_context}OCR Text:
-{ocr_text[:4000]}
+{context}OCR Text:
+{ocr_text}
 
-Note: Text truncated to 4000 characters to avoid token limits.
+Note: Long text keeps only its beginning and end (the middle is marked ...[truncated]...) to avoid token limits.
 
 CRITICAL REQUIREMENTS:
 1. Ensure total = subtotal - discount + tax (within 0.02 cent tolerance)
@@ -233,34 +547,96 @@ Extract the following fields (return JSON only, no explanation):
 Return only valid JSON with null for missing fields. Example:
 {{"invoice_number": "INV-001", "invoice_date": "2025-12-30", "vendor_name": "Acme Corp", "subtotal": "1000.00", "discount": "-50.00", "tax": {{"amount": "100.00", "type": "sales_tax"}}, "total": "1050.00", "currency": "USD"}}
 """
+
+
+def _build_openai_context(
+    structural_fields: Dict[str, Any] = None,
+    validation_error: Optional[str] = None,
+    ocr_error_hint: str = ""
+) -> str:
+    """Build the per-invoice context block that precedes the OCR text in OpenAI prompts."""
+    # Build context from structural fields if available
+    context = ""
+    if structural_fields:
+        context = f"Previously extracted fields (may contain errors): {structural_fields}\n\n"
+    
+    # Add validation error context if Level 2 validation failed
+    if validation_error:
+        context += f"IMPORTANT: Level 2 extraction failed validation: {validation_error}\n"
+        context += "Please carefully re-extract fields to fix these issues.\n\n"
     
+    # Add OCR error hint
+    if ocr_error_hint:
+        context += ocr_error_hint
+    
+    return context
+
+
+@lru_cache(maxsize=4)
+def _get_token_encoding(model: str):
+    """Return the tiktoken encoding for a model, or None when tiktoken is not installed."""
     try:
-        response = client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
-            messages=[
-                {"role": "system", "content": "You are an expert at extracting structured data from invoices. Return only valid JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1,  # Low temperature for consistent extraction
-            max_tokens=500
-        )
-        
-        import json
-        result_text = response.choices[0].message.content.strip()
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+# Document AI inline requests are capped at 20 MB; larger files go through a
+# GCS batch request (kept below the cap to leave room for request overhead)
+_DOCAI_INLINE_MAX_BYTES = 15 * 1024 * 1024
+_DOCAI_BATCH_TIMEOUT_SECONDS = 300
+
+
+def _process_document_via_gcs(client, processor_name: str, file_path: str, mime_type: str) -> list:
+    """
+    Process a large file with a Document AI batch request through GCS.
+    
+    The file is uploaded from disk (never fully loaded into memory), processed
+    as a long-running operation and the sharded JSON output is read back.
+    Returns the entities of all output shards; the GCS objects are deleted.
+    """
+    from google.cloud import documentai, storage
+    
+    bucket = storage.Client().bucket(_GOOGLE_DOCAI_GCS_BUCKET)
+    prefix = f"docai/{uuid.uuid4().hex}"
+    input_blob = bucket.blob(f"{prefix}/input/{os.path.basename(file_path)}")
+    
+    try:
+        input_blob.upload_from_filename(file_path, content_type=mime_type)
         
-        # Remove markdown code blocks if present
-        if result_text.startswith("```"):
-            result_text = result_text.split("```")[1]
-            if result_text.startswith("json"):
-                result_text = result_text[4:]
+        request = documentai.BatchProcessRequest(
+            name=processor_name,
+            input_documents=documentai.BatchDocumentsInputConfig(
+                gcs_documents=documentai.GcsDocuments(documents=[
+                    documentai.GcsDocument(gcs_uri=f"gs://{bucket.name}/{input_blob.name}", mime_type=mime_type)
+                ])
+            ),
+            document_output_config=documentai.DocumentOutputConfig(
+                gcs_output_config=documentai.DocumentOutputConfig.GcsOutputConfig(
+                    gcs_uri=f"gs://{bucket.name}/{prefix}/output/"
+                )
+            ),
+        )
         
-        result = json.loads(result_text)
-        logger.info("OpenAI semantic extraction completed successfully")
-        return result
+        operation = client.batch_process_documents(request=request)
+        operation.result(timeout=_DOCAI_BATCH_TIMEOUT_SECONDS)
         
-    except Exception as e:
-        logger.error(f"OpenAI API call failed: {e}")
-        return {}
+        entities = []
+        for blob in bucket.list_blobs(prefix=f"{prefix}/output/"):
+            if blob.name.endswith(".json"):
+                shard = documentai.Document.from_json(blob.download_as_bytes(), ignore_unknown_fields=True)
+                entities.extend(shard.entities)
+        return entities
+    finally:
+        for blob in bucket.list_blobs(prefix=prefix):
+            try:
+                blob.delete()
+            except Exception as e:
+                logger.warning(f"Failed to delete Document AI staging object {blob.name}: {e}")
 
 
 def _extract_with_document_ai(file_path: str) -> Dict[str, Any]:
@@ -275,22 +651,12 @@ def _extract_with_document_ai(file_path: str) -> Dict[str, Any]:
         logger.warning("Google Cloud Document AI library not installed")
         return {}
     
-    credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-    project_id = os.getenv("GOOGLE_CLOUD_PROJECT_ID")
-    location = os.getenv("GOOGLE_CLOUD_LOCATION", "us")
-    processor_id = os.getenv("GOOGLE_DOCUMENT_AI_PROCESSOR_ID")
-    
-    if not all([credentials_path, project_id, processor_id]):
+    if not all([_GOOGLE_CREDS, _GOOGLE_PROJECT_ID, _GOOGLE_PROCESSOR_ID]):
         logger.warning("Google Document AI not fully configured (missing credentials, project_id, or processor_id)")
         return {}
     
     try:
-        client = documentai.DocumentProcessorServiceClient()
-        processor_name = client.processor_path(project_id, location, processor_id)
-        
-        # Read file (PDF or image)
-        with open(file_path, "rb") as f:
-            file_content = f.read()
+        client, processor_name = _get_docai_client()
         
         # Determine MIME type
         from app.image_extraction import is_image_file
@@ -299,20 +665,35 @@ def _extract_with_document_ai(file_path: str) -> Dict[str, Any]:
         else:
             mime_type = "application/pdf"
         
-        # Create request
-        raw_document = documentai.RawDocument(
-            content=file_content,
-            mime_type=mime_type
-        )
-        
-        request = documentai.ProcessRequest(
-            name=processor_name,
-            raw_document=raw_document
-        )
-        
-        # Process document
-        response = client.process_document(request=request)
-        document = response.document
+        if os.path.getsize(file_path) > _DOCAI_INLINE_MAX_BYTES:
+            # Too large for an inline request: stream it to GCS instead of
+            # reading the whole file into memory
+            if not _GOOGLE_DOCAI_GCS_BUCKET:
+                logger.warning(
+                    "File too large for inline Document AI processing "
+                    "(set GOOGLE_DOCUMENT_AI_GCS_BUCKET to enable batch processing)"
+                )
+                return {}
+            entities = _process_document_via_gcs(client, processor_name, file_path, mime_type)
+        else:
+            # Read file (PDF or image)
+            with open(file_path, "rb") as f:
+                file_content = f.read()
+            
+            # Create request
+            raw_document = documentai.RawDocument(
+                content=file_content,
+                mime_type=mime_type
+            )
+            
+            request = documentai.ProcessRequest(
+                name=processor_name,
+                raw_document=raw_document
+            )
+            
+            # Process document
+            response = client.process_document(request=request)
+            entities = response.document.entities
         
         # Extract fields from Document AI response
         result = {
@@ -328,7 +709,7 @@ def _extract_with_document_ai(file_path: str) -> Dict[str, Any]:
         
         # Document AI provides entities with semantic understanding
         # Map Document AI entities to our fields
-        for entity in document.entities:
+        for entity in entities:
             entity_type = entity.type_
             entity_value = entity.text_anchor.content if entity.text_anchor else None
             
@@ -9,11 +9,142 @@ This module understands document geometry:
 Unlike basic OCR, this parser recognizes structure, not just text.
 """
 import logging
-from typing import Optional, Dict, List, Tuple, Any
+import re
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Optional, Dict, Iterator, List, Tuple, Any
 import os
 
+from app.image_extraction import is_image_file
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+try:
+    import ahocorasick  # pyahocorasick: one pass over the text for all keywords
+except ImportError:
+    ahocorasick = None
+
 logger = logging.getLogger(__name__)
 
+# Amount cleanup: currency symbols, thousands separators and every character
+# the regex class \s matches (no Unicode whitespace lies above U+3000)
+_AMOUNT_STRIP_TABLE = str.maketrans(
+    '', '', '$€£¥₹,' + ''.join(chr(c) for c in range(0x3001) if chr(c).isspace())
+)
+_CENT = Decimal('0.01')
+
+# Common date patterns
+_DATE_PATTERNS = [
+    re.compile(r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})'),  # YYYY-MM-DD
+    re.compile(r'(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})'),  # DD/MM/YYYY or MM/DD/YYYY
+]
+
+_CURRENCY_CODES = ('USD', 'EUR', 'GBP', 'CAD', 'AUD', 'JPY', 'CNY', 'INR')
+_CURRENCY_SYMBOLS = {
+    '$': 'USD',
+    '€': 'EUR',
+    '£': 'GBP',
+    '¥': 'JPY',
+    '₹': 'INR',
+}
+
+# Words are grouped into lines by top position rounded to this many points
+_LINE_BUCKET = 5
+# Below this many words the pure-Python grouping beats NumPy's call overhead
+_NUMPY_MIN_WORDS = 256
+
+# Geometry keyword flags: which amount fields a line's keywords point at
+_KW_TOTAL = 1
+_KW_SUBTOTAL = 2
+_KW_TAX = 4
+_KW_VAT = 8
+_GEOMETRY_KEYWORDS = {
+    "total": _KW_TOTAL,  # also hit inside "subtotal", as with a substring check
+    "amount due": _KW_TOTAL,
+    "subtotal": _KW_SUBTOTAL,
+    "sub total": _KW_SUBTOTAL,
+    "tax": _KW_TAX,
+    "vat": _KW_VAT,
+}
+_GEOMETRY_FIELDS = (
+    ("total", _KW_TOTAL),
+    ("subtotal", _KW_SUBTOTAL),
+    ("tax", _KW_TAX),
+    ("vat", _KW_VAT),
+)
+
+if ahocorasick is not None:
+    _KEYWORD_AUTOMATON = ahocorasick.Automaton()
+    for _keyword, _flag in _GEOMETRY_KEYWORDS.items():
+        _KEYWORD_AUTOMATON.add_word(_keyword, (len(_keyword), _flag))
+    _KEYWORD_AUTOMATON.make_automaton()
+else:
+    _KEYWORD_AUTOMATON = None
+
+# Fallback scan: a lookahead alternation reports overlapping hits ("subtotal"
+# and the "total" inside it) because each match consumes no characters
+_KEYWORD_RE = re.compile(
+    '(?=(' + '|'.join(re.escape(k) for k in sorted(_GEOMETRY_KEYWORDS, key=len, reverse=True)) + '))'
+)
+
+
+def _group_words_into_lines(words: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    Group words by approximate Y position into lines, ordered top to bottom.
+    
+    Words keep their original order within a line. Large pages use one NumPy
+    stable sort over the rounded positions instead of a dict lookup per word;
+    np.rint rounds half to even like round(), so both paths group identically.
+    """
+    words = [word for word in words if word.get('text')]
+    
+    if np is not None and len(words) >= _NUMPY_MIN_WORDS:
+        tops = np.fromiter((word.get('top', 0) for word in words), dtype=np.float64, count=len(words))
+        bins = np.rint(tops / _LINE_BUCKET).astype(np.int64)
+        order = np.argsort(bins, kind='stable')
+        split_idx = np.flatnonzero(np.diff(bins[order])) + 1
+        return [[words[i] for i in group] for group in np.split(order, split_idx)]
+    
+    lines = defaultdict(list)
+    for word in words:
+        # Round Y position to group words on same line
+        y_pos = round(word.get('top', 0) / _LINE_BUCKET) * _LINE_BUCKET
+        lines[y_pos].append(word)
+    return [lines[y_pos] for y_pos in sorted(lines.keys())]
+
+
+def _keyword_flags_per_line(line_texts: List[str]) -> List[int]:
+    """
+    Scan all (lowercased) lines for the geometry keywords in a single pass.
+    
+    Returns one bitmask of _KW_* flags per line.
+    """
+    full_text = "\n".join(line_texts)
+    line_starts = []
+    offset = 0
+    for line_text in line_texts:
+        line_starts.append(offset)
+        offset += len(line_text) + 1
+    
+    flags = [0] * len(line_texts)
+    if _KEYWORD_AUTOMATON is not None:
+        for end_idx, (length, flag) in _KEYWORD_AUTOMATON.iter(full_text):
+            flags[bisect_right(line_starts, end_idx - length + 1) - 1] |= flag
+    else:
+        for match in _KEYWORD_RE.finditer(full_text):
+            flags[bisect_right(line_starts, match.start()) - 1] |= _GEOMETRY_KEYWORDS[match.group(1)]
+    return flags
+
 
 def extract_structural_fields(file_path: str, ocr_text: str) -> Dict[str, Any]:
     """
@@ -36,14 +167,11 @@ def extract_structural_fields(file_path: str, ocr_text: str) -> Dict[str, Any]:
     # Structural extraction works best with PDFs
     # For images, we can't extract tables/geometry easily, so return empty
     # (Level 1.5 rule-based extraction will handle images)
-    from app.image_extraction import is_image_file
     if is_image_file(file_path):
         logger.debug(f"Structural extraction skipped for image file: {file_path}")
         return {}
     
-    try:
-        import pdfplumber
-    except ImportError:
+    if pdfplumber is None:
         logger.warning("pdfplumber not available for structural extraction")
         return {}
     
@@ -57,8 +185,10 @@ def extract_structural_fields(file_path: str, ocr_text: str) -> Dict[str, Any]:
             # Analyze first page (most invoices are single-page)
             page = pdf.pages[0]
             
-            # Extract tables (structural understanding)
-            tables = page.extract_tables()
+            # Extract tables (structural understanding). The default "lines"
+            # strategy builds tables from drawn rules, so a page without any
+            # line/rect edges cannot contain one - skip the table finder there
+            tables = page.extract_tables() if page.edges else []
             if tables:
                 logger.info(f"Found {len(tables)} table(s) in PDF - using structural analysis")
                 table_fields = _extract_from_tables(tables)
@@ -87,6 +217,17 @@ def extract_structural_fields(file_path: str, ocr_text: str) -> Dict[str, Any]:
         return {}
 
 
+# Fields _extract_from_tables can fill (vendor name never comes from a table row)
+_TABLE_INVOICE_NUMBER = 1
+_TABLE_INVOICE_DATE = 2
+_TABLE_SUBTOTAL = 4
+_TABLE_TAX = 8
+_TABLE_VAT = 16
+_TABLE_TOTAL = 32
+_TABLE_CURRENCY = 64
+_TABLE_ALL_FIELDS = 127
+
+
 def _extract_from_tables(tables: List[List[List[Optional[str]]]]) -> Dict[str, Optional[str]]:
     """
     Extract invoice fields from PDF tables using structural understanding.
@@ -104,6 +245,10 @@ def _extract_from_tables(tables: List[List[List[Optional[str]]]]) -> Dict[str, O
         "currency": None,
     }
     
+    # Fields set so far, as _TABLE_* bits: stop scanning once every field a
+    # table row can fill has been found (the remaining rows are line items)
+    filled = 0
+    
     for table in tables:
         if not table or len(table) == 0:
             continue
@@ -130,42 +275,52 @@ def _extract_from_tables(tables: List[List[List[Optional[str]]]]) -> Dict[str, O
             if "invoice" in label_lower and ("number" in label_lower or "#" in label_lower or "no" in label_lower):
                 if not result["invoice_number"] and value:
                     result["invoice_number"] = value.strip()
+                    filled |= _TABLE_INVOICE_NUMBER
             
             elif "date" in label_lower and ("invoice" in label_lower or "billing" in label_lower):
                 if not result["invoice_date"] and value:
                     date_str = _normalize_date(value)
                     if date_str:
                         result["invoice_date"] = date_str
+                        filled |= _TABLE_INVOICE_DATE
             
             elif "subtotal" in label_lower or "sub total" in label_lower:
                 if not result["subtotal"] and value:
                     amount = _normalize_amount(value)
                     if amount:
                         result["subtotal"] = amount
+                        filled |= _TABLE_SUBTOTAL
             
             elif "tax" in label_lower and "vat" not in label_lower:
                 if not result["tax"] and value:
                     amount = _normalize_amount(value)
                     if amount:
                         result["tax"] = amount
+                        filled |= _TABLE_TAX
             
             elif "vat" in label_lower:
                 if not result["vat"] and value:
                     amount = _normalize_amount(value)
                     if amount:
                         result["vat"] = amount
+                        filled |= _TABLE_VAT
             
             elif "total" in label_lower and ("due" in label_lower or "amount" in label_lower or label_lower == "total"):
                 if not result["total"] and value:
                     amount = _normalize_amount(value)
                     if amount:
                         result["total"] = amount
+                        filled |= _TABLE_TOTAL
             
             elif "currency" in label_lower or "curr" in label_lower:
                 if not result["currency"] and value:
                     currency = _extract_currency_code(value)
                     if currency:
                         result["currency"] = currency
+                        filled |= _TABLE_CURRENCY
+            
+            if filled == _TABLE_ALL_FIELDS:
+                return result
     
     return result
 
@@ -191,67 +346,41 @@ def _extract_from_geometry(words: List[Dict[str, Any]], ocr_text: str) -> Dict[s
         return result
     
     # Group words by approximate Y position (lines)
-    from collections import defaultdict
-    lines = defaultdict(list)
-    
-    for word in words:
-        if not word.get('text'):
-            continue
-        # Round Y position to group words on same line
-        y_pos = round(word.get('top', 0) / 5) * 5
-        lines[y_pos].append(word)
+    sorted_lines = _group_words_into_lines(words)
     
     # Analyze spatial relationships
     # Look for "Total" label and find amount nearby (same line or next line)
-    for y_pos in sorted(lines.keys()):
-        line_words = lines[y_pos]
-        line_text = " ".join([w.get('text', '') for w in line_words]).lower()
-        
-        # Check for "total" keyword
-        if "total" in line_text or "amount due" in line_text:
-            # Find amount on same line or nearby
-            for word in line_words:
-                text = word.get('text', '')
-                amount = _normalize_amount(text)
-                if amount:
-                    if not result["total"]:
-                        result["total"] = amount
-                        break
+    line_flags = _keyword_flags_per_line(
+        [" ".join([w.get('text', '') for w in line_words]).lower() for line_words in sorted_lines]
+    )
+    
+    found = 0
+    all_found = _KW_TOTAL | _KW_SUBTOTAL | _KW_TAX | _KW_VAT
+    for line_words, flags in zip(sorted_lines, line_flags):
+        # "tax" only counts on lines without "vat"
+        if flags & _KW_VAT:
+            flags &= ~_KW_TAX
         
-        # Check for "subtotal"
-        if "subtotal" in line_text or "sub total" in line_text:
-            for word in line_words:
-                text = word.get('text', '')
-                amount = _normalize_amount(text)
-                if amount:
-                    if not result["subtotal"]:
-                        result["subtotal"] = amount
-                        break
+        # Only fields not filled by an earlier line
+        flags &= ~found
+        if not flags:
+            continue
         
-        # Check for "tax"
-        if "tax" in line_text and "vat" not in line_text:
-            for word in line_words:
-                text = word.get('text', '')
-                amount = _normalize_amount(text)
-                if amount:
-                    if not result["tax"]:
-                        result["tax"] = amount
+        for field, flag in _GEOMETRY_FIELDS:
+            if flags & flag:
+                # Find amount on same line
+                for word in line_words:
+                    amount = _normalize_amount(word.get('text', ''))
+                    if amount:
+                        result[field] = amount
+                        found |= flag
                         break
         
-        # Check for "vat"
-        if "vat" in line_text:
-            for word in line_words:
-                text = word.get('text', '')
-                amount = _normalize_amount(text)
-                if amount:
-                    if not result["vat"]:
-                        result["vat"] = amount
-                        break
+        if found == all_found:
+            break
     
     # Vendor name is usually in top-left region (first few lines)
-    top_lines = sorted(lines.keys())[:5]
-    for y_pos in top_lines:
-        line_words = lines[y_pos]
+    for line_words in sorted_lines[:5]:
         line_text = " ".join([w.get('text', '') for w in line_words])
         
         # Skip common header words
@@ -284,20 +413,29 @@ def _extract_form_fields(page: Any, words: List[Dict[str, Any]]) -> Dict[str, Op
     return result
 
 
+# Whole-number digits of an amount the fast path in _normalize_amount returns
+# as-is: with its 2 decimals, at most the Decimal context precision (28)
+_FAST_PATH_MAX_WHOLE_DIGITS = 26
+
+
 def _normalize_amount(amount_str: str) -> Optional[str]:
     """Normalize amount string to decimal format."""
     if not amount_str:
         return None
     
-    import re
-    from decimal import Decimal, InvalidOperation
-    
     # Remove currency symbols and whitespace
-    cleaned = re.sub(r'[$€£¥₹,\s]', '', str(amount_str))
+    cleaned = str(amount_str).translate(_AMOUNT_STRIP_TABLE)
+    
+    # Common case: already canonical ("1234.56"), so skip Decimal entirely.
+    # Longer amounts go through quantize, which rejects them (returns None)
+    whole, _, fraction = cleaned.partition('.')
+    if (len(fraction) == 2 and cleaned.isascii() and whole.isdigit() and fraction.isdigit()
+            and (whole[0] != '0' or whole == '0') and len(whole) <= _FAST_PATH_MAX_WHOLE_DIGITS):
+        return cleaned
     
     try:
         decimal_value = Decimal(cleaned)
-        return str(decimal_value.quantize(Decimal('0.01')))
+        return str(decimal_value.quantize(_CENT))
     except (InvalidOperation, ValueError):
         return None
 
@@ -307,17 +445,8 @@ def _normalize_date(date_str: str) -> Optional[str]:
     if not date_str:
         return None
     
-    import re
-    from datetime import datetime
-    
-    # Common date patterns
-    patterns = [
-        r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})',  # YYYY-MM-DD
-        r'(\d{1,2})[-/.](\d{1,2})[-/.](\d{4})',  # DD/MM/YYYY or MM/DD/YYYY
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, date_str)
+    for pattern in _DATE_PATTERNS:
+        match = pattern.search(date_str)
         if match:
             try:
                 if len(match.group(1)) == 4:
@@ -340,29 +469,31 @@ def _normalize_date(date_str: str) -> Optional[str]:
     return None
 
 
+def normalize_date(date_str: str) -> Optional[str]:
+    """Date string as ISO YYYY-MM-DD, or None if it does not parse."""
+    return _normalize_date(date_str)
+
+
+def find_dates(text: str) -> Iterator[Tuple[int, str]]:
+    """Yield (start offset, ISO date) for each date written in text."""
+    for pattern in _DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            date = _normalize_date(match.group(0))
+            if date:
+                yield match.start(), date
+
+
 def _extract_currency_code(text: str) -> Optional[str]:
     """Extract currency code from text."""
     if not text:
         return None
     
-    import re
-    
     text_upper = text.upper()
-    currency_codes = ['USD', 'EUR', 'GBP', 'CAD', 'AUD', 'JPY', 'CNY', 'INR']
-    
-    for code in currency_codes:
+    for code in _CURRENCY_CODES:
         if code in text_upper:
             return code
     
-    currency_symbols = {
-        '$': 'USD',
-        '€': 'EUR',
-        '£': 'GBP',
-        '¥': 'JPY',
-        '₹': 'INR',
-    }
-    
-    for symbol, code in currency_symbols.items():
+    for symbol, code in _CURRENCY_SYMBOLS.items():
         if symbol in text:
             return code
     
@@ -0,0 +1,359 @@
+"""
+Vendor-template cache for semantic extraction.
+
+Invoices from the same vendor keep the same layout month to month. After a
+successful LLM extraction we remember where each field sat - the label text
+in front of its value on the same line - under a layout fingerprint (a 64-bit
+SimHash of line indentation and first words). A new invoice whose fingerprint
+is within a few bits of a stored one has its fields re-read with those labels
+and the LLM call is skipped.
+
+If any learned field can no longer be found, the re-read amounts do not
+reconcile, the stored vendor name is not in the text or the currency found in
+it differs, the template has drifted (or is another vendor's on a common
+layout): the caller falls through to the LLM and the entry is relearned from
+the new result.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.extraction.rule_based import detect_currency, normalize_amount
+from app.extraction.structural import find_dates, normalize_date
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE_CACHE_PATH = os.path.join(".cache", "templates.sqlite")
+
+# Fingerprints within this many differing bits are the same layout. Different
+# vendors using the same invoice software can be only a few bits apart, so
+# this is kept tight; a false match must also get past apply_recipe (labels,
+# vendor name, currency and amounts)
+MAX_HAMMING_DISTANCE = 3
+
+# Longest label kept in front of a value (the end of the text before it)
+_MAX_LABEL_CHARS = 40
+
+# Fields located by their label, and the value pattern re-read after the label
+_AMOUNT_FIELDS = ("subtotal", "discount", "total")
+_VALUE_PATTERNS = {
+    "amount": r'-?\s*[$€£¥₹]?\s*(-?[\d,]+\.\d{2})',
+    "date": r'(\d{4}[-/]\d{1,2}[-/]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]\d{4})',
+    "token": r'([A-Za-z0-9][A-Za-z0-9\-/]*)',
+}
+# Fields that are constant for a vendor template
+_CONSTANT_FIELDS = ("vendor_name", "currency")
+
+_AMOUNT_TOKEN_RE = re.compile(r'-?[\d,]+\.\d{2}')
+# Header/footer lines fingerprinted by their words; lines between by shape only
+_EDGE_LINES = 8
+
+_FIRST_WORD_RE = re.compile(r'\S+')
+_DIGIT_RE = re.compile(r'\d')
+_SIGNED_64 = 1 << 63
+
+
+def _word_shape(word: str) -> str:
+    """Collapse a word to its character classes: "Widgets" -> "Xx", "INV-1001" -> "X-#"."""
+    shape = []
+    for c in word:
+        cls = 'X' if c.isupper() else 'x' if c.isalpha() else '#' if c.isdigit() else c
+        if not shape or shape[-1] != cls:
+            shape.append(cls)
+    return ''.join(shape)
+
+
+def fingerprint(ocr_text: str) -> int:
+    """
+    Return a 64-bit SimHash of the text's layout.
+
+    Features are the indentation and first word of the header and footer lines
+    (digits masked, so invoice numbers and dates do not count), and only the
+    word shape of the lines in between, so a month with different or more line
+    items keeps the same fingerprint.
+    """
+    lines = []
+    for line in ocr_text.splitlines():
+        match = _FIRST_WORD_RE.search(line)
+        if match:
+            lines.append((match.start(), match.group(0)))
+
+    features = set()
+    for i, (indent, word) in enumerate(lines):
+        if i < _EDGE_LINES or i >= len(lines) - _EDGE_LINES:
+            features.add(f"{indent}|{_DIGIT_RE.sub('#', word.lower())}")
+        else:
+            features.add(f"{indent}|{_word_shape(word)}")
+
+    weights = [0] * 64
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two fingerprints."""
+    return (a ^ b).bit_count()
+
+
+def _label_before(line: str, start: int) -> Optional[str]:
+    """Return the label text in front of a value on its line, or None if there is none."""
+    label = line[:start].rstrip(" \t:$€£¥₹-#")[-_MAX_LABEL_CHARS:].lstrip()
+    # Must contain a letter: a bare number or symbol is not a usable anchor
+    if not any(c.isalpha() for c in label):
+        return None
+    return label
+
+
+def _label_pattern(label: str, kind: str) -> re.Pattern:
+    """Compile the label-then-value pattern used to re-read a field."""
+    return re.compile(r'(?<![A-Za-z])' + re.escape(label) + r'[\s:#]*' + _VALUE_PATTERNS[kind])
+
+
+def _same_amount(a: str, b: Any) -> bool:
+    try:
+        return abs(Decimal(a.replace(',', ''))) == abs(Decimal(str(b).replace(',', '')))
+    except (InvalidOperation, ValueError):
+        return False
+
+
+def learn_recipe(ocr_text: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Derive a field recipe from an extraction result and the OCR text it came from.
+
+    Returns None unless the total and at least one other field could be
+    anchored to a label: a template with less could not be verified when it is
+    applied, so it must not skip the LLM.
+    """
+    lines = ocr_text.splitlines()
+    labels: Dict[str, Tuple[str, str]] = {}
+    used_labels = set()
+
+    tax = fields.get("tax")
+    amount_values = {field: fields.get(field) for field in _AMOUNT_FIELDS}
+    if isinstance(tax, dict) and tax.get("amount"):
+        amount_values["tax"] = tax["amount"]
+
+    for field, value in amount_values.items():
+        if not value:
+            continue
+        for line in lines:
+            found = False
+            for match in _AMOUNT_TOKEN_RE.finditer(line):
+                if _same_amount(match.group(0), value):
+                    label = _label_before(line, match.start())
+                    if label and label not in used_labels:
+                        labels[field] = (label, "amount")
+                        used_labels.add(label)
+                        found = True
+                        break
+            if found:
+                break
+
+    invoice_date = fields.get("invoice_date")
+    if invoice_date:
+        for line in lines:
+            found = False
+            for start, date in find_dates(line):
+                if date == invoice_date:
+                    label = _label_before(line, start)
+                    if label:
+                        labels["invoice_date"] = (label, "date")
+                        found = True
+                        break
+            if found:
+                break
+
+    invoice_number = fields.get("invoice_number")
+    if invoice_number:
+        for line in lines:
+            start = line.find(str(invoice_number))
+            if start >= 0:
+                label = _label_before(line, start)
+                if label:
+                    labels["invoice_number"] = (label, "token")
+                break
+
+    # The total plus one more anchored field, so a recipe is always checked by
+    # more than a single label match
+    if "total" not in labels or len(labels) < 2:
+        return None
+
+    return {
+        "labels": labels,
+        "tax_type": tax.get("type") if isinstance(tax, dict) else None,
+        "constants": {field: fields.get(field) for field in _CONSTANT_FIELDS},
+    }
+
+
+def apply_recipe(ocr_text: str, recipe: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Re-read fields from OCR text with a stored recipe.
+
+    Returns None (template drift) if any learned label is missing, the stored
+    vendor name does not appear in the text, the currency detected in the text
+    differs from the stored one, or the amounts no longer reconcile
+    (total = subtotal + discount + tax within 0.02).
+    """
+    if "total" not in recipe["labels"] or len(recipe["labels"]) < 2:
+        return None  # Stored before recipes had to anchor the total
+    result: Dict[str, Any] = {
+        "invoice_number": None,
+        "invoice_date": None,
+        "vendor_name": None,
+        "subtotal": None,
+        "discount": None,
+        "tax": None,
+        "total": None,
+        "currency": None,
+    }
+    result.update(recipe.get("constants") or {})
+
+    vendor_name = result["vendor_name"]
+    if vendor_name and vendor_name.casefold() not in ocr_text.casefold():
+        return None
+    currency = detect_currency(ocr_text)
+    if currency:
+        if result["currency"] and currency != result["currency"]:
+            return None
+        result["currency"] = currency
+
+    for field, (label, kind) in recipe["labels"].items():
+        match = _label_pattern(label, kind).search(ocr_text)
+        if not match:
+            return None
+        raw = match.group(1)
+        if kind == "amount":
+            value = normalize_amount(raw)
+        elif kind == "date":
+            value = normalize_date(raw)
+        else:
+            value = raw.strip()
+        if not value:
+            return None
+
+        if field == "discount":
+            value = str(-abs(Decimal(value)))
+        if field == "tax":
+            result["tax"] = {"amount": value, "type": recipe.get("tax_type") or "sales_tax"}
+        else:
+            result[field] = value
+
+    if result["total"] and result["subtotal"]:
+        tax_amount = result["tax"]["amount"] if result["tax"] else "0"
+        expected = Decimal(result["subtotal"]) + Decimal(result["discount"] or "0") + Decimal(tax_amount)
+        if abs(expected - Decimal(result["total"])) > Decimal("0.02"):
+            return None
+
+    return result
+
+
+class TemplateCache:
+    """
+    SQLite-backed store of (fingerprint, recipe) vendor templates.
+
+    Fingerprints are kept in memory for the nearest-neighbour scan; recipes are
+    read from SQLite on a hit.
+    """
+
+    def __init__(self, path: str = DEFAULT_TEMPLATE_CACHE_PATH, max_distance: int = MAX_HAMMING_DISTANCE):
+        self.path = path
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._fingerprints: Optional[List[Tuple[int, int]]] = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS invoice_templates (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    fingerprint INTEGER NOT NULL,
+                    recipe TEXT NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    updated_at INTEGER NOT NULL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        """Open a short-lived connection; commits on success and always closes."""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _nearest(self, fp: int) -> Optional[int]:
+        """Return the id of the closest stored template within max_distance."""
+        with self._lock:
+            if self._fingerprints is None:
+                with self._connect() as conn:
+                    rows = conn.execute("SELECT id, fingerprint FROM invoice_templates").fetchall()
+                self._fingerprints = [(row_id, stored % (1 << 64)) for row_id, stored in rows]
+            best_id, best_distance = None, self.max_distance + 1
+            for row_id, stored in self._fingerprints:
+                distance = hamming_distance(fp, stored)
+                if distance < best_distance:
+                    best_id, best_distance = row_id, distance
+            return best_id
+
+    def lookup(self, ocr_text: str) -> Optional[Dict[str, Any]]:
+        """Return fields re-read with a matching template, or None on miss or drift."""
+        template_id = self._nearest(fingerprint(ocr_text))
+        if template_id is None:
+            return None
+
+        with self._connect() as conn:
+            row = conn.execute("SELECT recipe FROM invoice_templates WHERE id = ?", (template_id,)).fetchone()
+        if not row:
+            return None
+
+        fields = apply_recipe(ocr_text, json.loads(row[0]))
+        if fields is None:
+            logger.info(f"Invoice template {template_id} drifted - falling back to LLM")
+            return None
+
+        with self._connect() as conn:
+            conn.execute("UPDATE invoice_templates SET hits = hits + 1 WHERE id = ?", (template_id,))
+        return fields
+
+    def learn(self, ocr_text: str, fields: Dict[str, Any]) -> None:
+        """Store (or refresh, for a drifted layout) the template for an LLM result."""
+        recipe = learn_recipe(ocr_text, fields)
+        if recipe is None:
+            return
+
+        fp = fingerprint(ocr_text)
+        # SQLite integers are signed 64-bit
+        stored_fp = fp - (1 << 64) if fp >= _SIGNED_64 else fp
+        template_id = self._nearest(fp)
+        now = int(time.time())
+        with self._connect() as conn:
+            if template_id is None:
+                conn.execute(
+                    "INSERT INTO invoice_templates (fingerprint, recipe, updated_at) VALUES (?, ?, ?)",
+                    (stored_fp, json.dumps(recipe), now),
+                )
+            else:
+                conn.execute(
+                    "UPDATE invoice_templates SET fingerprint = ?, recipe = ?, updated_at = ? WHERE id = ?",
+                    (stored_fp, json.dumps(recipe), now, template_id),
+                )
+        with self._lock:
+            self._fingerprints = None
@@ -6,7 +6,12 @@ Uses Tesseract OCR (pytesseract) for text extraction from images.
 
 This is essential for scanned invoices or images of invoices.
 """
+import importlib.util
 import logging
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Optional
 import os
 
@@ -22,6 +27,53 @@ SUPPORTED_IMAGE_MIME_TYPES = {
     'image/bmp', 'image/gif', 'image/webp'
 }
 
+# Longest side (pixels) handed to Tesseract. Segmentation cost grows with pixel
+# count and scans above ~200 DPI add time, not accuracy.
+MAX_OCR_IMAGE_DIMENSION = 2500
+
+# Tesseract binary, resolved once per process: PATH first, then common install
+# locations. Order: Render/cloud paths first, then local development paths.
+_TESSERACT_FALLBACK_PATHS = [
+    '/usr/bin/tesseract',  # Render/cloud platforms (installed via apt-get)
+    '/usr/local/bin/tesseract',  # Common system installation
+    os.path.join(os.environ.get('CONDA_PREFIX', ''), 'bin', 'tesseract'),  # Conda
+    '/opt/anaconda3/envs/acctapp/bin/tesseract',  # Specific conda path
+]
+_TESSERACT_CMD = shutil.which('tesseract') or next(
+    (path for path in _TESSERACT_FALLBACK_PATHS if path and os.path.exists(path)), None
+)
+
+# Tesseract can run: binary found and pytesseract installed
+_TESSERACT_READY = False
+
+if _TESSERACT_CMD:
+    logger.info(f"Using tesseract binary: {_TESSERACT_CMD}")
+    try:
+        import pytesseract
+        pytesseract.pytesseract.tesseract_cmd = _TESSERACT_CMD
+        _TESSERACT_READY = True
+    except ImportError:
+        pass
+else:
+    logger.warning("Could not find tesseract binary. OCR may fail. Trying EasyOCR fallback...")
+
+def tesseract_available() -> bool:
+    """True if Tesseract OCR can run (resolved once, at import)."""
+    return _TESSERACT_READY
+
+
+@lru_cache(maxsize=1)
+def easyocr_available() -> bool:
+    """True if EasyOCR is installed (checked once, without importing it)."""
+    return importlib.util.find_spec("easyocr") is not None
+
+
+# LSTM engine with Tesseract's automatic page segmentation (PSM 3), which keeps
+# the columns of multi-column layouts (address beside invoice details, totals
+# column) on separate lines. For single-block scans, TESSERACT_CONFIG can add
+# --psm 6 (one uniform text block)
+TESSERACT_CONFIG = os.getenv("TESSERACT_CONFIG", "--oem 1 -c preserve_interword_spaces=1")
+
 
 def is_image_file(file_path: str, content_type: Optional[str] = None) -> bool:
     """
@@ -35,7 +87,7 @@ def is_image_file(file_path: str, content_type: Optional[str] = None) -> bool:
         True if file appears to be an image, False otherwise
     """
     # Check by extension
-    ext = os.path.splitext(file_path)[1].lower().lstrip('.')
+    ext = file_path.rpartition('.')[2].lower()
     if ext in SUPPORTED_IMAGE_FORMATS:
         return True
     
@@ -48,6 +100,59 @@ def is_image_file(file_path: str, content_type: Optional[str] = None) -> bool:
     return False
 
 
+def _prepare_image_for_ocr(image):
+    """Convert an image to grayscale and downscale it to MAX_OCR_IMAGE_DIMENSION."""
+    # Tesseract converts to grayscale internally anyway
+    if image.mode != 'L':
+        logger.debug(f"Converting image from {image.mode} to L")
+        image = image.convert('L')
+    
+    if max(image.size) > MAX_OCR_IMAGE_DIMENSION:
+        from PIL import Image
+        logger.debug(f"Downscaling image from {image.size} for OCR")
+        image.thumbnail((MAX_OCR_IMAGE_DIMENSION, MAX_OCR_IMAGE_DIMENSION), Image.LANCZOS)
+    
+    return image
+
+
+@lru_cache(maxsize=8)
+def _load_ocr_image_cached(file_path: str, mtime_ns: int, size: int, frame: int):
+    """Decode and prepare one image frame once per (path, mtime, size, frame)."""
+    from PIL import Image
+    with Image.open(file_path) as image:
+        image.seek(frame)
+        # JPEG only: decode straight to grayscale, DCT-scaled down to no less
+        # than the 2x reducing gap Image.thumbnail would use (no-op otherwise)
+        image.draft('L', (2 * MAX_OCR_IMAGE_DIMENSION, 2 * MAX_OCR_IMAGE_DIMENSION))
+        image = image.copy()
+    return _prepare_image_for_ocr(image)
+
+
+def load_ocr_image(file_path: str, frame: int = 0):
+    """
+    Open an image (or one frame of a multi-page TIFF) prepared for OCR, memoized.
+    
+    Stages that reopen the same file reuse the decoded image; a changed file
+    (new mtime or size) is decoded again. Callers must not modify the result.
+    """
+    stat = os.stat(file_path)
+    return _load_ocr_image_cached(file_path, stat.st_mtime_ns, stat.st_size, frame)
+
+
+def _count_image_frames(file_path: str) -> int:
+    """Number of pages/frames in an image file (1 for single-page formats)."""
+    from PIL import Image
+    with Image.open(file_path) as image:
+        return getattr(image, 'n_frames', 1)
+
+
+def _ocr_image_frame(file_path: str, frame: int) -> str:
+    """OCR a single frame of an image file."""
+    import pytesseract
+    image = load_ocr_image(file_path, frame)
+    return pytesseract.image_to_string(image, lang='eng', config=TESSERACT_CONFIG).strip()
+
+
 def extract_text_from_image(file_path: str) -> Optional[str]:
     """
     Extract text from image file using OCR (Tesseract).
@@ -87,46 +192,22 @@ def extract_text_from_image(file_path: str) -> Optional[str]:
         )
         return None
     
-    # Configure pytesseract to find Tesseract binary
-    # This is especially important for conda installations and cloud platforms (Render)
     try:
-        import shutil
-        tesseract_cmd = shutil.which('tesseract')
-        if tesseract_cmd:
-            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
-            logger.debug(f"Configured pytesseract to use: {tesseract_cmd}")
-        else:
-            # Fallback: try common paths (including Render's /usr/bin/tesseract)
-            # Order: Render/cloud paths first, then local development paths
-            tesseract_paths = [
-                '/usr/bin/tesseract',  # Render/cloud platforms (installed via apt-get)
-                '/usr/local/bin/tesseract',  # Common system installation
-                os.path.join(os.environ.get('CONDA_PREFIX', ''), 'bin', 'tesseract'),  # Conda
-                '/opt/anaconda3/envs/acctapp/bin/tesseract',  # Specific conda path
-            ]
-            for path in tesseract_paths:
-                if path and os.path.exists(path):
-                    pytesseract.pytesseract.tesseract_cmd = path
-                    logger.info(f"Configured pytesseract to use: {path}")
-                    break
-            else:
-                logger.warning("Could not find tesseract binary. OCR may fail. Trying EasyOCR fallback...")
-    except Exception as e:
-        logger.warning(f"Error configuring pytesseract path: {e}")
-    
-    try:
-        # Open image
         logger.info(f"Opening image file: {file_path}")
-        image = Image.open(file_path)
-        
-        # Convert to RGB if necessary (Tesseract works best with RGB)
-        if image.mode != 'RGB':
-            logger.debug(f"Converting image from {image.mode} to RGB")
-            image = image.convert('RGB')
+        n_frames = _count_image_frames(file_path)
         
-        # Perform OCR
-        logger.info(f"Performing OCR on image: {file_path}")
-        text = pytesseract.image_to_string(image, lang='eng')
+        if n_frames > 1:
+            # Multi-page TIFF: each pytesseract call runs Tesseract in its own
+            # process, so a thread per page is enough to use every core
+            logger.info(f"Performing OCR on {n_frames} pages of image: {file_path}")
+            workers = min(n_frames, os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pages = list(executor.map(lambda frame: _ocr_image_frame(file_path, frame), range(n_frames)))
+            text = "\n".join(page for page in pages if page)
+        else:
+            # Perform OCR (grayscale, downscaled if oversize)
+            logger.info(f"Performing OCR on image: {file_path}")
+            text = pytesseract.image_to_string(load_ocr_image(file_path), lang='eng', config=TESSERACT_CONFIG)
         
         if text and text.strip():
             logger.info(f"OCR extracted {len(text)} characters from image")
@@ -140,6 +221,38 @@ def extract_text_from_image(file_path: str) -> Optional[str]:
         return None
 
 
+# EasyOCR reader, created on first use (loading the models takes seconds).
+# On CPU, quantize applies int8 dynamic quantization to the recognition model.
+EASYOCR_MODEL_DIR = os.getenv("EASYOCR_MODEL_DIR")
+EASYOCR_USE_QUANT = os.getenv("EASYOCR_USE_QUANT", "true").lower() == "true"
+
+_easyocr_reader = None
+_easyocr_lock = threading.Lock()
+
+
+def _get_easyocr_reader():
+    """Return the shared EasyOCR reader, creating it on first use (raises ImportError if not installed)."""
+    global _easyocr_reader
+    if _easyocr_reader is not None:
+        return _easyocr_reader
+    with _easyocr_lock:
+        if _easyocr_reader is None:
+            import easyocr
+            try:
+                import torch
+                use_gpu = torch.cuda.is_available()
+            except ImportError:
+                use_gpu = False
+            logger.info(f"Loading EasyOCR reader (gpu={use_gpu}, quantize={EASYOCR_USE_QUANT})")
+            _easyocr_reader = easyocr.Reader(
+                ['en'],  # English only
+                gpu=use_gpu,
+                quantize=EASYOCR_USE_QUANT,
+                model_storage_directory=EASYOCR_MODEL_DIR,
+            )
+        return _easyocr_reader
+
+
 def extract_text_from_image_easyocr(file_path: str) -> Optional[str]:
     """
     Alternative OCR method using EasyOCR (if Tesseract is not available).
@@ -153,18 +266,17 @@ def extract_text_from_image_easyocr(file_path: str) -> Optional[str]:
         Extracted text as string, or None if extraction fails
     """
     try:
-        import easyocr
+        reader = _get_easyocr_reader()
     except ImportError:
         logger.debug("EasyOCR not installed. Install with: pip install easyocr")
         return None
     
     try:
         logger.info(f"Using EasyOCR for image: {file_path}")
-        reader = easyocr.Reader(['en'])  # English only
-        result = reader.readtext(file_path)
+        # detail=0 returns the text only (no boxes or confidences)
+        text_parts = reader.readtext(file_path, detail=0, batch_size=8, workers=2)
         
         # Combine all detected text
-        text_parts = [detection[1] for detection in result]
         text = '\n'.join(text_parts)
         
         if text and text.strip():
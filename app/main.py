@@ -1,22 +1,34 @@
-from fastapi import FastAPI, Depends, UploadFile, File, Form, HTTPException, Response
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Depends, UploadFile, File, Form, HTTPException, Request, Response
+from fastapi.responses import HTMLResponse, JSONResponse
+from sqlalchemy import text
 from sqlalchemy.orm import Session
+import hashlib
 import threading
 import time
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import uuid
 import os
+import re
 import logging
 
-from app.db import Base, engine, get_db, SessionLocal
+from app.db import engine, async_engine, get_db, SessionLocal, AsyncSessionLocal
 from app.schemas import InvoiceOut
 from app import crud
 from app.models import Invoice, InvoiceStatus
 from app.config import settings
+from app.extraction.pipeline import extract_invoice_fields_multi_level, get_extraction_level_config
+from app.migrate import init_schema
+from app.pdf_extraction import is_image_based_pdf
+from app.text_extraction import get_text_extractor
 from app.worker import (
-    pick_next_ocr_job, mark_ocr_pending, mark_ocr_done, mark_retry,
-    pick_next_extraction_job, mark_extracted, mark_extraction_failed
+    claim_ocr_jobs, find_ocr_text, mark_ocr_done, mark_retry,
+    claim_extraction_jobs, mark_extracted, mark_extraction_failed,
+    seconds_until_next_ocr_job, wait_for_work, OCR_QUEUE, EXTRACTION_QUEUE,
+    can_listen_for_new_work, listen_for_new_work, listen, FINISHED_CHANNEL,
+    release_claims, release_expired_claims, CLAIM_TIMEOUT
 )
+from app.worker_pool import run_in_process
 
 # Configure logging
 logging.basicConfig(
@@ -25,6 +37,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Invoice ids are canonical UUID strings (validated without building a UUID)
+_UUID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.IGNORECASE)
+
+# Resolved once: the worker logs it on every file error
+STORAGE_ABS = os.path.abspath(settings.storage_dir)
+
+# Threads for asyncio.to_thread (file writes, PDF checks, sync DB fallbacks).
+# The loop's default executor has min(32, CPUs + 4) - five on a one-CPU
+# instance - so a few slow uploads would queue every status read behind them
+BLOCKING_IO_THREADS = 40
+
 # Configure FastAPI based on demo mode
 if settings.demo_mode:
     app = FastAPI(title="Invoice Automation Demo", docs_url=None, redoc_url=None)
@@ -35,6 +58,10 @@ else:
 @app.on_event("startup")
 async def startup_checks():
     """Perform startup validation and logging."""
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=BLOCKING_IO_THREADS, thread_name_prefix="blocking-io")
+    )
+    
     logger.info("=" * 60)
     logger.info("Invoice Automation - Startup Checks")
     logger.info("=" * 60)
@@ -54,63 +81,54 @@ async def startup_checks():
         logger.info("  - Internal endpoints: AVAILABLE")
     
     # Log storage configuration
-    storage_abs = os.path.abspath(settings.storage_dir)
-    logger.info(f"Storage directory: {storage_abs}")
+    logger.info(f"Storage directory: {STORAGE_ABS}")
     try:
         os.makedirs(settings.storage_dir, exist_ok=True)
         logger.info(f"  - Directory exists/created: OK")
     except Exception as e:
         logger.warning(f"  - Directory creation failed (non-fatal): {e}")
     
-    # Create schema (fast operation)
-    try:
-        logger.info("Creating database schema...")
-        Base.metadata.create_all(bind=engine)
-        logger.info("  - Schema creation: SUCCESS")
-        
-        # Migrate: Add confidence_status column if it doesn't exist (for existing databases)
-        try:
-            from sqlalchemy import inspect, text
-            inspector = inspect(engine)
-            
-            # Check if invoices table exists
-            if 'invoices' in inspector.get_table_names():
-                columns = [col['name'] for col in inspector.get_columns('invoices')]
-                
-                if 'confidence_status' not in columns:
-                    logger.info("  - Adding confidence_status column (migration)...")
-                    if engine.dialect.name == 'sqlite':
-                        # SQLite: ALTER TABLE to add column (SQLite stores enum as VARCHAR)
-                        with engine.connect() as conn:
-                            conn.execute(text("ALTER TABLE invoices ADD COLUMN confidence_status VARCHAR(20) DEFAULT 'ERROR'"))
-                            conn.commit()
-                        logger.info("  - Migration: confidence_status column added to SQLite database")
-                    else:
-                        # PostgreSQL: ALTER TABLE to add column
-                        with engine.connect() as conn:
-                            conn.execute(text("ALTER TABLE invoices ADD COLUMN confidence_status VARCHAR(20) DEFAULT 'ERROR'"))
-                            conn.commit()
-                        logger.info("  - Migration: confidence_status column added to PostgreSQL database")
-                else:
-                    logger.debug("  - confidence_status column already exists")
-            else:
-                logger.debug("  - invoices table doesn't exist yet (will be created)")
-        except Exception as migration_error:
-            logger.warning(f"  - Migration check failed (non-fatal): {migration_error}")
-            # Continue - schema creation succeeded
-    except Exception as e:
-        logger.error(f"  - Schema creation failed: {e}")
-        # Don't block startup - health check will catch this
+    # Create schema and apply migrations (once per process)
+    if settings.auto_migrate:
+        init_schema()
+    else:
+        logger.info("Schema setup: SKIPPED (AUTO_MIGRATE=false; run python -m app.migrate on deploy)")
     
     logger.info("=" * 60)
     logger.info("Startup checks complete. Application ready.")
     logger.info("=" * 60)
 
-# Create tables on module load (fallback if startup event doesn't fire)
-try:
-    Base.metadata.create_all(bind=engine)
-except Exception as e:
-    logger.warning(f"Schema creation on module load failed (may be expected): {e}")
+# Database status is cached between probes: platforms poll /health every few
+# seconds, and each uncached probe would take a pooled connection. The cache is
+# per process, so under gunicorn the database sees one ping per web process
+_HEALTH_CACHE_SECONDS = 5
+_health_cache = {"database": "unknown", "ts": 0.0}
+_health_lock = asyncio.Lock()
+
+
+def _check_database() -> str:
+    """Run a trivial query; returns "connected" or "disconnected"."""
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return "connected"
+    except Exception as e:
+        logger.warning(f"Health check: database connection failed: {e}")
+        return "disconnected"
+
+
+async def _check_database_async() -> str:
+    """_check_database() on the async engine, or in a thread without one."""
+    if async_engine is None:
+        return await asyncio.to_thread(_check_database)
+    try:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return "connected"
+    except Exception as e:
+        logger.warning(f"Health check: database connection failed: {e}")
+        return "disconnected"
+
 
 # Health check endpoint (required for cloud platforms)
 @app.get("/health")
@@ -119,34 +137,29 @@ async def health_check():
     Health check endpoint for cloud platform monitoring.
     This endpoint must respond quickly to prevent deployment timeouts.
     """
-    try:
-        # Quick database connectivity check
-        from sqlalchemy import text
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        db_status = "connected"
-    except Exception as e:
-        logger.warning(f"Health check: database connection failed: {e}")
-        db_status = "disconnected"
+    if time.monotonic() - _health_cache["ts"] >= _HEALTH_CACHE_SECONDS:
+        async with _health_lock:
+            # Concurrent probes wait for one refresh instead of each querying
+            if time.monotonic() - _health_cache["ts"] >= _HEALTH_CACHE_SECONDS:
+                # Quick database connectivity check, off the event loop
+                _health_cache["database"] = await _check_database_async()
+                _health_cache["ts"] = time.monotonic()
     
     return {
         "status": "healthy",
         "service": "invoice-automation",
-        "database": db_status,
+        "database": _health_cache["database"],
         "demo_mode": settings.demo_mode
     }
 
-# Demo UI - serve static HTML at root
-@app.get("/", response_class=HTMLResponse)
-async def demo_ui():
-    """Serve the demo UI page."""
-    html_path = os.path.join(os.path.dirname(__file__), "..", "static", "demo.html")
-    if os.path.exists(html_path):
-        with open(html_path, "r") as f:
-            return f.read()
-    else:
-        # Fallback HTML if file doesn't exist
-        return """
+# Demo UI - served from memory; the page is static, so read it once at import
+_DEMO_HTML_PATH = os.path.join(os.path.dirname(__file__), "..", "static", "demo.html")
+try:
+    with open(_DEMO_HTML_PATH, "rb") as f:
+        DEMO_HTML = f.read()
+except OSError:
+    # Fallback HTML if file doesn't exist
+    DEMO_HTML = b"""
         <!DOCTYPE html>
         <html>
         <head><title>Invoice Automation Demo</title></head>
@@ -157,59 +170,148 @@ async def demo_ui():
         </html>
         """
 
+
+# Validator for conditional requests: browsers revalidating the page get a 304
+DEMO_HTML_ETAG = '"' + hashlib.sha256(DEMO_HTML, usedforsecurity=False).hexdigest()[:16] + '"'
+
+
+@app.get("/", response_class=HTMLResponse)
+async def demo_ui(request: Request):
+    """Serve the demo UI page."""
+    headers = {"ETag": DEMO_HTML_ETAG, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == DEMO_HTML_ETAG:
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(DEMO_HTML, headers=headers)
+
+# ---- Demo upload completion events ----
+# demo_upload_invoice waits on an asyncio.Event per invoice; the worker thread
+# sets it (through the waiting request's event loop) when it moves that invoice
+# to one of _DEMO_FINAL_STATUSES, so the request does not poll the database.
+_invoice_events: dict[str, tuple[asyncio.AbstractEventLoop, asyncio.Event]] = {}
+_invoice_events_lock = threading.Lock()
+
+# Statuses after which the demo endpoint stops waiting
+_DEMO_FINAL_STATUSES = (
+    InvoiceStatus.EXTRACTED,
+    InvoiceStatus.EXTRACTION_FAILED,
+    InvoiceStatus.FAILED_RETRYABLE,
+    InvoiceStatus.FAILED_FINAL,
+)
+
+# Re-check the database while waiting, in case the job was processed by another
+# process's worker: on PostgreSQL it signals this process through NOTIFY on
+# FINISHED_CHANNEL (see start_worker), elsewhere only these rechecks see it.
+# Often at first, since most invoices finish within a few hundred ms, then
+# backing off to every second
+_DEMO_RECHECK_FIRST_SECONDS = 0.02
+_DEMO_RECHECK_MAX_SECONDS = 1
+
+
+def _demo_recheck_intervals():
+    """Yield 0.02, 0.05, 0.125, ... seconds (x2.5 per step), capped at 1s."""
+    interval = _DEMO_RECHECK_FIRST_SECONDS
+    while True:
+        yield interval
+        interval = min(interval * 2.5, _DEMO_RECHECK_MAX_SECONDS)
+
+
+async def _refresh_invoice(db: Session, inv: Invoice) -> Invoice:
+    """Return the invoice's current state without blocking the event loop."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as async_db:
+            current = await async_db.get(Invoice, inv.id)
+        if current is not None:
+            return current
+    await asyncio.to_thread(db.refresh, inv)
+    return inv
+
+
+def _get_invoice_sync(invoice_id: str) -> Invoice | None:
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        return db.get(Invoice, invoice_id)
+    finally:
+        db.close()
+
+
+def _notify_invoice(invoice_id: str):
+    """Wake a demo request waiting on this invoice (called from the worker thread)."""
+    with _invoice_events_lock:
+        waiter = _invoice_events.get(invoice_id)
+    if waiter:
+        loop, event = waiter
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            pass  # Event loop already closed
+
+
+IMAGE_PDF_ERROR = "PDF appears to be image-based (scanned). This app requires text-based PDFs. Please use a PDF with selectable text."
+
+
 # Demo endpoint - public upload and extraction
 @app.post("/demo/upload-invoice")
-async def demo_upload_invoice(attachment: UploadFile = File(...)):
+async def demo_upload_invoice(attachment: UploadFile = File(...), db: Session = Depends(get_db)):
     """
     Public demo endpoint: upload invoice PDF and get extracted fields.
     Blocks until extraction is complete (suitable for demo only).
     """
-    db = SessionLocal()
     try:
         # Generate a unique email message ID for demo
         email_message_id = f"demo-{uuid.uuid4().hex[:8]}"
         
-        # Read file data
-        data = await attachment.read()
+        # Reject scanned PDFs up front instead of queueing a job that will fail
+        filename = attachment.filename or "invoice.pdf"
+        content_type = attachment.content_type or "application/pdf"
+        if content_type == "application/pdf" or filename.lower().endswith(".pdf"):
+            image_based = await asyncio.to_thread(is_image_based_pdf, attachment.file)
+            attachment.file.seek(0)
+            if image_based:
+                return JSONResponse(
+                    status_code=400,
+                    content={"status": "error", "error": IMAGE_PDF_ERROR, "extracted_fields": {}},
+                )
         
-        # Create invoice record
-        inv = crud.create_invoice_from_attachment(
+        # Create invoice record, streaming the upload to storage (file write +
+        # DB insert, off the event loop)
+        inv = await asyncio.to_thread(
+            crud.create_invoice_from_stream,
             db=db,
             email_message_id=email_message_id,
             sender="demo@example.com",
             subject="Demo Upload",
-            filename=attachment.filename or "invoice.pdf",
-            content_type=attachment.content_type or "application/pdf",
-            file_bytes=data,
+            filename=filename,
+            content_type=content_type,
+            file_obj=attachment.file,
         )
         
         invoice_id = inv.id
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        with _invoice_events_lock:
+            _invoice_events[invoice_id] = (loop, event)
         
-        # Wait for OCR to complete (with timeout)
-        max_wait = 60  # seconds (increased for PDF processing)
-        wait_interval = 0.5
-        waited = 0
-        
-        while waited < max_wait:
-            db.refresh(inv)
-            if inv.status == InvoiceStatus.OCR_DONE:
-                break
-            elif inv.status == InvoiceStatus.FAILED_RETRYABLE or inv.status == InvoiceStatus.FAILED_FINAL:
-                # Extraction failed - return error immediately
-                break
-            await asyncio.sleep(wait_interval)
-            waited += wait_interval
-        
-        # Wait for extraction to complete
-        while waited < max_wait:
-            db.refresh(inv)
-            if inv.status in [InvoiceStatus.EXTRACTED, InvoiceStatus.EXTRACTION_FAILED]:
-                break
-            await asyncio.sleep(wait_interval)
-            waited += wait_interval
-        
-        # Refresh to get latest state
-        db.refresh(inv)
+        try:
+            # Wait for OCR and extraction to finish (with timeout). The event is
+            # cleared before each status check so a signal is never missed
+            max_wait = 60  # seconds (increased for PDF processing)
+            deadline = loop.time() + max_wait
+            recheck_intervals = _demo_recheck_intervals()
+            while True:
+                event.clear()
+                inv = await _refresh_invoice(db, inv)
+                if inv.status in _DEMO_FINAL_STATUSES:
+                    break
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=min(remaining, next(recheck_intervals)))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with _invoice_events_lock:
+                _invoice_events.pop(invoice_id, None)
         
         # Return only extracted fields (no internal IDs or metadata)
         if inv.status == InvoiceStatus.EXTRACTED and inv.extracted_fields:
@@ -222,7 +324,7 @@ async def demo_upload_invoice(attachment: UploadFile = File(...)):
             error_msg = inv.last_error or "Field extraction failed"
             # Provide user-friendly error message
             if "PDF text extraction failed" in error_msg or "image-based" in error_msg.lower():
-                error_msg = "PDF appears to be image-based (scanned). This app requires text-based PDFs. Please use a PDF with selectable text."
+                error_msg = IMAGE_PDF_ERROR
             return {
                 "status": "extraction_failed",
                 "error": error_msg,
@@ -231,7 +333,7 @@ async def demo_upload_invoice(attachment: UploadFile = File(...)):
         elif inv.status in [InvoiceStatus.FAILED_RETRYABLE, InvoiceStatus.FAILED_FINAL]:
             error_msg = inv.last_error or "Processing failed"
             if "PDF text extraction failed" in error_msg or "image-based" in error_msg.lower():
-                error_msg = "PDF appears to be image-based (scanned). This app requires text-based PDFs. Please use a PDF with selectable text."
+                error_msg = IMAGE_PDF_ERROR
             return {
                 "status": "error",
                 "error": error_msg,
@@ -250,8 +352,6 @@ async def demo_upload_invoice(attachment: UploadFile = File(...)):
             "error": str(e),
             "extracted_fields": {}
         }
-    finally:
-        db.close()
 
 # Internal endpoints - only available when not in demo mode
 if not settings.demo_mode:
@@ -263,165 +363,331 @@ if not settings.demo_mode:
         attachment: UploadFile = File(...),
         db: Session = Depends(get_db),
     ):
-        data = await attachment.read()
-        inv = crud.create_invoice_from_attachment(
+        inv = await asyncio.to_thread(
+            crud.create_invoice_from_stream,
             db=db,
             email_message_id=email_message_id,
             sender=sender,
             subject=subject,
             filename=attachment.filename or "attachment",
             content_type=attachment.content_type or "application/octet-stream",
-            file_bytes=data,
+            file_obj=attachment.file,
         )
         return inv
 
     @app.get("/invoices/{invoice_id}", response_model=InvoiceOut)
-    def get_invoice(invoice_id: str, db: Session = Depends(get_db)):
+    async def get_invoice(invoice_id: str):
         # Validate UUID format (but store as string)
-        try:
-            uuid.UUID(invoice_id)  # Validate format
-        except ValueError:
+        if not _UUID_RE.fullmatch(invoice_id):
             raise HTTPException(status_code=400, detail="Invalid invoice ID format")
         
-        # Query using string ID (portable across databases)
-        inv = db.get(Invoice, invoice_id)
+        # Query using string ID (portable across databases); on the async
+        # engine when available, otherwise a sync session in a thread. No
+        # get_db dependency: FastAPI would run its setup and teardown on the
+        # AnyIO threadpool even when the async engine does the read
+        if AsyncSessionLocal is not None:
+            async with AsyncSessionLocal() as async_db:
+                inv = await async_db.get(Invoice, invoice_id)
+        else:
+            inv = await asyncio.to_thread(_get_invoice_sync, invoice_id)
         if inv is None:
             raise HTTPException(status_code=404, detail="Invoice not found")
         return inv
 
-# ---- MVP background worker loop (polling) ----
-def worker_loop():
-    while True:
-        db = SessionLocal()
-        try:
-            # Process OCR jobs first
-            ocr_job = pick_next_ocr_job(db)
-            if ocr_job:
-                try:
-                    # Mark pending (prevents double-processing if multiple workers)
-                    mark_ocr_pending(db, ocr_job)
-
-                    # Extract text from file (PDF or image)
-                    from app.text_extraction import extract_text_from_file, is_supported_file_type
-                    
-                    ocr_text = None
-                    # Resolve path (handle both relative and absolute)
-                    file_path = ocr_job.storage_path
-                    if file_path:
-                        # Try absolute path first, then relative
-                        if not os.path.isabs(file_path):
-                            file_path = os.path.abspath(file_path)
-                        
-                        logger.info(f"Extracting text from file: {file_path}")
-                        logger.info(f"  - Path exists: {os.path.exists(file_path)}")
-                        logger.info(f"  - Content type: {ocr_job.content_type}")
-                        logger.info(f"  - Filename: {ocr_job.filename}")
-                        
-                        if os.path.exists(file_path):
-                            file_size = os.path.getsize(file_path)
-                            logger.info(f"  - File size: {file_size} bytes")
-                            
-                            # Check if file type is supported
-                            if not is_supported_file_type(file_path, ocr_job.content_type):
-                                error_msg = f"Unsupported file type: {ocr_job.content_type or 'unknown'}. Supported: PDF, PNG, JPEG, TIFF"
-                                logger.warning(f"Invoice {ocr_job.id}: {error_msg}")
-                                mark_retry(db, ocr_job, error=error_msg)
-                                db.close()
-                                continue
-                        
-                        if os.path.exists(file_path):
-                            # Use unified extraction (handles both PDF and images)
-                            ocr_text = extract_text_from_file(file_path, ocr_job.content_type)
-                        else:
-                            logger.error(f"  - File not found at: {file_path}")
-                            logger.error(f"  - Current working directory: {os.getcwd()}")
-                            logger.error(f"  - Storage dir: {os.path.abspath(settings.storage_dir)}")
-                        
-                        if not ocr_text:
-                            # If extraction fails, mark as retryable error
-                            error_msg = "Text extraction failed - file may be corrupted or unsupported format"
-                            logger.warning(f"Invoice {ocr_job.id}: {error_msg}")
-                            # Log additional diagnostics
-                            logger.warning(f"  - File path: {file_path}")
-                            logger.warning(f"  - File exists: {os.path.exists(file_path) if file_path else False}")
-                            if file_path and os.path.exists(file_path):
-                                logger.warning(f"  - File size: {os.path.getsize(file_path)} bytes")
-                            mark_retry(db, ocr_job, error=error_msg)
-                            db.close()
-                            continue
-                    else:
-                        error_msg = f"File not found: {ocr_job.storage_path}"
-                        logger.error(f"Invoice {ocr_job.id}: {error_msg}")
-                        logger.error(f"  - Current working directory: {os.getcwd()}")
-                        logger.error(f"  - Storage dir: {os.path.abspath(settings.storage_dir)}")
-                        mark_retry(db, ocr_job, error=error_msg)
-                        db.close()
-                        continue
-                    
-                    # Mark OCR as done with extracted text
-                    mark_ocr_done(db, ocr_job, ocr_text=ocr_text)
-                    logger.info(f"Invoice {ocr_job.id}: Text extraction complete ({len(ocr_text)} characters)")
-                except Exception as e:
-                    # if we have a job object in scope, schedule retry
-                    mark_retry(db, ocr_job, error=str(e))
-                finally:
-                    db.close()
-                    continue
-
-            # Process extraction jobs
-            extraction_job = pick_next_extraction_job(db)
-            if extraction_job:
-                try:
-                    from app.extraction.pipeline import extract_invoice_fields_multi_level, get_extraction_level_config
-                    
-                    # Get extraction level configuration
-                    level_config = get_extraction_level_config()
-                    
-                    # Resolve absolute path for file (PDF or image)
-                    file_path = os.path.abspath(extraction_job.storage_path) if extraction_job.storage_path else None
-                    
-                    # Extract fields using multi-level pipeline with smart LLM fallback
-                    # Level 1 (OCR) already done - ocr_text available
-                    # Level 1.5 (Rule-based): Always runs first (free, fast)
-                    # Level 2 (Structural): Enabled by default (works best with PDFs)
-                    # Level 3 (Semantic/LLM): Smart fallback - only used when needed (cost optimization)
-                    extracted_fields, confidence_status = extract_invoice_fields_multi_level(
-                        file_path=file_path,
-                        ocr_text=extraction_job.ocr_text or "",
-                        enable_level_2=level_config["enable_level_2"],
-                        enable_level_3=level_config["enable_level_3"],
-                        use_llm_fallback=level_config.get("use_llm_fallback", True),
-                        min_extraction_rate=level_config.get("min_extraction_rate", 0.5)
-                    )
-                    
-                    # Mark as extracted with confidence status (even if some fields are None, that's OK)
-                    mark_extracted(db, extraction_job, extracted_fields, confidence_status)
-                    logger.info(f"Invoice {extraction_job.id}: Multi-level extraction complete. Confidence: {confidence_status.value}")
-                    
-                except Exception as e:
-                    # Log error but don't crash - mark as failed
-                    error_msg = f"Extraction failed: {str(e)}"
-                    logger.error(f"Invoice {extraction_job.id}: {error_msg}", exc_info=True)
-                    mark_extraction_failed(db, extraction_job, error_msg)
-                finally:
-                    db.close()
-                    continue
-
-            # No jobs available, sleep
-            db.close()
-            time.sleep(2)
-
-        except Exception as e:
-            # Unexpected error - log and continue
-            print(f"Worker error: {e}")
-            db.close()
-            time.sleep(2)
+# ---- MVP background workers (polling, woken on new work) ----
+# OCR and field extraction run in separate worker threads, so a slow LLM call
+# does not hold up text extraction of newly uploaded invoices.
+
+# Jobs claimed per database session. Extraction batches are smaller: a job
+# can wait on an LLM call, and claimed jobs are not shared with idle workers
+OCR_BATCH_SIZE = 8
+EXTRACTION_BATCH_SIZE = 4
+
+# Sleep after an unexpected worker error, doubling per consecutive failure
+WORKER_ERROR_BACKOFF_MIN = 2
+WORKER_ERROR_BACKOFF_MAX = 30
+
+# Longest idle wait between queue checks. Work queued in this process wakes the
+# workers at once; the timeout only covers rows written by another process
+WORKER_IDLE_POLL_SECONDS = 30
+
+
+def _release_unfinished(db: Session, job_ids: list, claimed_status: InvoiceStatus):
+    """Hand back the claimed jobs a failed worker iteration did not finish."""
+    if not job_ids:
+        return
+    try:
+        db.rollback()
+        release_claims(db, job_ids, claimed_status)
+    except Exception as e:
+        # Database still unreachable: the claims expire instead
+        logger.warning("Could not release %d claimed invoice(s) (%s); they are reclaimed after %s",
+                       len(job_ids), e, CLAIM_TIMEOUT)
+
+
+def _process_ocr_job(db: Session, ocr_job: Invoice):
+    """Extract text for one claimed (OCR_PENDING) invoice and record the outcome."""
+    try:
+        # Same file content already read (by an earlier copy of a resent invoice)
+        cached_text = find_ocr_text(db, ocr_job.sha256)
+        if cached_text:
+            mark_ocr_done(db, ocr_job, ocr_text=cached_text)
+            logger.info("Invoice %s: Reused text of an earlier copy (%d characters)", ocr_job.id, len(cached_text))
+            return
+
+        # Extract text from file (PDF or image)
+        ocr_text = None
+        # Resolve path (handle both relative and absolute)
+        file_path = ocr_job.storage_path
+        if file_path:
+            # Try absolute path first, then relative
+            if not os.path.isabs(file_path):
+                file_path = os.path.abspath(file_path)
+
+            # One stat for existence and size (None if missing)
+            try:
+                file_size = os.stat(file_path).st_size
+            except OSError:
+                file_size = None
+
+            logger.info("Extracting text from file: %s", file_path)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("  - Path exists: %s", file_size is not None)
+                logger.debug("  - Content type: %s", ocr_job.content_type)
+                logger.debug("  - Filename: %s", ocr_job.filename)
+                if file_size is not None:
+                    logger.debug("  - File size: %d bytes", file_size)
+
+            if file_size is not None:
+
+                # Resolve the extractor once (file type detection reads the file at most once)
+                extractor = get_text_extractor(file_path, ocr_job.content_type)
+                if extractor is None:
+                    error_msg = f"Unsupported file type: {ocr_job.content_type or 'unknown'}. Supported: PDF, PNG, JPEG, TIFF"
+                    logger.warning("Invoice %s: %s", ocr_job.id, error_msg)
+                    mark_retry(db, ocr_job, error=error_msg)
+                    _notify_invoice(ocr_job.id)
+                    return
+
+                # PDF text extraction or image OCR, in a pool process
+                ocr_text = run_in_process(extractor, file_path)
+            else:
+                logger.error("  - File not found at: %s", file_path)
+                logger.error("  - Current working directory: %s", os.getcwd())
+                logger.error("  - Storage dir: %s", STORAGE_ABS)
+
+            if not ocr_text:
+                # If extraction fails, mark as retryable error
+                error_msg = "Text extraction failed - file may be corrupted or unsupported format"
+                logger.warning("Invoice %s: %s", ocr_job.id, error_msg)
+                # Log additional diagnostics
+                logger.warning("  - File path: %s", file_path)
+                logger.warning("  - File exists: %s", file_size is not None)
+                if file_size is not None:
+                    logger.warning("  - File size: %d bytes", file_size)
+                mark_retry(db, ocr_job, error=error_msg)
+                _notify_invoice(ocr_job.id)
+                return
+        else:
+            error_msg = f"File not found: {ocr_job.storage_path}"
+            logger.error("Invoice %s: %s", ocr_job.id, error_msg)
+            logger.error("  - Current working directory: %s", os.getcwd())
+            logger.error("  - Storage dir: %s", STORAGE_ABS)
+            mark_retry(db, ocr_job, error=error_msg)
+            _notify_invoice(ocr_job.id)
+            return
+
+        # Mark OCR as done with extracted text
+        # (no demo wake-up: OCR_DONE is not a status the demo endpoint stops at)
+        mark_ocr_done(db, ocr_job, ocr_text=ocr_text)
+        logger.info("Invoice %s: Text extraction complete (%d characters)", ocr_job.id, len(ocr_text))
+    except Exception as e:
+        # End the failed transaction first (a failed write leaves the session
+        # unusable until it is rolled back), then schedule a retry
+        db.rollback()
+        mark_retry(db, ocr_job, error=str(e))
+        _notify_invoice(ocr_job.id)
+
+
+def ocr_worker_loop(idle_poll: float = WORKER_IDLE_POLL_SECONDS):
+    backoff = WORKER_ERROR_BACKOFF_MIN
+    # One session per worker thread, reused across jobs: each job ends its
+    # transaction (commit or rollback), which returns the connection to the pool.
+    # Committed values stay loaded, so a job's row is not re-read after each
+    # status change
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        while True:
+            unfinished = []
+            try:
+                release_expired_claims(db)
+                # Claim a batch (marked OCR_PENDING in one commit, so other workers
+                # skip it) and work through it on this session
+                ocr_jobs = claim_ocr_jobs(db, OCR_BATCH_SIZE)
+                unfinished = [ocr_job.id for ocr_job in ocr_jobs]
+                for ocr_job in ocr_jobs:
+                    _process_ocr_job(db, ocr_job)
+                    unfinished.remove(ocr_job.id)
+                db.rollback()
+                backoff = WORKER_ERROR_BACKOFF_MIN
+
+                # No jobs available, sleep until new work is queued or a retry is due
+                if not ocr_jobs:
+                    timeout = seconds_until_next_ocr_job(db, idle_poll)
+                    db.rollback()
+                    wait_for_work(OCR_QUEUE, timeout=timeout)
+
+            except Exception:
+                # Unexpected error (e.g. database down) - log and back off
+                logger.exception("Worker iteration failed; retrying in %ss", backoff)
+                _release_unfinished(db, unfinished, InvoiceStatus.OCR_PENDING)
+                # Discard the session state (and a broken connection); the
+                # session is usable again on the next iteration
+                db.close()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, WORKER_ERROR_BACKOFF_MAX)
+    finally:
+        db.close()
+
+
+def _process_extraction_job(db: Session, extraction_job: Invoice):
+    """Extract fields for one claimed (EXTRACTION_PENDING) invoice and record the outcome."""
+    try:
+        # An earlier copy of the same file may have been extracted since this
+        # one was queued
+        extracted_copy = crud.find_extracted_copy(db, extraction_job.sha256)
+        if extracted_copy is not None:
+            mark_extracted(db, extraction_job, extracted_copy.extracted_fields, extracted_copy.confidence_status)
+            _notify_invoice(extraction_job.id)
+            logger.info("Invoice %s: Reused fields of invoice %s", extraction_job.id, extracted_copy.id)
+            return
+
+        # Get extraction level configuration
+        level_config = get_extraction_level_config()
+    
+        # Resolve absolute path for file (PDF or image)
+        file_path = os.path.abspath(extraction_job.storage_path) if extraction_job.storage_path else None
+    
+        # Extract fields using multi-level pipeline with smart LLM fallback
+        # Level 1 (OCR) already done - ocr_text available
+        # Level 1.5 (Rule-based): Always runs first (free, fast)
+        # Level 2 (Structural): Enabled by default (works best with PDFs)
+        # Level 3 (Semantic/LLM): Smart fallback - only used when needed (cost optimization)
+        extracted_fields, confidence_status = run_in_process(
+            extract_invoice_fields_multi_level,
+            file_path=file_path,
+            ocr_text=extraction_job.ocr_text or "",
+            enable_level_2=level_config["enable_level_2"],
+            enable_level_3=level_config["enable_level_3"],
+            use_llm_fallback=level_config.get("use_llm_fallback", True),
+            min_extraction_rate=level_config.get("min_extraction_rate", 0.5)
+        )
+    
+        # Mark as extracted with confidence status (even if some fields are None, that's OK)
+        mark_extracted(db, extraction_job, extracted_fields, confidence_status)
+        _notify_invoice(extraction_job.id)
+        logger.info("Invoice %s: Multi-level extraction complete. Confidence: %s", extraction_job.id, confidence_status.value)
+    
+    except Exception as e:
+        # Log error but don't crash - mark as failed
+        error_msg = f"Extraction failed: {str(e)}"
+        logger.error("Invoice %s: %s", extraction_job.id, error_msg, exc_info=True)
+        db.rollback()
+        mark_extraction_failed(db, extraction_job, error_msg)
+        _notify_invoice(extraction_job.id)
+
+
+def extraction_worker_loop(idle_poll: float = WORKER_IDLE_POLL_SECONDS):
+    backoff = WORKER_ERROR_BACKOFF_MIN
+    # One session per worker thread, reused across jobs: each job ends its
+    # transaction (commit or rollback), which returns the connection to the pool.
+    # Committed values stay loaded, so a job's row is not re-read after each
+    # status change
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        while True:
+            unfinished = []
+            try:
+                release_expired_claims(db)
+                # Claim a batch (marked EXTRACTION_PENDING in one commit) and
+                # work through it on this session
+                extraction_jobs = claim_extraction_jobs(db, EXTRACTION_BATCH_SIZE)
+                unfinished = [extraction_job.id for extraction_job in extraction_jobs]
+                for extraction_job in extraction_jobs:
+                    _process_extraction_job(db, extraction_job)
+                    db.rollback()
+                    unfinished.remove(extraction_job.id)
+                backoff = WORKER_ERROR_BACKOFF_MIN
+
+                # No jobs available, sleep until new work is queued
+                if not extraction_jobs:
+                    db.rollback()
+                    wait_for_work(EXTRACTION_QUEUE, timeout=idle_poll)
+
+            except Exception:
+                # Unexpected error (e.g. database down) - log and back off
+                logger.exception("Worker iteration failed; retrying in %ss", backoff)
+                _release_unfinished(db, unfinished, InvoiceStatus.EXTRACTION_PENDING)
+                # Discard the session state (and a broken connection); the
+                # session is usable again on the next iteration
+                db.close()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, WORKER_ERROR_BACKOFF_MAX)
+    finally:
+        db.close()
+
+
+# Startup can run more than once per process (e.g. a test client entering the
+# app's lifespan repeatedly); the worker threads must only be started once
+_workers_started = False
+_workers_started_lock = threading.Lock()
+
+
+def _start_worker_threads(target, count: int, name: str, idle_poll: float):
+    for i in range(count):
+        threading.Thread(target=target, args=(idle_poll,), name=f"{name}-{i}", daemon=True).start()
+
+
+def start_background_workers(idle_poll: float = WORKER_IDLE_POLL_SECONDS) -> bool:
+    """
+    Start the OCR and extraction worker threads in this process (once).
+
+    Returns False if they were already running.
+    """
+    global _workers_started
+    with _workers_started_lock:
+        if _workers_started:
+            return False
+        _workers_started = True
+    ocr_workers = settings.ocr_workers or os.cpu_count() or 1
+    extraction_workers = settings.extraction_workers
+    if engine.dialect.name == "sqlite":
+        # SQLite has no row locks (FOR UPDATE SKIP LOCKED), so more than one
+        # worker per stage could pick the same invoice
+        ocr_workers = extraction_workers = 1
+    logger.info(f"Starting background workers: {ocr_workers} OCR, {extraction_workers} extraction...")
+    _start_worker_threads(ocr_worker_loop, ocr_workers, "ocr-worker", idle_poll)
+    _start_worker_threads(extraction_worker_loop, extraction_workers, "extraction-worker", idle_poll)
+    if can_listen_for_new_work(engine):
+        # Uploads handled by other processes wake the OCR workers through NOTIFY
+        threading.Thread(target=listen_for_new_work, args=(engine,), name="ocr-listener", daemon=True).start()
+    logger.info("Background workers started.")
+    return True
+
 
 @app.on_event("startup")
 def start_worker():
-    """Start background worker thread."""
-    logger.info("Starting background worker thread...")
-    t = threading.Thread(target=worker_loop, daemon=True)
-    t.start()
-    logger.info("Background worker started.")
-
+    """Start background OCR and extraction worker threads."""
+    if not settings.run_workers:
+        # Another process (python -m app.worker_main) runs the pipeline
+        logger.info("Background workers: DISABLED in this process (RUN_WORKERS=false)")
+        if can_listen_for_new_work(engine):
+            # Its workers cannot set this process's events, so they are set
+            # from the NOTIFY its status updates send
+            threading.Thread(
+                target=listen, args=(engine, FINISHED_CHANNEL, _notify_invoice),
+                name="finished-listener", daemon=True,
+            ).start()
+        return
+    if not start_background_workers():
+        logger.info("Background workers already running.")
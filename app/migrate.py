@@ -0,0 +1,191 @@
+"""
+Database schema setup: create missing tables and apply column migrations.
+
+Runs once per process from the app's startup checks (unless AUTO_MIGRATE is
+false), or once per deployment from the deploy pipeline:
+
+    python -m app.migrate
+"""
+import logging
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import inspect, text
+
+import app.models  # Registers the tables on Base.metadata
+from app.db import Base, engine
+from app.worker import FINISHED_CHANNEL, OCR_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+_schema_lock = threading.Lock()
+_schema_initialized = False
+
+# PostgreSQL advisory lock key held while migrating, so processes starting
+# together (web processes, the pipeline process) do not run the DDL at once
+MIGRATION_LOCK_KEY = 0x696E766F  # "invo"
+
+
+@contextmanager
+def _migration_lock():
+    """Hold MIGRATION_LOCK_KEY on PostgreSQL for the duration (no-op elsewhere)."""
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            conn.commit()
+
+
+def _add_missing_columns():
+    """Add columns introduced after the first release (for existing databases)."""
+    # Migrate: Add confidence_status column if it doesn't exist
+    inspector = inspect(engine)
+    columns = [col['name'] for col in inspector.get_columns('invoices')]
+    
+    if 'confidence_status' not in columns:
+        logger.info("  - Adding confidence_status column (migration)...")
+        # SQLite stores the enum as VARCHAR; the same DDL works on PostgreSQL
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE invoices ADD COLUMN confidence_status VARCHAR(20) DEFAULT 'ERROR'"))
+            conn.commit()
+        logger.info(f"  - Migration: confidence_status column added ({engine.dialect.name})")
+    else:
+        logger.debug("  - confidence_status column already exists")
+
+
+def _add_missing_enum_values():
+    """Add InvoiceStatus values introduced after the first release (PostgreSQL enum type)."""
+    if engine.dialect.name != "postgresql":
+        return  # Other databases store the status as VARCHAR
+    enum_name = app.models.Invoice.__table__.c.status.type.name
+    # ALTER TYPE ... ADD VALUE cannot run inside a transaction block before PostgreSQL 12
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for status in app.models.InvoiceStatus:
+            conn.execute(text(f"ALTER TYPE {enum_name} ADD VALUE IF NOT EXISTS '{status.name}'"))
+
+
+def _create_notify_trigger():
+    """Notify OCR_CHANNEL when an invoice is received (PostgreSQL LISTEN/NOTIFY)."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE OR REPLACE FUNCTION invoices_notify_received() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('{OCR_CHANNEL}', '');
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """))
+        conn.execute(text("DROP TRIGGER IF EXISTS invoices_notify_received ON invoices"))
+        # Per row, but a batch insert still sends one notification: PostgreSQL
+        # delivers identical notifications of a transaction once
+        conn.execute(text("""
+            CREATE TRIGGER invoices_notify_received
+            AFTER INSERT OR UPDATE OF status ON invoices
+            FOR EACH ROW WHEN (NEW.status = 'RECEIVED')
+            EXECUTE FUNCTION invoices_notify_received()
+        """))
+
+
+# Statuses after which a request waiting on an invoice stops waiting (as
+# app.main's _DEMO_FINAL_STATUSES)
+_FINISHED_STATUSES = ("EXTRACTED", "EXTRACTION_FAILED", "FAILED_RETRYABLE", "FAILED_FINAL")
+
+
+def _create_finished_trigger():
+    """Notify FINISHED_CHANNEL with the invoice id when it reaches a final status."""
+    if engine.dialect.name != "postgresql":
+        return
+    statuses = ", ".join(f"'{status}'" for status in _FINISHED_STATUSES)
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE OR REPLACE FUNCTION invoices_notify_finished() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('{FINISHED_CHANNEL}', NEW.id);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        """))
+        conn.execute(text("DROP TRIGGER IF EXISTS invoices_notify_finished ON invoices"))
+        conn.execute(text(f"""
+            CREATE TRIGGER invoices_notify_finished
+            AFTER UPDATE OF status ON invoices
+            FOR EACH ROW WHEN (NEW.status IN ({statuses}) AND NEW.status IS DISTINCT FROM OLD.status)
+            EXECUTE FUNCTION invoices_notify_finished()
+        """))
+
+
+# Indexes replaced by a later release (e.g. a queue index whose predicate changed)
+_REPLACED_INDEXES = ("ix_invoices_extraction_queue",)
+
+
+def _add_missing_indexes():
+    """Create indexes added after the first release (create_all skips existing tables)."""
+    for index in app.models.Invoice.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        for name in _REPLACED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def _migrate() -> bool:
+    """Create missing tables, then apply the migrations (their errors are non-fatal)."""
+    try:
+        logger.info("Creating database schema...")
+        Base.metadata.create_all(bind=engine)
+        logger.info("  - Schema creation: SUCCESS")
+    except Exception as e:
+        logger.error(f"  - Schema creation failed: {e}")
+        return False
+    
+    try:
+        _add_missing_columns()
+        _add_missing_enum_values()
+        _add_missing_indexes()
+        _create_notify_trigger()
+        _create_finished_trigger()
+    except Exception as migration_error:
+        logger.warning(f"  - Migration check failed (non-fatal): {migration_error}")
+        # Continue - schema creation succeeded
+    return True
+
+
+def init_schema(force: bool = False) -> bool:
+    """
+    Create the schema and apply migrations, once per process.
+
+    Returns True on success. Errors are logged, not raised, so a database
+    outage does not block startup (the health check reports it instead).
+    """
+    global _schema_initialized
+    with _schema_lock:
+        if _schema_initialized and not force:
+            logger.debug("  - Schema already initialized in this process")
+            return True
+        
+        try:
+            with _migration_lock():
+                if not _migrate():
+                    return False
+        except Exception as e:
+            logger.error(f"  - Schema setup failed: {e}")
+            return False
+        
+        _schema_initialized = True
+        return True
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    sys.exit(0 if init_schema() else 1)
@@ -1,7 +1,7 @@
 import enum
 import uuid
 from datetime import datetime
-from sqlalchemy import String, DateTime, Integer, Text, Enum, JSON
+from sqlalchemy import String, DateTime, Integer, Text, Enum, JSON, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 from app.db import Base
 
@@ -9,6 +9,7 @@ class InvoiceStatus(str, enum.Enum):
     RECEIVED = "RECEIVED"
     OCR_PENDING = "OCR_PENDING"
     OCR_DONE = "OCR_DONE"
+    EXTRACTION_PENDING = "EXTRACTION_PENDING"
     EXTRACTED = "EXTRACTED"
     EXTRACTION_FAILED = "EXTRACTION_FAILED"
     FAILED_RETRYABLE = "FAILED_RETRYABLE"
@@ -20,8 +21,32 @@ class ConfidenceStatus(str, enum.Enum):
     REVIEW = "REVIEW"      # LLM fixed discrepancies, needs review
     ERROR = "ERROR"        # Validation failed, extraction unreliable
 
+# Rows waiting for each worker stage. Kept as SQL literals so the queue
+# queries in app.worker repeat the partial-index predicates exactly (the
+# planner only uses a partial index when the query implies its WHERE clause,
+# which a bound parameter cannot)
+OCR_QUEUE_WHERE = "status IN ('RECEIVED', 'FAILED_RETRYABLE')"
+EXTRACTION_QUEUE_WHERE = "status = 'OCR_DONE' AND ocr_text IS NOT NULL AND extracted_fields IS NULL"
+
 class Invoice(Base):
     __tablename__ = "invoices"
+    __table_args__ = (
+        # Lookup of an already extracted copy of an uploaded file
+        Index("ix_invoices_sha256_status", "sha256", "status"),
+        # Worker queues: partial indexes over the few rows waiting for a stage,
+        # in pick order, instead of the status index over every invoice ever
+        # received
+        Index(
+            "ix_invoices_ocr_queue", "created_at", "next_attempt_at",
+            postgresql_where=text(OCR_QUEUE_WHERE),
+            sqlite_where=text(OCR_QUEUE_WHERE),
+        ),
+        Index(
+            "ix_invoices_extraction_ready", "created_at",
+            postgresql_where=text(EXTRACTION_QUEUE_WHERE),
+            sqlite_where=text(EXTRACTION_QUEUE_WHERE),
+        ),
+    )
 
     # Use String for UUID to ensure portability across PostgreSQL and SQLite
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
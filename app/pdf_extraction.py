@@ -2,21 +2,283 @@
 PDF text extraction module.
 Uses multiple PDF libraries for robust text extraction (no ML/AI).
 
-Tries pdfplumber first (better text extraction), falls back to PyPDF2.
+Tries pdfium first (fast, compiled); pdfplumber and then PyPDF2 are used when
+pdfium is not installed or cannot open the file.
 Note: This only works for text-based PDFs. Scanned/image-based PDFs
 will return None and should be handled by the caller.
 """
+import io
 import logging
-from typing import Optional
+import os
+import threading
+import traceback
+from collections import defaultdict
+from typing import BinaryIO, Iterator, List, Optional, Union
+
+try:
+    import pdfplumber
+except ImportError:
+    pdfplumber = None
+
+try:
+    import PyPDF2
+except ImportError:
+    PyPDF2 = None
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
 
 logger = logging.getLogger(__name__)
 
+# Scanned-PDF heuristic: pages with almost no text characters whose area is
+# mostly covered by images. Only the first few pages are inspected.
+SCANNED_PDF_MAX_CHARS_PER_PAGE = 20
+SCANNED_PDF_MIN_IMAGE_COVERAGE = 0.5
+SCANNED_PDF_CHECK_PAGES = 3
+
+# PDFs up to this size are read into memory once and parsed from there
+PDF_BUFFER_MAX_BYTES = 50 * 1024 * 1024
+
+# The pdfium library is not thread-safe; OCR worker threads take turns
+_pdfium_lock = threading.Lock()
+
+
+def is_image_based_pdf(source: Union[str, BinaryIO]) -> bool:
+    """
+    Return True if a PDF looks scanned (image-only) and has no extractable text.
+
+    Averages the text characters and the fraction of page area covered by
+    images over the first SCANNED_PDF_CHECK_PAGES pages. Meant as a cheap
+    check before queueing an upload; returns False when unsure (not a PDF,
+    pdfplumber missing, parse errors) so the normal pipeline decides.
+    """
+    if pdfplumber is None:
+        return False
+
+    try:
+        with pdfplumber.open(source) as pdf:
+            pages = pdf.pages[:SCANNED_PDF_CHECK_PAGES]
+            if not pages:
+                return False
+
+            total_chars = 0
+            total_coverage = 0.0
+            for page in pages:
+                try:
+                    total_chars += len(page.chars)
+                    page_area = float(page.width * page.height)
+                    if page_area <= 0:
+                        continue
+                    image_area = 0.0
+                    for image in page.images:
+                        # Clip to the page box (images can bleed off the edges)
+                        width = min(image["x1"], page.width) - max(image["x0"], 0)
+                        height = min(image["bottom"], page.height) - max(image["top"], 0)
+                        if width > 0 and height > 0:
+                            image_area += float(width * height)
+                    total_coverage += min(image_area / page_area, 1.0)
+                finally:
+                    # Release the page's parsed layout objects before the next
+                    page.close()
+
+            return (
+                total_chars / len(pages) < SCANNED_PDF_MAX_CHARS_PER_PAGE
+                and total_coverage / len(pages) >= SCANNED_PDF_MIN_IMAGE_COVERAGE
+            )
+    except Exception as e:
+        logger.debug(f"Scanned-PDF check failed: {e}")
+        return False
+
+def _pdfplumber_page_text(page, page_num: int) -> Optional[str]:
+    """
+    Text of one pdfplumber page.
+    
+    A page without character objects has no text layer (e.g. a scanned
+    image), and every text method would re-parse it for nothing, so it is
+    skipped. Otherwise extract_text() is tried, then layout mode, then
+    rebuilding lines from the characters.
+    """
+    chars = page.chars
+    if not chars:
+        return None
+    
+    # Try standard extraction first
+    page_text = page.extract_text()
+    
+    # Try with layout preservation
+    if not page_text or not page_text.strip():
+        try:
+            page_text = page.extract_text(layout=True)
+            logger.debug(f"Used layout=True for page {page_num + 1}")
+        except:
+            pass
+    
+    # Rebuild lines from the character objects - this is the KEY fallback
+    if not page_text or not page_text.strip():
+        try:
+            logger.info(f"Page {page_num + 1} has {len(chars)} character objects - reconstructing text")
+            # Reconstruct text from ALL character objects
+            # Group chars by approximate y position (lines) to preserve layout
+            lines = defaultdict(list)
+
+            # Process all characters, not just first 100
+            for char in chars:
+                char_text = char.get('text', '')
+                if char_text:  # Only add non-empty characters
+                    # Use top position to group into lines
+                    # Round to nearest 5 pixels to group similar y positions
+                    y = round(char.get('top', 0) / 5) * 5
+                    x = char.get('x0', 0)  # Store x position for sorting
+                    lines[y].append((x, char_text))
+
+            # Sort by y position (top to bottom), then by x position (left to right)
+            reconstructed_lines = []
+            for y in sorted(lines.keys(), reverse=True):  # Reverse for top-to-bottom
+                # Sort characters in line by x position
+                line_chars = sorted(lines[y], key=lambda c: c[0])
+                line_text = ''.join(text for _, text in line_chars)
+                if line_text.strip():
+                    reconstructed_lines.append(line_text)
+
+            if reconstructed_lines:
+                page_text = '\n'.join(reconstructed_lines)
+                logger.info(f"Successfully reconstructed {len(reconstructed_lines)} lines ({len(page_text)} chars) from {len(chars)} character objects on page {page_num + 1}")
+            else:
+                logger.warning(f"Could not reconstruct text from {len(chars)} character objects on page {page_num + 1}")
+        except Exception as e:
+            logger.warning(f"Character extraction failed for page {page_num + 1}: {e}")
+            logger.debug(traceback.format_exc())
+    
+    return page_text
+
+
+def _iter_page_texts(pdf) -> Iterator[str]:
+    """Yield the stripped text of each page ("" for a page without text), closing each page."""
+    for page_num in range(len(pdf.pages)):
+        page = pdf.pages[page_num]
+        try:
+            page_text = _pdfplumber_page_text(page, page_num)
+        except Exception as e:
+            logger.warning(f"Failed to extract text from page {page_num + 1} with pdfplumber: {e}")
+            page_text = None
+        finally:
+            page.close()
+        
+        if page_text and page_text.strip():
+            logger.info(f"Extracted {len(page_text)} characters from page {page_num + 1} with pdfplumber")
+            yield page_text.strip()
+        else:
+            logger.debug(f"No text found on page {page_num + 1} with pdfplumber")
+            yield ""
+
+
+def iter_pdf_pages(file_path: str, file: Optional[BinaryIO] = None) -> Iterator[str]:
+    """
+    Yield the stripped text of each page that has any, using pdfplumber.
+    
+    Each page's parsed layout objects are released as soon as its text is
+    taken, so memory stays at about one page however long the document is.
+    Reads from file when an open file is given. Raises ImportError if
+    pdfplumber is not installed.
+    """
+    if pdfplumber is None:
+        raise ImportError("pdfplumber is not installed")
+    
+    with pdfplumber.open(file if file is not None else file_path) as pdf:
+        total_pages = len(pdf.pages)
+        logger.info(f"Attempting extraction with pdfplumber ({total_pages} pages)")
+        
+        # Diagnostic: Check PDF metadata
+        try:
+            metadata = pdf.metadata
+            if metadata:
+                logger.debug(f"PDF metadata: {metadata}")
+        except:
+            pass
+        
+        for page_text in _iter_page_texts(pdf):
+            if page_text:
+                yield page_text
+
+
+def iter_pdf_pages_pdfium(file: BinaryIO) -> Iterator[str]:
+    """
+    Yield the stripped text of each page that has any, using pdfium.
+    
+    pdfium parses in C, many times faster than pdfplumber's pure-Python layout
+    analysis, and gives the same lines for ordinary text PDFs. Pages are read
+    as they are consumed, and pdfium is locked until the generator is exhausted
+    or closed. Raises ImportError if pypdfium2 is not installed, and
+    pypdfium2's PdfiumError if the file cannot be opened (e.g. encrypted).
+    """
+    if pypdfium2 is None:
+        raise ImportError("pypdfium2 is not installed")
+    
+    # pdfium loads an in-memory PDF directly rather than through read callbacks
+    source = file.getvalue() if isinstance(file, io.BytesIO) else file
+    with _pdfium_lock:
+        pdf = pypdfium2.PdfDocument(source)
+        try:
+            for page_num in range(len(pdf)):
+                page = pdf[page_num]
+                try:
+                    textpage = page.get_textpage()
+                    try:
+                        page_text = textpage.get_text_range()
+                    finally:
+                        textpage.close()
+                finally:
+                    page.close()
+                
+                page_text = page_text.replace("\r\n", "\n").strip()
+                if page_text:
+                    logger.debug(f"Extracted {len(page_text)} characters from page {page_num + 1} with pdfium")
+                    yield page_text
+        finally:
+            pdf.close()
+
+
+def extract_pdf_pages_pdfium(file: BinaryIO) -> List[str]:
+    """Return the stripped text of each page that has any, using pdfium (see iter_pdf_pages_pdfium)."""
+    return list(iter_pdf_pages_pdfium(file))
+
+
+def stream_pdf_pages(file_path: str) -> Iterator[str]:
+    """
+    Yield the text of each page of a text PDF as it is read, for callers that
+    can stop once they have what they need (pages after that are never parsed).
+    
+    Reads with pdfium, or pdfplumber when pdfium is not installed or cannot
+    open the file. Yields nothing for an image-based (scanned) PDF. Unlike
+    extract_text_from_pdf, there is no PyPDF2 fallback and errors propagate.
+    """
+    with open(file_path, 'rb') as file:
+        if pypdfium2 is not None:
+            try:
+                pages = iter_pdf_pages_pdfium(file)
+                first_page = next(pages, None)
+            except Exception as e:
+                logger.warning(f"pdfium extraction failed: {e}, trying pdfplumber")
+                file.seek(0)
+            else:
+                if first_page is not None:
+                    yield first_page
+                    yield from pages
+                return
+        
+        yield from iter_pdf_pages(file_path, file)
+
+
 def extract_text_from_pdf(file_path: str) -> Optional[str]:
     """
     Extract text from PDF file using multiple extraction methods.
     
-    Tries pdfplumber first (better at extracting text from complex PDFs),
-    then falls back to PyPDF2 if pdfplumber is not available.
+    Tries pdfium first (fastest), then pdfplumber (better at extracting text
+    from complex PDFs), then falls back to PyPDF2. The fallbacks only run if
+    pdfium is missing or cannot read the file: a PDF in which pdfium finds no
+    text is image-based, and the other parsers would not find any either.
     
     This function extracts text from text-based PDFs only.
     For scanned/image-based PDFs, this will return None.
@@ -30,255 +292,164 @@ def extract_text_from_pdf(file_path: str) -> Optional[str]:
         - PDF is corrupted
         - Extraction fails for any reason
     """
-    import os
-    
-    # Validate file exists and is readable
-    if not os.path.exists(file_path):
+    # One descriptor serves the header check, pdfium, pdfplumber and the
+    # PyPDF2 fallback, instead of each opening (and stat-ing) the path again
+    try:
+        file = open(file_path, 'rb')
+    except FileNotFoundError:
         logger.error(f"PDF file does not exist: {file_path}")
         return None
+    except Exception as e:
+        logger.error(f"Could not read PDF file: {e}")
+        return None
     
+    with file:
+        try:
+            file_size = os.fstat(file.fileno()).st_size
+        except OSError as e:
+            logger.error(f"Could not read PDF file: {e}")
+            return None
+        
+        # The libraries read the file front to back; hint readahead (Linux)
+        if hasattr(os, "posix_fadvise"):
+            try:
+                os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass
+        
+        if file_size <= PDF_BUFFER_MAX_BYTES:
+            # The parsers seek and read in small pieces all over the file; in
+            # memory each of those is a copy instead of a system call
+            try:
+                buffer = io.BytesIO(file.read())
+            except OSError as e:
+                logger.error(f"Could not read PDF file: {e}")
+                return None
+            return _extract_text_from_pdf_file(file_path, buffer, file_size)
+        return _extract_text_from_pdf_file(file_path, file, file_size)
+
+
+def _extract_text_from_pdf_file(file_path: str, file: BinaryIO, file_size: int) -> Optional[str]:
+    """extract_text_from_pdf() on an open file (file_path is used for logging and the page pool)."""
     # Verify it's actually a PDF file
     try:
-        with open(file_path, 'rb') as f:
-            header = f.read(4)
-            if header != b'%PDF':
-                logger.error(f"File does not appear to be a PDF (header: {header})")
-                return None
-            # Reset file pointer
-            f.seek(0)
+        header = file.read(4)
+        if header != b'%PDF':
+            logger.error(f"File does not appear to be a PDF (header: {header})")
+            return None
+        # Reset file pointer
+        file.seek(0)
     except Exception as e:
         logger.error(f"Could not read PDF file: {e}")
         return None
     
-    file_size = os.path.getsize(file_path)
     logger.info(f"Processing PDF: {file_path} ({file_size} bytes)")
-    # Try pdfplumber first (better text extraction)
-    pdfplumber_available = False
-    try:
-        import pdfplumber
-        pdfplumber_available = True
-        logger.info("pdfplumber is available")
-    except ImportError:
-        logger.info("pdfplumber not available, will use PyPDF2 only")
+    # Try pdfium first (fastest); pdfplumber is installed with it
+    if pypdfium2 is not None:
+        try:
+            text_parts = extract_pdf_pages_pdfium(file)
+            if text_parts:
+                full_text = "\n\n".join(text_parts)
+                logger.info(f"Successfully extracted text with pdfium: {len(text_parts)} page(s) ({len(full_text)} total characters)")
+                return full_text
+            # pdfium read every page and found no text objects on any of them:
+            # an image-only (scanned) PDF, where pdfplumber and PyPDF2 would
+            # only parse the whole file again to find nothing
+            logger.warning("No text found in PDF with pdfium - file is likely image-based (scanned)")
+            return None
+        except Exception as e:
+            logger.warning(f"pdfium extraction failed: {e}, trying pdfplumber")
+            logger.debug(traceback.format_exc())
+        file.seek(0)
     
-    if pdfplumber_available:
+    # Then pdfplumber (better text extraction)
+    if pdfplumber is None:
+        logger.info("pdfplumber not available, will use PyPDF2 only")
+    else:
         try:
-            text_parts = []
-            with pdfplumber.open(file_path) as pdf:
-                total_pages = len(pdf.pages)
-                logger.info(f"Attempting extraction with pdfplumber ({total_pages} pages)")
-                
-                # Diagnostic: Check PDF metadata
-                try:
-                    metadata = pdf.metadata
-                    if metadata:
-                        logger.debug(f"PDF metadata: {metadata}")
-                except:
-                    pass
-                
-                for page_num, page in enumerate(pdf.pages):
-                    try:
-                        # Try standard extraction first
-                        page_text = page.extract_text()
-                        
-                        # If extract_text() returns None or empty, try extract_text_simple()
-                        if not page_text or not page_text.strip():
-                            try:
-                                page_text = page.extract_text_simple()
-                                logger.debug(f"Used extract_text_simple() for page {page_num + 1}")
-                            except:
-                                pass
-                        
-                        # Try with layout preservation
-                        if not page_text or not page_text.strip():
-                            try:
-                                page_text = page.extract_text(layout=True)
-                                logger.debug(f"Used layout=True for page {page_num + 1}")
-                            except:
-                                pass
-                        
-                        # If still empty, try extracting tables (sometimes text is in tables)
-                        if not page_text or not page_text.strip():
-                            try:
-                                tables = page.extract_tables()
-                                if tables:
-                                    # Convert tables to text
-                                    table_texts = []
-                                    for table in tables:
-                                        for row in table:
-                                            if row:
-                                                table_texts.append(" | ".join(str(cell) if cell else "" for cell in row))
-                                    if table_texts:
-                                        page_text = "\n".join(table_texts)
-                                        logger.info(f"Extracted text from tables on page {page_num + 1}")
-                            except Exception as e:
-                                logger.debug(f"Table extraction failed for page {page_num + 1}: {e}")
-                        
-                        # Diagnostic: Check if page has chars attribute - this is the KEY fallback
-                        if not page_text or not page_text.strip():
-                            try:
-                                chars = page.chars
-                                if chars and len(chars) > 0:
-                                    logger.info(f"Page {page_num + 1} has {len(chars)} character objects - reconstructing text")
-                                    # Reconstruct text from ALL character objects
-                                    # Group chars by approximate y position (lines) to preserve layout
-                                    from collections import defaultdict
-                                    lines = defaultdict(list)
-                                    
-                                    # Process all characters, not just first 100
-                                    for char in chars:
-                                        char_text = char.get('text', '')
-                                        if char_text:  # Only add non-empty characters
-                                            # Use top position to group into lines
-                                            # Round to nearest 5 pixels to group similar y positions
-                                            y = round(char.get('top', 0) / 5) * 5
-                                            x = char.get('x0', 0)  # Store x position for sorting
-                                            lines[y].append((x, char_text))
-                                    
-                                    # Sort by y position (top to bottom), then by x position (left to right)
-                                    reconstructed_lines = []
-                                    for y in sorted(lines.keys(), reverse=True):  # Reverse for top-to-bottom
-                                        # Sort characters in line by x position
-                                        line_chars = sorted(lines[y], key=lambda c: c[0])
-                                        line_text = ''.join(text for _, text in line_chars)
-                                        if line_text.strip():
-                                            reconstructed_lines.append(line_text)
-                                    
-                                    if reconstructed_lines:
-                                        page_text = '\n'.join(reconstructed_lines)
-                                        logger.info(f"Successfully reconstructed {len(reconstructed_lines)} lines ({len(page_text)} chars) from {len(chars)} character objects on page {page_num + 1}")
-                                    else:
-                                        logger.warning(f"Could not reconstruct text from {len(chars)} character objects on page {page_num + 1}")
-                            except Exception as e:
-                                logger.warning(f"Character extraction failed for page {page_num + 1}: {e}")
-                                import traceback
-                                logger.debug(traceback.format_exc())
-                        
-                        if page_text and page_text.strip():
-                            text_parts.append(page_text.strip())
-                            logger.info(f"Extracted {len(page_text)} characters from page {page_num + 1} with pdfplumber")
-                        else:
-                            logger.debug(f"No text found on page {page_num + 1} with pdfplumber")
-                    except Exception as e:
-                        logger.warning(f"Failed to extract text from page {page_num + 1} with pdfplumber: {e}")
-                        continue
-                
-                if text_parts:
-                    full_text = "\n\n".join(text_parts)
-                    logger.info(f"Successfully extracted text with pdfplumber: {len(text_parts)}/{total_pages} page(s) ({len(full_text)} total characters)")
-                    return full_text
-                else:
-                    logger.warning(f"pdfplumber extracted no text ({total_pages} pages) - trying PyPDF2 fallback")
+            text_parts = list(iter_pdf_pages(file_path, file))
+            if text_parts:
+                full_text = "\n\n".join(text_parts)
+                logger.info(f"Successfully extracted text with pdfplumber: {len(text_parts)} page(s) ({len(full_text)} total characters)")
+                return full_text
+            else:
+                logger.warning("pdfplumber extracted no text - trying PyPDF2 fallback")
         except Exception as e:
             logger.warning(f"pdfplumber extraction failed: {e}, trying PyPDF2 fallback")
-            import traceback
             logger.debug(traceback.format_exc())
     
     # Fallback to PyPDF2
+    if PyPDF2 is None:
+        logger.error("PyPDF2 not installed. Install with: pip install PyPDF2")
+        return None
+    
     try:
-        import PyPDF2
+        logger.info(f"Reading PDF file: {file_path} ({file_size} bytes)")
+        file.seek(0)
+        pdf_reader = PyPDF2.PdfReader(file)
         
-        # Verify file exists and is readable
-        import os
-        if not os.path.exists(file_path):
-            logger.error(f"PDF file not found: {file_path}")
+        # Check if PDF is encrypted
+        if pdf_reader.is_encrypted:
+            logger.warning("PDF is encrypted - cannot extract text")
             return None
         
-        file_size = os.path.getsize(file_path)
-        logger.info(f"Reading PDF file: {file_path} ({file_size} bytes)")
+        # Extract text from all pages
+        text_parts = []
+        font_pages = 0
+        image_pages = []
+        total_pages = len(pdf_reader.pages)
+        logger.info(f"Attempting extraction with PyPDF2 ({total_pages} pages)")
         
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            # Check if PDF is encrypted
-            if pdf_reader.is_encrypted:
-                logger.warning("PDF is encrypted - cannot extract text")
-                return None
-            
-            # Extract text from all pages
-            text_parts = []
-            total_pages = len(pdf_reader.pages)
-            logger.info(f"Attempting extraction with PyPDF2 ({total_pages} pages)")
-            
-            for page_num, page in enumerate(pdf_reader.pages):
-                try:
-                    # Try standard extraction
-                    page_text = page.extract_text()
-                    
-                    # If that fails, try extract_text with layout preservation
-                    if not page_text or not page_text.strip():
-                        try:
-                            page_text = page.extract_text(extraction_mode="layout")
-                            logger.debug(f"Used layout mode for page {page_num + 1}")
-                        except:
-                            pass
-                    
-                    # Try with different parameters
-                    if not page_text or not page_text.strip():
-                        try:
-                            # Try accessing text directly from page object
-                            if hasattr(page, 'get_contents'):
-                                contents = page.get_contents()
-                                if contents:
-                                    logger.debug(f"Found contents object on page {page_num + 1}")
-                        except:
-                            pass
-                    
-                    if page_text and page_text.strip():
-                        text_parts.append(page_text.strip())
-                        logger.info(f"Extracted {len(page_text)} characters from page {page_num + 1} with PyPDF2")
-                    else:
-                        logger.debug(f"No text found on page {page_num + 1} with PyPDF2 (page type: {type(page)})")
-                except Exception as e:
-                    logger.warning(f"Failed to extract text from page {page_num + 1}: {e}")
-                    import traceback
-                    logger.debug(traceback.format_exc())
-                    continue
-            
-            if text_parts:
-                full_text = "\n\n".join(text_parts)
-                logger.info(f"Successfully extracted text with PyPDF2: {len(text_parts)}/{total_pages} page(s) ({len(full_text)} total characters)")
-                return full_text
-            else:
-                logger.warning(f"No text extracted from PDF ({total_pages} pages) - file may be image-based (scanned) or contain no extractable text")
+        for page_num, page in enumerate(pdf_reader.pages):
+            try:
+                # Try standard extraction
+                page_text = page.extract_text()
                 
-                # Diagnostic: Check PDF structure
-                try:
-                    # Check if PDF has text objects
-                    has_text = False
-                    for page in pdf_reader.pages:
-                        if hasattr(page, 'get_contents'):
-                            contents = page.get_contents()
-                            if contents:
-                                content_str = str(contents)
-                                # Look for text operators
-                                if '/F' in content_str or 'BT' in content_str or 'Tj' in content_str:
-                                    has_text = True
-                                    logger.debug(f"PDF contains text operators but extraction failed")
-                                    break
-                    
-                    if not has_text:
-                        logger.info("PDF structure analysis: No text operators found - likely image-based PDF")
-                    
-                    # Check for images
+                # If that fails, try extract_text with layout preservation
+                if not page_text or not page_text.strip():
                     try:
-                        for page_num, page in enumerate(pdf_reader.pages):
-                            if '/XObject' in str(page.get_resources() if hasattr(page, 'get_resources') else ''):
-                                logger.info(f"Page {page_num + 1} contains XObject (likely images)")
+                        page_text = page.extract_text(extraction_mode="layout")
+                        logger.debug(f"Used layout mode for page {page_num + 1}")
                     except:
                         pass
-                        
-                except Exception as diag_e:
-                    logger.debug(f"Diagnostic check failed: {diag_e}")
-                
-                return None
                 
-    except ImportError:
-        logger.error("PyPDF2 not installed. Install with: pip install PyPDF2")
-        return None
+                if page_text and page_text.strip():
+                    text_parts.append(page_text.strip())
+                    logger.info(f"Extracted {len(page_text)} characters from page {page_num + 1} with PyPDF2")
+                else:
+                    logger.debug(f"No text found on page {page_num + 1} with PyPDF2 (page type: {type(page)})")
+                    # Diagnostics for the no-text warning, read from the page's
+                    # resource dictionary now rather than in extra passes later
+                    resources = page.get('/Resources')
+                    resources = resources.get_object() if resources is not None else {}
+                    if '/Font' in resources:
+                        font_pages += 1
+                    if '/XObject' in resources:
+                        image_pages.append(page_num + 1)
+            except Exception as e:
+                logger.warning(f"Failed to extract text from page {page_num + 1}: {e}")
+                logger.debug(traceback.format_exc())
+                continue
+        
+        if text_parts:
+            full_text = "\n\n".join(text_parts)
+            logger.info(f"Successfully extracted text with PyPDF2: {len(text_parts)}/{total_pages} page(s) ({len(full_text)} total characters)")
+            return full_text
+        else:
+            logger.warning(f"No text extracted from PDF ({total_pages} pages) - file may be image-based (scanned) or contain no extractable text")
+            
+            # Diagnostic: PDF structure of the pages without text
+            if font_pages:
+                logger.debug(f"{font_pages} page(s) reference fonts but extraction failed")
+            else:
+                logger.info("PDF structure analysis: No fonts found - likely image-based PDF")
+            for page_num in image_pages:
+                logger.info(f"Page {page_num} contains XObject (likely images)")
+            
+            return None
+            
     except Exception as e:
         logger.error(f"PDF text extraction failed: {e}")
-        import traceback
         logger.error(traceback.format_exc())
         return None
 
@@ -1,10 +1,15 @@
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 from app.models import InvoiceStatus, ConfidenceStatus
 
 class InvoiceOut(BaseModel):
-    id: str  # UUID stored as string for portability
+    model_config = ConfigDict(from_attributes=True)
+
+    # Canonical UUID string, as stored (portable across databases). Routes
+    # check the format with a regex; parsing into uuid.UUID here and formatting
+    # back for JSON would only add work per row
+    id: str
     email_message_id: str
     sender: str
     subject: str
@@ -19,6 +24,3 @@ class InvoiceOut(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
-
@@ -4,13 +4,118 @@ Unified text extraction module.
 Handles both PDF files and image files (PNG, JPEG, TIFF, etc.).
 Automatically detects file type and uses appropriate extraction method.
 """
+import functools
 import logging
-from typing import Optional
+from typing import Callable, Dict, Optional, Tuple
 import os
 
+from app.image_extraction import (
+    easyocr_available,
+    extract_text_from_image,
+    extract_text_from_image_easyocr,
+    is_image_file,
+    tesseract_available,
+)
+from app.pdf_extraction import extract_text_from_pdf
+
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=1)
+def _ocr_backends() -> Tuple[Callable[[str], Optional[str]], ...]:
+    """
+    Image OCR functions installed on this host, in preference order.
+    
+    Resolved once per process, so a host without Tesseract does not load and
+    fail on every image before EasyOCR is tried.
+    """
+    backends = []
+    # Tesseract first (faster, more accurate)
+    if tesseract_available():
+        backends.append(extract_text_from_image)
+    if easyocr_available():
+        backends.append(extract_text_from_image_easyocr)
+    if not backends:
+        logger.warning("No OCR backend available: install Tesseract (with pytesseract) or EasyOCR")
+    else:
+        logger.info(f"OCR backends: {', '.join(backend.__name__ for backend in backends)}")
+    return tuple(backends)
+
+
+def _extract_image_text(file_path: str) -> Optional[str]:
+    """OCR an image file: Tesseract first, EasyOCR as fallback (whichever are installed)."""
+    logger.info(f"Detected image file: {file_path}")
+    
+    for i, backend in enumerate(_ocr_backends()):
+        if i:
+            # Tesseract returned nothing for this image
+            logger.info("Tesseract OCR failed, trying EasyOCR...")
+        text = backend(file_path)
+        if text:
+            return text
+    
+    logger.warning(f"Could not extract text from image: {file_path}")
+    return None
+
+
+def _extract_pdf_text(file_path: str) -> Optional[str]:
+    """Extract text from a text-based PDF."""
+    logger.info(f"Detected PDF file: {file_path}")
+    return extract_text_from_pdf(file_path)
+
+
+@functools.lru_cache(maxsize=1024)
+def _read_magic(file_path: str, mtime_ns: int, size: int) -> bytes:
+    with open(file_path, 'rb') as f:
+        return f.read(8)
+
+
+def _file_magic(file_path: str) -> bytes:
+    """
+    First bytes of a file, read once per file version.
+    
+    is_supported_file_type() followed by extract_text_from_file() would
+    otherwise open the file twice; the cache key includes mtime and size, so
+    a rewritten file is read again.
+    """
+    st = os.stat(file_path)
+    return _read_magic(file_path, st.st_mtime_ns, st.st_size)
+
+
+# Extractors by declared MIME type; anything else is detected from the file
+# (image extension, then the PDF header)
+_EXTRACTORS: Dict[str, Callable[[str], Optional[str]]] = {
+    'application/pdf': _extract_pdf_text,
+    'application/x-pdf': _extract_pdf_text,
+}
+
+
+def get_text_extractor(file_path: str, content_type: Optional[str] = None) -> Optional[Callable[[str], Optional[str]]]:
+    """
+    Resolve the text extractor for a file once, or None if the type is unsupported.
+    
+    Image detection uses the extension or MIME type (no I/O). A declared PDF
+    MIME type is trusted (the PDF extractor validates the header itself);
+    otherwise the first bytes are read to recognise a PDF.
+    """
+    if is_image_file(file_path, content_type):
+        return _extract_image_text
+    
+    if content_type:
+        extractor = _EXTRACTORS.get(content_type.lower().split(';')[0].strip())
+        if extractor is not None:
+            return extractor
+    
+    # Check if it's a PDF file
+    try:
+        if _file_magic(file_path).startswith(b'%PDF'):
+            return _extract_pdf_text
+    except Exception as e:
+        logger.debug(f"Error checking PDF header: {e}")
+    
+    return None
+
+
 def extract_text_from_file(file_path: str, content_type: Optional[str] = None) -> Optional[str]:
     """
     Extract text from a file (PDF or image).
@@ -33,40 +138,13 @@ def extract_text_from_file(file_path: str, content_type: Optional[str] = None) -
         logger.error(f"File does not exist: {file_path}")
         return None
     
-    # Check if it's an image file
-    from app.image_extraction import is_image_file, extract_text_from_image, extract_text_from_image_easyocr
-    
-    if is_image_file(file_path, content_type):
-        logger.info(f"Detected image file: {file_path}")
-        
-        # Try Tesseract OCR first (faster, more accurate)
-        text = extract_text_from_image(file_path)
-        if text:
-            return text
-        
-        # Fallback to EasyOCR if Tesseract fails or is not available
-        logger.info("Tesseract OCR failed or unavailable, trying EasyOCR...")
-        text = extract_text_from_image_easyocr(file_path)
-        if text:
-            return text
-        
-        logger.warning(f"Could not extract text from image: {file_path}")
+    extractor = get_text_extractor(file_path, content_type)
+    if extractor is None:
+        # Unknown file type
+        logger.warning(f"Unsupported file type: {file_path} (content_type: {content_type})")
         return None
     
-    # Check if it's a PDF file
-    try:
-        with open(file_path, 'rb') as f:
-            header = f.read(4)
-            if header == b'%PDF':
-                logger.info(f"Detected PDF file: {file_path}")
-                from app.pdf_extraction import extract_text_from_pdf
-                return extract_text_from_pdf(file_path)
-    except Exception as e:
-        logger.debug(f"Error checking PDF header: {e}")
-    
-    # Unknown file type
-    logger.warning(f"Unsupported file type: {file_path} (content_type: {content_type})")
-    return None
+    return extractor(file_path)
 
 
 def is_supported_file_type(file_path: str, content_type: Optional[str] = None) -> bool:
@@ -80,21 +158,4 @@ def is_supported_file_type(file_path: str, content_type: Optional[str] = None) -
     Returns:
         True if file type is supported, False otherwise
     """
-    from app.image_extraction import is_image_file
-    
-    # Check if it's an image
-    if is_image_file(file_path, content_type):
-        return True
-    
-    # Check if it's a PDF
-    try:
-        if os.path.exists(file_path):
-            with open(file_path, 'rb') as f:
-                header = f.read(4)
-                if header == b'%PDF':
-                    return True
-    except Exception:
-        pass
-    
-    return False
-
+    return get_text_extractor(file_path, content_type) is not None
@@ -1,44 +1,186 @@
+import logging
+import threading
+import time
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from app.models import Invoice, InvoiceStatus, ConfidenceStatus
+from typing import Callable
+from sqlalchemy import func, text, update
+from sqlalchemy.orm import Session, defer
+from app.models import Invoice, InvoiceStatus, ConfidenceStatus, OCR_QUEUE_WHERE, EXTRACTION_QUEUE_WHERE
 from app.config import settings
 from app.extraction.rule_based import extract_invoice_fields
 
+logger = logging.getLogger(__name__)
+
+# Wake idle worker threads when new work is queued, one condition per stage.
+# A pending flag remembers a notification sent while every worker of that stage
+# was busy, so it is not lost; idle OCR waits end when the next scheduled retry
+# (next_attempt_at) is due
+OCR_QUEUE = "ocr"
+EXTRACTION_QUEUE = "extraction"
+_work_cvs = {OCR_QUEUE: threading.Condition(), EXTRACTION_QUEUE: threading.Condition()}
+_work_pending = {OCR_QUEUE: False, EXTRACTION_QUEUE: False}
+
+
+def notify_new_work(queue: str = OCR_QUEUE):
+    """Wake one idle worker of a stage (call after committing a new job)."""
+    with _work_cvs[queue]:
+        _work_pending[queue] = True
+        _work_cvs[queue].notify()
+
+
+def wait_for_work(queue: str = OCR_QUEUE, timeout: float = 2.0):
+    """Block until new work is notified for the stage or the timeout expires."""
+    with _work_cvs[queue]:
+        _work_cvs[queue].wait_for(lambda: _work_pending[queue], timeout=timeout)
+        _work_pending[queue] = False
+
+
+# PostgreSQL channels notified by triggers (see app.migrate): OCR_CHANNEL when
+# an invoice is received, so workers in another process than the upload wake
+# at once; FINISHED_CHANNEL (payload: the invoice id) when it reaches a final
+# status, so a web process can answer a request waiting on that invoice
+OCR_CHANNEL = "invoice_received"
+FINISHED_CHANNEL = "invoice_finished"
+LISTEN_RECONNECT_SECONDS = 5
+
+
+def can_listen_for_new_work(engine) -> bool:
+    """True if the engine's driver can LISTEN (PostgreSQL through psycopg 3)."""
+    return engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg"
+
+
+def listen(engine, channel: str, on_notify: Callable[[str], None], on_connect: Callable[[], None] | None = None):
+    """
+    Call on_notify(payload) for every NOTIFY on channel (blocks).
+
+    Holds one connection of the engine's pool in autocommit mode; it is
+    discarded, not returned to the pool, when the connection fails, and a new
+    one is opened after LISTEN_RECONNECT_SECONDS. on_connect runs after each
+    LISTEN, for what was missed while (re)connecting.
+    """
+    while True:
+        raw = None
+        try:
+            raw = engine.raw_connection()
+            conn = raw.driver_connection
+            # End the transaction the pool's pre-ping may have begun: psycopg
+            # only switches to autocommit outside a transaction
+            conn.rollback()
+            conn.autocommit = True
+            conn.execute(f"LISTEN {channel}")
+            if on_connect is not None:
+                on_connect()
+            for notification in conn.notifies():
+                on_notify(notification.payload)
+        except Exception as e:
+            logger.warning(f"Listening on {channel} failed ({e}); reconnecting in {LISTEN_RECONNECT_SECONDS}s")
+        finally:
+            if raw is not None:
+                raw.invalidate()
+        time.sleep(LISTEN_RECONNECT_SECONDS)
+
+
+def listen_for_new_work(engine):
+    """Wake an OCR worker of this process for every NOTIFY on OCR_CHANNEL (blocks)."""
+    # Uploads received while (re)connecting were not notified
+    listen(engine, OCR_CHANNEL, lambda _: notify_new_work(OCR_QUEUE), on_connect=lambda: notify_new_work(OCR_QUEUE))
+
+
+# Retry delay by attempt count: doubling from 1 minute, capped at 60 minutes
+BACKOFF_MINUTES = (1, 1, 2, 4, 8, 16, 32, 60)
+
+
 def compute_backoff_minutes(attempt_count: int) -> int:
     # attempt_count is incremented before scheduling
-    return min(2 ** max(attempt_count - 1, 0), 60)  # cap at 60 minutes
+    return BACKOFF_MINUTES[min(max(attempt_count, 0), len(BACKOFF_MINUTES) - 1)]
+
+def _mark_claimed(db: Session, jobs: list[Invoice], status: InvoiceStatus, now: datetime):
+    """Set the status of a claimed batch with one UPDATE (not one per row) and commit."""
+    if not jobs:
+        return
+    # "evaluate" applies the new values to the loaded objects as well, so the
+    # session neither re-reads them nor flushes them again
+    db.execute(
+        update(Invoice)
+        .where(Invoice.id.in_([inv.id for inv in jobs]))
+        .values(status=status, updated_at=now),
+        execution_options={"synchronize_session": "evaluate"},
+    )
+    db.commit()
 
-def pick_next_ocr_job(db: Session) -> Invoice | None:
+
+def claim_ocr_jobs(db: Session, limit: int = 8) -> list[Invoice]:
+    """
+    Pick up to `limit` due OCR jobs and mark them OCR_PENDING in one commit.
+
+    Claiming the whole batch at once keeps other workers off the rows once the
+    SKIP LOCKED row locks are released by the commit.
+    """
     now = datetime.utcnow()
-    return (
+    jobs = (
         db.query(Invoice)
-        .filter(Invoice.status.in_([InvoiceStatus.RECEIVED, InvoiceStatus.FAILED_RETRYABLE]))
+        # The OCR stage only writes the text columns: leave them out of the
+        # SELECT (a retried row already carries its last error message)
+        .options(defer(Invoice.ocr_text), defer(Invoice.extracted_fields), defer(Invoice.last_error))
+        .filter(text(OCR_QUEUE_WHERE))
         .filter(Invoice.next_attempt_at <= now)
         .order_by(Invoice.created_at.asc())
-        .first()
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
     )
+    _mark_claimed(db, jobs, InvoiceStatus.OCR_PENDING, now)
+    return jobs
+
+def seconds_until_next_ocr_job(db: Session, max_wait: float) -> float:
+    """
+    Seconds until the earliest scheduled OCR retry is due, capped at max_wait.
+
+    New uploads wake the workers through notify_new_work(), so an idle worker
+    only needs to wake on its own for retries whose backoff has run out.
+    """
+    next_attempt_at = (
+        db.query(func.min(Invoice.next_attempt_at))
+        .filter(text(OCR_QUEUE_WHERE))
+        .scalar()
+    )
+    if next_attempt_at is None:
+        return max_wait
+    return min(max(0.0, (next_attempt_at - datetime.utcnow()).total_seconds()), max_wait)
+
 
+def find_ocr_text(db: Session, sha256: str) -> str | None:
+    """
+    Return text already extracted from a file with the same content, if any.
+
+    Resent invoices that arrive before the first copy is extracted are not
+    deduplicated at ingest, so each would otherwise be read again.
+    """
+    return (
+        db.query(Invoice.ocr_text)
+        .filter(Invoice.sha256 == sha256, Invoice.ocr_text.isnot(None))
+        .limit(1)
+        .scalar()
+    )
+
+# The mark_* helpers commit without reloading the row: worker sessions keep
+# object state across commits (expire_on_commit=False), and a refresh would
+# read the whole row back, ocr_text included, after every status change.
 def mark_retry(db: Session, inv: Invoice, error: str):
+    now = datetime.utcnow()
     inv.attempt_count += 1
     inv.last_error = error
 
     if inv.attempt_count >= settings.max_attempts:
         inv.status = InvoiceStatus.FAILED_FINAL
-        inv.next_attempt_at = datetime.utcnow()
+        inv.next_attempt_at = now
     else:
         inv.status = InvoiceStatus.FAILED_RETRYABLE
         minutes = compute_backoff_minutes(inv.attempt_count)
-        inv.next_attempt_at = datetime.utcnow() + timedelta(minutes=minutes)
-
-    inv.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(inv)
+        inv.next_attempt_at = now + timedelta(minutes=minutes)
 
-def mark_ocr_pending(db: Session, inv: Invoice):
-    inv.status = InvoiceStatus.OCR_PENDING
-    inv.updated_at = datetime.utcnow()
+    inv.updated_at = now
     db.commit()
-    db.refresh(inv)
 
 def mark_ocr_done(db: Session, inv: Invoice, ocr_text: str = ""):
     inv.status = InvoiceStatus.OCR_DONE
@@ -46,20 +188,124 @@ def mark_ocr_done(db: Session, inv: Invoice, ocr_text: str = ""):
         inv.ocr_text = ocr_text
     inv.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(inv)
+    notify_new_work(EXTRACTION_QUEUE)
 
 
-def pick_next_extraction_job(db: Session) -> Invoice | None:
-    """Pick the next invoice that needs field extraction."""
+def claim_extraction_jobs(db: Session, limit: int = 4) -> list[Invoice]:
+    """
+    Pick up to `limit` invoices that need field extraction and mark them
+    EXTRACTION_PENDING in one commit.
+
+    As with claim_ocr_jobs(), the claim is committed at once, so no row lock or
+    transaction stays open while a job waits for the pipeline (or an LLM call).
+    """
     now = datetime.utcnow()
-    return (
+    jobs = (
         db.query(Invoice)
-        .filter(Invoice.status == InvoiceStatus.OCR_DONE)
-        .filter(Invoice.ocr_text.isnot(None))  # Must have OCR text
-        .filter(Invoice.extracted_fields.is_(None))  # Not yet extracted
+        .filter(text(EXTRACTION_QUEUE_WHERE))  # OCR text present, not yet extracted
         .order_by(Invoice.created_at.asc())
-        .first()
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
     )
+    _mark_claimed(db, jobs, InvoiceStatus.EXTRACTION_PENDING, now)
+    return jobs
+
+
+# A claimed job whose worker stopped (crash, redeploy, lost connection) keeps
+# its *_PENDING status; once its claim is this old it is handed back to its
+# queue. It must outlast a whole claimed batch, not one job: the last job of a
+# batch waits for the ones before it
+CLAIM_TIMEOUT = timedelta(minutes=30)
+# How often (per process) the workers look for expired claims
+RECLAIM_INTERVAL_SECONDS = 60
+_next_reclaim_at = 0.0
+
+
+def release_claims(db: Session, job_ids: list[str], claimed_status: InvoiceStatus):
+    """
+    Hand claimed jobs that were not processed back to their queue, in one commit.
+
+    Rows whose status has moved on since the claim are left alone.
+    """
+    if not job_ids:
+        return
+    now = datetime.utcnow()
+    claimed = update(Invoice).where(Invoice.id.in_(job_ids), Invoice.status == claimed_status)
+    if claimed_status == InvoiceStatus.OCR_PENDING:
+        # Back to the status the row was claimed from
+        db.execute(
+            claimed.where(Invoice.attempt_count == 0).values(status=InvoiceStatus.RECEIVED, updated_at=now),
+            execution_options={"synchronize_session": False},
+        )
+        db.execute(
+            claimed.where(Invoice.attempt_count > 0).values(status=InvoiceStatus.FAILED_RETRYABLE, updated_at=now),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+        notify_new_work(OCR_QUEUE)
+    else:
+        db.execute(
+            claimed.values(status=InvoiceStatus.OCR_DONE, updated_at=now),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+        notify_new_work(EXTRACTION_QUEUE)
+
+
+def release_expired_claims(db: Session) -> int:
+    """
+    Hand jobs claimed more than CLAIM_TIMEOUT ago back to their queue.
+
+    An expired OCR claim counts as a failed attempt, so a file that stops its
+    worker every time ends FAILED_FINAL instead of being retried forever; an
+    expired extraction claim returns to OCR_DONE. Does nothing if it ran less
+    than RECLAIM_INTERVAL_SECONDS ago in this process (the first call, when
+    the workers start, always runs). Returns the number of rows released.
+    """
+    global _next_reclaim_at
+    if time.monotonic() < _next_reclaim_at:
+        return 0
+    _next_reclaim_at = time.monotonic() + RECLAIM_INTERVAL_SECONDS
+
+    now = datetime.utcnow()
+    expired_ocr = update(Invoice).where(
+        Invoice.status == InvoiceStatus.OCR_PENDING,
+        Invoice.updated_at < now - CLAIM_TIMEOUT,
+    )
+    retry_values = dict(
+        attempt_count=Invoice.attempt_count + 1,
+        last_error="Worker stopped before the job finished (claim expired)",
+        next_attempt_at=now,
+        updated_at=now,
+    )
+    options = {"synchronize_session": False}
+    released = db.execute(
+        expired_ocr.where(Invoice.attempt_count + 1 >= settings.max_attempts)
+        .values(status=InvoiceStatus.FAILED_FINAL, **retry_values),
+        execution_options=options,
+    ).rowcount
+    released_ocr = db.execute(
+        expired_ocr.where(Invoice.attempt_count + 1 < settings.max_attempts)
+        .values(status=InvoiceStatus.FAILED_RETRYABLE, **retry_values),
+        execution_options=options,
+    ).rowcount
+    released_extraction = db.execute(
+        update(Invoice)
+        .where(Invoice.status == InvoiceStatus.EXTRACTION_PENDING, Invoice.updated_at < now - CLAIM_TIMEOUT)
+        .values(status=InvoiceStatus.OCR_DONE, updated_at=now),
+        execution_options=options,
+    ).rowcount
+    db.commit()
+
+    released += released_ocr + released_extraction
+    if released:
+        logger.warning(f"Released {released} invoice(s) claimed more than {CLAIM_TIMEOUT} ago")
+    if released_ocr:
+        notify_new_work(OCR_QUEUE)
+    if released_extraction:
+        notify_new_work(EXTRACTION_QUEUE)
+    return released
 
 
 def mark_extracted(db: Session, inv: Invoice, extracted_fields: dict, confidence_status: ConfidenceStatus = ConfidenceStatus.ERROR):
@@ -69,7 +315,6 @@ def mark_extracted(db: Session, inv: Invoice, extracted_fields: dict, confidence
     inv.confidence_status = confidence_status
     inv.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(inv)
 
 
 def mark_extraction_failed(db: Session, inv: Invoice, error: str):
@@ -78,5 +323,4 @@ def mark_extraction_failed(db: Session, inv: Invoice, error: str):
     inv.last_error = error
     inv.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(inv)
 
@@ -0,0 +1,57 @@
+"""
+Run the OCR and extraction workers as their own process.
+
+    python -m app.worker_main
+
+Used when the API runs several web processes (gunicorn_conf.py): those start
+with RUN_WORKERS=false, so only this process polls the queues and the pipeline's
+CPU work does not compete with request handlers for a GIL. It reads uploads
+from STORAGE_DIR, so it must run on the web processes' machine: start.sh (the
+Docker and Procfile entry point) runs it next to gunicorn and restarts it if
+it exits. Do not deploy it as a separate dyno/service without shared storage.
+"""
+import logging
+import signal
+import sys
+import threading
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Uploads are accepted by the web processes, which cannot wake the worker
+# threads here directly. On PostgreSQL (psycopg 3) they are woken by NOTIFY;
+# otherwise new rows are found by polling
+PIPELINE_IDLE_POLL_SECONDS = 2
+
+
+def main() -> int:
+    # Imported here, not at module level: the process pool (app.worker_pool)
+    # uses spawn, which re-imports this module in every pool process, and
+    # those processes only run the extractors - not the web app or its engines
+    from app.db import engine
+    from app.main import start_background_workers
+    from app.migrate import init_schema
+    from app.worker import can_listen_for_new_work
+
+    if settings.auto_migrate and not init_schema():
+        logger.error("Schema setup failed; not starting workers")
+        return 1
+
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+
+    if can_listen_for_new_work(engine):
+        start_background_workers()
+    else:
+        start_background_workers(idle_poll=PIPELINE_IDLE_POLL_SECONDS)
+    stop.wait()
+    # Worker threads are daemons and stop with the process, as they do when
+    # the web process runs them
+    logger.info("Background workers stopping.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
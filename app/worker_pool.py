@@ -0,0 +1,79 @@
+"""
+Process pool for the CPU-bound steps of the pipeline.
+
+PDF parsing and field extraction are pure Python and hold the GIL, so worker
+threads in one process only overlap while they wait on Tesseract, the
+database or an LLM. The worker threads keep the database work (claims and the
+mark_* updates) and run the parsing here instead: one process per CPU, each
+parsing a whole file, so invoices are parsed in parallel.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _init_pool_process(log_level: int):
+    # Spawned processes do not import app.main, where logging is configured
+    logging.basicConfig(
+        level=log_level,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    The shared process pool, created on first use.
+
+    None on a single CPU, where another process would only add pickling, and
+    inside a pool process (a job does not start a pool of its own).
+    """
+    global _pool
+    if (os.cpu_count() or 1) < 2 or multiprocessing.parent_process() is not None:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the parent process runs worker threads
+            _pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_pool_process,
+                initargs=(logging.getLogger().level,),
+            )
+        return _pool
+
+
+def run_in_process(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Call fn(*args, **kwargs) in the process pool and wait for its result.
+
+    fn must be a module-level function and its arguments and result picklable.
+    Exceptions raised by fn are re-raised here. Without a pool, fn runs in the
+    calling thread.
+
+    If a pool process dies (e.g. a parser crashing on a malformed file) the
+    BrokenProcessPool error is raised for the job, rather than retrying fn in
+    this process where the same crash would stop the workers; the pool is
+    replaced on the next call.
+    """
+    global _pool
+    pool = get_process_pool()
+    if pool is None:
+        return fn(*args, **kwargs)
+    try:
+        return pool.submit(fn, *args, **kwargs).result()
+    except BrokenProcessPool:
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+                logger.warning("A pipeline process died - starting a new process pool")
+        pool.shutdown(wait=False)
+        raise
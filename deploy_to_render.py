@@ -14,15 +14,28 @@ Requirements:
 - Python requests library: pip install requests
 """
 
+import functools
 import requests
 import json
 import sys
 import os
 from typing import Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Render API base URL
 RENDER_API_BASE = "https://api.render.com/v1"
 
+# One session for all API calls (the TLS connection is reused). Gateway errors
+# are retried with backoff; urllib3 does not retry POST, so a create request
+# is never sent twice
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(502, 503, 504)),
+))
+
 def get_api_key() -> Optional[str]:
     """Get Render API key from environment or prompt user."""
     api_key = os.getenv("RENDER_API_KEY")
@@ -57,7 +70,7 @@ def get_headers(api_key: str) -> Dict[str, str]:
 def get_owner_id(api_key: str) -> Optional[str]:
     """Get the owner ID (user or team) for API requests."""
     headers = get_headers(api_key)
-    response = requests.get(f"{RENDER_API_BASE}/owners", headers=headers)
+    response = _SESSION.get(f"{RENDER_API_BASE}/owners", headers=headers)
     
     if response.status_code == 200:
         owners = response.json()
@@ -86,7 +99,7 @@ def create_postgres_database(api_key: str, owner_id: str, name: str = "invoice-a
         "region": "oregon"  # or your preferred region
     }
     
-    response = requests.post(
+    response = _SESSION.post(
         f"{RENDER_API_BASE}/owners/{owner_id}/databases",
         headers=headers,
         json=data
@@ -103,6 +116,7 @@ def create_postgres_database(api_key: str, owner_id: str, name: str = "invoice-a
         print(f"❌ Failed to create database: {response.status_code} - {response.text}")
         return None
 
+@functools.cache
 def get_repo_info() -> Dict[str, str]:
     """Get repository information from git."""
     import subprocess
@@ -190,7 +204,7 @@ def create_web_service(api_key: str, owner_id: str, db_id: Optional[str] = None)
             "value": f"${{db.{db_id}.DATABASE_URL}}"  # Reference the database
         })
     
-    response = requests.post(
+    response = _SESSION.post(
         f"{RENDER_API_BASE}/owners/{owner_id}/services",
         headers=headers,
         json=service_data
@@ -0,0 +1,56 @@
+"""
+Gunicorn settings for the web processes (Uvicorn workers).
+
+    gunicorn -c gunicorn_conf.py app.main:app
+
+Each web process has its own GIL, so requests are served in parallel. The web
+processes run with RUN_WORKERS=false; the OCR/extraction pipeline is its own
+process, `python -m app.worker_main`, which reads the uploads from STORAGE_DIR
+and so must share the filesystem with the web processes. start.sh (the Docker
+and Procfile entry point) starts it next to gunicorn and restarts it if it
+exits; run gunicorn with this file directly only with that process alongside.
+
+The master applies migrations once before starting the web processes, which
+then run with AUTO_MIGRATE=false (start.sh migrates first and sets
+AUTO_MIGRATE=false for both).
+
+Every process opens its own database pools (a sync and an async engine), so
+connections add up per process: the web processes get small pools here
+(WEB_DB_POOL_SIZE + WEB_DB_MAX_OVERFLOW per engine) unless DB_POOL_SIZE /
+DB_MAX_OVERFLOW are set. With the defaults, 2 web processes use at most
+2 x 2 x 10 connections, which leaves room under PostgreSQL's default
+max_connections (100) for the pipeline process.
+"""
+import os
+import subprocess
+import sys
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+# Request handlers mostly wait on the database or the pipeline, so a couple of
+# processes are enough; raise WEB_CONCURRENCY on larger instances (and check
+# the connection budget above)
+workers = int(os.environ.get("WEB_CONCURRENCY") or 2)
+# OCR of large scans can hold a request past gunicorn's 30s default
+timeout = 120
+
+WEB_DB_POOL_SIZE = 5
+WEB_DB_MAX_OVERFLOW = 5
+
+raw_env = [
+    "RUN_WORKERS=false",
+    "AUTO_MIGRATE=false",
+    f"DB_POOL_SIZE={os.environ.get('DB_POOL_SIZE') or WEB_DB_POOL_SIZE}",
+    f"DB_MAX_OVERFLOW={os.environ.get('DB_MAX_OVERFLOW') or WEB_DB_MAX_OVERFLOW}",
+]
+
+_auto_migrate = os.environ.get("AUTO_MIGRATE", "true").lower().strip() not in ("false", "0", "no", "off")
+
+
+def on_starting(server):
+    # In a child process, so the master does not open database connections
+    # that the forked web processes would inherit
+    if _auto_migrate:
+        result = subprocess.run([sys.executable, "-m", "app.migrate"])
+        if result.returncode != 0:
+            server.log.warning("Schema setup failed (see above); the health check reports the database")
@@ -0,0 +1,19 @@
+#!/bin/sh
+# Container entry point: the gunicorn web processes plus the OCR/extraction
+# pipeline (python -m app.worker_main), which share STORAGE_DIR. Migrations run
+# once, before either starts; the pipeline is restarted if it exits.
+
+if [ "${AUTO_MIGRATE:-true}" != "false" ]; then
+    python -m app.migrate || echo "Schema setup failed; the health check reports the database"
+fi
+export AUTO_MIGRATE=false
+
+(
+    while true; do
+        python -m app.worker_main
+        echo "Pipeline process exited ($?); restarting in 5s"
+        sleep 5
+    done
+) &
+
+exec gunicorn -c gunicorn_conf.py app.main:app
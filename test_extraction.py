@@ -22,7 +22,12 @@ logger = logging.getLogger(__name__)
 def test_extraction_with_file(file_path: str):
     """Test extraction with a real invoice file."""
     from app.text_extraction import extract_text_from_file, is_supported_file_type
-    from app.extraction.pipeline import extract_invoice_fields_multi_level, get_extraction_level_config
+    from app.pdf_extraction import stream_pdf_pages
+    from app.extraction.pipeline import (
+        extract_invoice_fields_from_pages,
+        extract_invoice_fields_multi_level,
+        get_extraction_level_config,
+    )
     
     logger.info("=" * 70)
     logger.info("TESTING INVOICE EXTRACTION PIPELINE")
@@ -36,43 +41,62 @@ def test_extraction_with_file(file_path: str):
     logger.info(f"File exists: {os.path.exists(file_path)}")
     logger.info(f"File size: {os.path.getsize(file_path)} bytes")
     
-    # Step 1: Extract text (OCR)
-    logger.info("\n" + "=" * 70)
-    logger.info("STEP 1: Text Extraction (OCR)")
-    logger.info("=" * 70)
-    
     if not is_supported_file_type(file_path):
         logger.error(f"Unsupported file type: {file_path}")
         return False
     
-    ocr_text = extract_text_from_file(file_path)
-    
-    if not ocr_text:
-        logger.error("Text extraction failed - no text extracted")
-        return False
-    
-    logger.info(f"✓ Text extraction successful: {len(ocr_text)} characters")
-    logger.info(f"First 200 chars: {ocr_text[:200]}...")
-    
-    # Step 2: Multi-level extraction
-    logger.info("\n" + "=" * 70)
-    logger.info("STEP 2: Multi-Level Field Extraction")
-    logger.info("=" * 70)
-    
     level_config = get_extraction_level_config()
     logger.info(f"Level 2 (Structural): {level_config['enable_level_2']}")
     logger.info(f"Level 3 (Semantic/Gemini): {level_config['enable_level_3']}")
     logger.info(f"LLM Fallback: {level_config['use_llm_fallback']}")
+    level_options = {
+        "enable_level_2": level_config['enable_level_2'],
+        "enable_level_3": level_config['enable_level_3'],
+        "use_llm_fallback": level_config.get('use_llm_fallback', True),
+        "min_extraction_rate": level_config.get('min_extraction_rate', 0.5),
+    }
     
     try:
-        extracted_fields, confidence_status = extract_invoice_fields_multi_level(
-            file_path=file_path,
-            ocr_text=ocr_text,
-            enable_level_2=level_config['enable_level_2'],
-            enable_level_3=level_config['enable_level_3'],
-            use_llm_fallback=level_config.get('use_llm_fallback', True),
-            min_extraction_rate=level_config.get('min_extraction_rate', 0.5)
-        )
+        if file_path.lower().endswith('.pdf'):
+            # Text PDFs: read pages only until the fields are found
+            logger.info("\n" + "=" * 70)
+            logger.info("STEP 1+2: Page-by-Page Text and Field Extraction")
+            logger.info("=" * 70)
+            
+            extracted_fields, confidence_status, ocr_text = extract_invoice_fields_from_pages(
+                file_path, stream_pdf_pages(file_path), **level_options
+            )
+            if not ocr_text:
+                # Scanned PDF: OCR the whole file below
+                logger.info("No text layer found - falling back to OCR")
+        else:
+            ocr_text = None
+        
+        if not ocr_text:
+            # Step 1: Extract text (OCR)
+            logger.info("\n" + "=" * 70)
+            logger.info("STEP 1: Text Extraction (OCR)")
+            logger.info("=" * 70)
+            
+            ocr_text = extract_text_from_file(file_path)
+            
+            if not ocr_text:
+                logger.error("Text extraction failed - no text extracted")
+                return False
+            
+            logger.info(f"✓ Text extraction successful: {len(ocr_text)} characters")
+            logger.info(f"First 200 chars: {ocr_text[:200]}...")
+            
+            # Step 2: Multi-level extraction
+            logger.info("\n" + "=" * 70)
+            logger.info("STEP 2: Multi-Level Field Extraction")
+            logger.info("=" * 70)
+            
+            extracted_fields, confidence_status = extract_invoice_fields_multi_level(
+                file_path=file_path,
+                ocr_text=ocr_text,
+                **level_options
+            )
         
         logger.info("\n" + "=" * 70)
         logger.info("EXTRACTION RESULTS")
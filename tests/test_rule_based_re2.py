@@ -0,0 +1,94 @@
+"""
+Differential check: rule-based extraction with RE2 returns what it returns with
+stdlib re, on invoice text with Unicode whitespace, digits and letters.
+
+    python -m pytest tests
+"""
+import importlib.util
+import random
+import sys
+
+import pytest
+
+import app.extraction.rule_based as rule_based_re2
+
+pytestmark = pytest.mark.skipif(rule_based_re2.re2 is None, reason="google-re2 is not installed")
+
+
+def _load_without_re2():
+    """A second copy of rule_based, imported as if google-re2 were missing."""
+    saved = sys.modules.get("re2")
+    sys.modules["re2"] = None
+    try:
+        spec = importlib.util.spec_from_file_location("rule_based_stdlib", rule_based_re2.__file__)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        if saved is None:
+            sys.modules.pop("re2", None)
+        else:
+            sys.modules["re2"] = saved
+    assert module.re2 is None
+    return module
+
+
+rule_based_stdlib = _load_without_re2()
+
+# Characters the two engines' \s, \d, \w and \b classify differently, and
+# others that must pass through unchanged
+_NOISE = [
+    " ", " ", "　", "\v", "\x1c", "\x85",
+    "é", "Ä", "ü", "ß", "ñ", "ж", "中", "ı", "İ", "ſ", "K", "̇",
+    "٣", "٤", "１", "２", "²", "½",
+    "€", "£", "—", "😀", "\ud800", "_",
+]
+_LINES = [
+    "Invoice Number: INV-{number}", "Invoice # {number}", "Date: 2024-0{month}-1{day}",
+    "Invoice Date: {day}/0{month}/2024", "From: {vendor}", "Vendor: {vendor}", "{vendor}",
+    "Subtotal: {symbol}{subtotal}", "Tax: {symbol}{tax}", "VAT 20%: {symbol}{tax}",
+    "Discount: -{symbol}{tax}", "Total: {symbol}{total}", "Total Due {total} {code}",
+    "Amount due: {symbol}{total}", "Currency: {code}", "Bill To: Someone",
+    "Qty Description Amount", "Balance {symbol}{total}",
+]
+_VENDORS = ["Acme Corp", "Globex Ltd", "Müller GmbH", "Société Générale", "Initech Inc."]
+
+
+def _invoice_text(rnd: random.Random) -> str:
+    subtotal = rnd.randint(1, 99999) / 100
+    tax = round(subtotal * 0.1, 2)
+    values = {
+        "number": rnd.randint(100, 99999), "month": rnd.randint(1, 9), "day": rnd.randint(0, 9),
+        "vendor": rnd.choice(_VENDORS), "symbol": rnd.choice(["$", "€", "£", "", "USD "]),
+        "subtotal": f"{subtotal:,.2f}", "tax": f"{tax:.2f}", "total": f"{subtotal + tax:,.2f}",
+        "code": rnd.choice(["USD", "EUR", "GBP", "USDé", "EURÄ"]),
+    }
+    text = "\n".join(line.format(**values) for line in rnd.sample(_LINES, rnd.randint(3, len(_LINES))))
+    if rnd.random() < 0.2:
+        return text
+    noisy = []
+    for char in text:
+        if rnd.random() < 0.04:
+            noisy.append(rnd.choice(_NOISE))
+            if rnd.random() < 0.5:
+                continue
+        noisy.append(char)
+    return "".join(noisy)
+
+
+@pytest.mark.parametrize("text", [
+    "From: Globex ٣٤٥.٦٧ 12 １２３\nTotal: $10.00",
+    "Vendor: Acme Corp\vLtd　Inc\nTotal: $10.00",
+    "Invoice Number: INV-1\nTotal: 100.00 USDé",
+    "Invoice Number: INV-1\nTotal: 50,00 EURÄ",
+    "Invoice Number: INV-1\nTotalé: $10.00\nTotal: $12.00",
+    "Invoice Number: INV-1\nSubtotal: $1,000.00\nTax: $80.00\nTotal: $1,080.00",
+])
+def test_examples_match_stdlib(text):
+    assert rule_based_re2.extract_invoice_fields(text) == rule_based_stdlib.extract_invoice_fields(text)
+
+
+def test_generated_texts_match_stdlib():
+    rnd = random.Random(20241015)
+    for _ in range(3000):
+        text = _invoice_text(rnd)
+        assert rule_based_re2.extract_invoice_fields(text) == rule_based_stdlib.extract_invoice_fields(text), text